@@ -1,4 +1,6 @@
-import subprocess, sys
+import time
+_rerun_started = time.perf_counter()
+from ouroboros_deps import bootstrap
 
 # --- A. PLATINUM SETUP & AUTO-FIX ---
 required_libs = {'streamlit': 'streamlit', 
@@ -6,26 +8,29 @@ required_libs = {'streamlit': 'streamlit',
                  'google.generativeai': 'google-generativeai',
                  'matplotlib': 'matplotlib'}
 
-for lib_name, pip_name in required_libs.items():
-    try:
-        __import__(lib_name)
-    except ImportError:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", pip_name])
+# One batched pip call (wheelhouse first) for whatever is missing; checked once per process
+bootstrap(required_libs)
 
 import streamlit as st
 import streamlit_antd_components as sac
-import google.generativeai as genai
-import subprocess
-import sys
 import os
-import time
-import re
-import glob
-from typing import Dict
-
-# CRITICAL PATH FIX: Always execute in current CWD
-current_dir = os.getcwd()
-exec_path = os.path.join(current_dir, "ouroboros_exe_v21.py")
+import html
+import json
+import threading
+# Heavy lifting lives in modules: imported once per process, not re-executed on every rerun
+from ouroboros_core import (InvictusEngine, ResponseCache, ExecutionCache, ModelHealth, DependencyResolver,
+                            render_hud, render_waterfall, sweep_workspaces, verbatim_code, current_dir, cache_dir)
+from ouroboros_jobs import JobStore, JobService, FINISHED
+from ouroboros_artifacts import ThumbnailCache
+from ouroboros_data import DataRegistry
+from ouroboros_gemini import client_summary
+from ouroboros_history import RunHistory
+from ouroboros_memory import RepairMemory
+from ouroboros_ratelimit import RateLimiter
+from ouroboros_warm import WarmPool, exec_cap
+from ouroboros_profile import RerunProfile
+from ouroboros_trace import serve_metrics
+_imports_done = time.perf_counter()
 
 # --- B. PLATINUM CSS (OBSIDIAN & ROYAL BLUE) ---
 st.set_page_config(
@@ -125,214 +130,88 @@ h1, h2, h3 { color: #f3f4f6 !important; letter-spacing: -0.5px; }
 div[data-testid="stSidebar"] { background-color: #0a0a0a; border-right: 1px solid #222; }
 </style>
 """
+# Re-sent on every rerun on purpose: Streamlit drops any element a run does not emit
 st.markdown(PLATINUM_CSS, unsafe_allow_html=True)
 
-# --- C. SYSTEM CORE ---
-
-def clean_artifacts():
-    """Universal Cleanup: Nuke ALL images and execution scripts"""
-    patterns = ["*.png", "*.jpg", "*.jpeg", "*.svg", "ouroboros_exe_*.py"]
-    for p in patterns:
-        for f in glob.glob(p):
-            try: os.remove(f)
-            except: pass
-
-class InvictusEngine:
-    def __init__(self, key):
-        genai.configure(api_key=key)
-        self.key = key
-        # INVICTUS MODEL CASCADE (Updated with fallback to discovery)
-        self.models = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
-
-    def discover_models(self):
-        """Emergency Discovery Mode"""
-        try:
-            found = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    found.append(m.name)
-            return found
-        except Exception as e:
-            return []
-
-    def generate(self, prompt, mode="architect", error_context=None, status_ph=None):
-        base_instruct = (
-            "You are a professional Python engineer. Return ONLY raw executable code. No markdown fences.\n"
-            "IMPORTS:\n"
-            "- If using matplotlib, you MUST write exactly this sequence:\n"
-            "  import matplotlib\n"
-            "  matplotlib.use('Agg')\n"
-            "  import matplotlib.pyplot as plt\n"
-            "- CRITICAL RULE: For 3D plots, use `ax.scatter(x, y, z, c=z, cmap='viridis')`. NEVER use `c='viridis'`.\n"
-            "- VISUALS: If creating an image, save it as a PNG file (e.g., 'chart.png'). DO NOT use `plt.show()`.\n"
-            "- NUMPY RULE: Verify array shapes. Do NOT use `len()` on scalar numpy types (float64).\n"
-            "- DECORATOR RULE: Wrappers MUST accept `*args` and `**kwargs` to avoid TypeError.\n"
-            "- OUTPUT RULE: Silent success is failure. PROVE your work by printing the final result or saving a plot.\n"
-            "- ALIAS RULE: Do NOT import 'plt'. Use `import matplotlib.pyplot as plt`. Do NOT import 'cv2' without installing `opencv-python`.\n"
-            "- IMPORT RULE: Do NOT import 'shift', 'utils', or other imaginary modules. Only use Standard Library or PyPI packages.\n"
-            "- LOGIC RULE: Ensure coordinate tuples (x,y) are consistent. Do not mix 2D and 3D coordinates.\n"
-            "- 3D PLOT RULE: IF AND ONLY IF plotting 3D, use `ax = fig.add_subplot(111, projection='3d')`.\n"
-            "- IMAGE RULE: For `imshow`, inputs MUST be 2D (H, W) or 3D (H, W, 3). If array is flat, use `.reshape(H, W)`.\n"
-            "- HEADLESS RULE: Server has NO MONITOR. `plt.show` is BANNED. Use `plt.savefig()`.\n"
-            "- LIBRARY RULE: Do NOT use `cv2`. Use `PIL` (Pillow) or `scikit-image` for image processing.\n"
-            "- If asking for a game, write a non-interactive simulation (500 steps) and print results.\n"
-            "- PRINT ALL OUTPUTS TO STDOUT."
-        )
-        
-        if mode == "surgeon":
-            full_prompt = (
-                f"{base_instruct}\n\n"
-                f"DEBUG TASK: Fix this broken code based on the error.\n"
-                f"ERROR:\n{error_context}\n\n"
-                f"BROKEN CODE:\n{prompt}"
-            )
-        else:
-            full_prompt = f"{base_instruct}\n\nTASK: {prompt}"
-
-        # 1. TITANIUM LOOP: Try every model in the cascade
-        last_error = ""
-
-        # V30 OMEGA: Force Headless Config in Prompt
-        if "matplotlib" in full_prompt.lower() or "plot" in full_prompt.lower():
-             full_prompt = "You MUST start your code with:\nimport matplotlib\nmatplotlib.use('Agg')\n\n" + full_prompt
-
-        for model_name in self.models:
-            try:
-                # Update HUD if we are retrying
-                if status_ph and model_name != self.models[0]:
-                    status_ph.markdown(render_hud(f"REROUTING: {model_name.upper()}...", 50, "#eab308"), unsafe_allow_html=True)
-                
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(full_prompt)
-                return re.sub(r'^```[a-zA-Z]*\n|\n```$', '', response.text.strip())
-            
-            except Exception as e:
-                last_error = str(e)
-                # Cool down to prevent 429s (Reduced for Speed V34)
-                time.sleep(0.5) 
-                continue
-        
-        # 2. DIAMOND DISCOVERY (Emergency)
-        if status_ph:
-            status_ph.markdown(render_hud("DIAGNOSTIC SCAN INITIATED...", 75, "#a855f7"), unsafe_allow_html=True)
-        
-        found_models = self.discover_models()
-        
-        if found_models:
-            # V22 UPGRADE: Deep Scan - Try ALL found models
-            for i, valid_model in enumerate(found_models):
-                try:
-                    if status_ph:
-                        status_ph.markdown(render_hud(f"DIAGNOSTIC TRY ({i+1}/{len(found_models)}): {valid_model}", 80, "#a855f7"), unsafe_allow_html=True)
-                    
-                    model = genai.GenerativeModel(valid_model)
-                    response = model.generate_content(full_prompt)
-                    return re.sub(r'^```[a-zA-Z]*\n|\n```$', '', response.text.strip())
-                except Exception as e:
-                    last_error = f"Model {valid_model} failed: {e}"
-                    time.sleep(1) # Slight cool down
-                    continue
-        else:
-            last_error += " | Diagnostic Scan: No models found."
-
-        # Final Failure
-        error_msg = f"Diamond System Failure: All routes exhausted. Last error: {last_error}"
-        return f"print({repr(error_msg)})"
-
-    def execute_with_healing(self, code, status_ph):
-        """Self-Healing Execution Loop"""
-        clean_artifacts()
-        
-        # V36: SURGEON - Context-Aware Sanitization
-        lines = code.split('\n')
-        new_lines = []
-        for line in lines:
-            if "scatter" in line:
-                for bad_color in ['viridis', 'plasma', 'inferno', 'magma', 'cividis']:
-                    bad_c = f"c='{bad_color}'"
-                    if bad_c in line:
-                        if "cmap=" in line:
-                            # cmap exists, just clean c
-                            line = line.replace(bad_c, "c=range(50)") 
-                        else:
-                            # Add cmap
-                            line = line.replace(bad_str, f"c=range(100), cmap='{bad_color}'")
-            new_lines.append(line)
-        code = '\n'.join(new_lines)
-        
-        with open(exec_path, "w", encoding='utf-8') as f: f.write(code)
-        
-        max_retries = 3
-        attempt = 1
-        
-        while attempt <= max_retries:
-            try:
-                # EXECUTE
-                res = subprocess.run(
-                    [sys.executable, exec_path],
-                    capture_output=True, text=True, timeout=45, cwd=current_dir
-                )
-                
-                # CHECK FOR MISSING MODULES (PIP & SMART ALIASES)
-                if res.returncode != 0 and "ModuleNotFoundError" in res.stderr:
-                    match = re.search(r"No module named '(\w+)'", res.stderr)
-                    if match:
-                        missing_lib = match.group(1)
-                        status_ph.markdown(render_hud(f"HEALING: DIAGNOSING {missing_lib.upper()}...", 60 + (attempt*10), "#ef4444"), unsafe_allow_html=True)
-                        
-                        # V31 SMART HEALER: Logic for Aliases
-                        if missing_lib == "plt":
-                            # Fix Code directly
-                            status_ph.markdown(render_hud(f"HEALING: REPLACING 'import plt' -> 'import matplotlib.pyplot as plt'...", 70, "#10b981"), unsafe_allow_html=True)
-                            code = code.replace("import plt", "import matplotlib.pyplot as plt")
-                            with open(exec_path, "w", encoding='utf-8') as f: f.write(code)
-                            attempt += 1
-                            continue
-                        
-                        # Map common import names to Pip package names
-                        pip_map = {
-                            "sklearn": "scikit-learn",
-                            "cv2": "opencv-python-headless",
-                            "PIL": "Pillow",
-                            "skimage": "scikit-image"
-                        }
-                        install_name = pip_map.get(missing_lib, missing_lib)
-                        
-                        try:
-                            # Use --user to avoid permission errors on Cloud
-                            subprocess.check_call([sys.executable, "-m", "pip", "install", "--user", install_name])
-                            attempt += 1
-                            continue # RETRY LOOP
-                        except Exception as e:
-                            # V29: HALLUCINATION FIREWALL -> Refined
-                            error_msg = (
-                                f"CRITICAL ERROR: The module '{missing_lib}' (Pip: {install_name}) FAILED to install.\n"
-                                f"It likely does not exist or is incompatible.\n"
-                                f"ACTION: Rewrite code to NOT use '{missing_lib}'."
-                            )
-                            return {"success": False, "stdout": "", "stderr": error_msg, "code": code}
-
-                # CHECK FOR MISSING IMPORTS (STDLIB/Structure)
-                if res.returncode != 0 and "NameError" in res.stderr:
-                    match = re.search(r"name '(\w+)' is not defined", res.stderr)
-                    if match:
-                        missing_var = match.group(1)
-                        # Heuristic: If it looks like a package (all lowercase, no underscores), try importing it
-                        if missing_var.islower() and "_" not in missing_var:
-                            status_ph.markdown(render_hud(f"HEALING: INJECTING IMPORT {missing_var.upper()}...", 60 + (attempt*10), "#ef4444"), unsafe_allow_html=True)
-                            code = f"import {missing_var}\n{code}"
-                            with open(exec_path, "w", encoding='utf-8') as f: f.write(code)
-                            attempt += 1
-                            continue # RETRY LOOP
-
-                return {"success": res.returncode==0, "stdout": res.stdout, "stderr": res.stderr, "code": code}
-                
-            except subprocess.TimeoutExpired:
-                return {"success": False, "stdout": "", "stderr": "TIMEOUT: Execution exceeded 45s.", "code": code}
-            except Exception as e:
-                return {"success": False, "stdout": "", "stderr": str(e), "code": code}
-        
-        return {"success": False, "stdout": "", "stderr": "Max retries exceeded during self-healing.", "code": code}
+# --- C. SYSTEM CORE (shared across reruns and sessions) ---
+
+@st.cache_resource
+def get_response_cache():
+    """Shared across reruns and sessions of this process"""
+    return ResponseCache(os.path.join(cache_dir, "responses"))
+
+@st.cache_resource
+def get_execution_cache():
+    """Replays of deterministic scripts, shared across reruns and sessions of this process"""
+    return ExecutionCache(os.path.join(cache_dir, "executions"))
+
+@st.cache_resource
+def get_thumbnails():
+    """Artifact previews keyed by content hash, shared across reruns and sessions of this process"""
+    return ThumbnailCache(os.path.join(cache_dir, "thumbs"))
+
+@st.cache_resource
+def get_model_health():
+    """Shared across reruns and sessions of this process, persisted across restarts"""
+    return ModelHealth(os.path.join(cache_dir, "model_health.json"))
+
+@st.cache_resource
+def get_repair_memory():
+    """Learned error -> fix store, shared across reruns and sessions, persisted across restarts"""
+    return RepairMemory(os.path.join(cache_dir, "repair_memory.json"))
+
+@st.cache_resource
+def get_run_history():
+    """Past builds with a similar-prompt index, shared across reruns and sessions, persisted across restarts"""
+    return RunHistory(os.path.join(cache_dir, "history.sqlite3"))
+
+@st.cache_resource
+def get_data_registry():
+    """Column cache + schemas of the data files next to the app; the first scan runs in the background"""
+    registry = DataRegistry(os.path.join(cache_dir, "data"), data_dir=current_dir)
+    threading.Thread(target=registry.refresh, daemon=True).start()
+    return registry
+
+@st.cache_resource
+def get_rate_limiter():
+    """One budget per API key and model for every session of this process (OUROBOROS_RPM / _MODEL_RPM / _TPM)"""
+    return RateLimiter.from_env()
+
+@st.cache_resource
+def get_warm_pool():
+    """Warm sandbox templates shared by every session (None -> cold subprocess per run)"""
+    if not WarmPool.available(): return None
+    return WarmPool(cwd=current_dir) # one template per exec slot (OUROBOROS_WARM_WORKERS overrides)
+
+@st.cache_resource
+def get_resolver():
+    """One resolver per process: its lock serialises pip calls across sessions"""
+    return DependencyResolver()
+
+@st.cache_resource
+def get_rerun_profile():
+    return RerunProfile()
+
+@st.cache_resource
+def get_exec_slots():
+    """Process-wide cap on concurrent sandbox runs (defaults to the CPU count)"""
+    threading.Thread(target=sweep_workspaces, daemon=True).start()
+    return threading.BoundedSemaphore(exec_cap())
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus text on OUROBOROS_METRICS_PORT (metrics.prom in the cache dir is always written)"""
+    port = os.environ.get("OUROBOROS_METRICS_PORT")
+    return serve_metrics(port) if port else None
+
+@st.cache_resource
+def get_job_service():
+    """Build workers shared by every session: a closed tab or a refresh no longer kills a running build"""
+    shared = dict(cache=get_response_cache(), health=get_model_health(), pool=get_warm_pool(), slots=get_exec_slots(),
+                  resolver=get_resolver(), exec_cache=get_execution_cache(), memory=get_repair_memory(),
+                  history=get_run_history(), data=get_data_registry(), limiter=get_rate_limiter())
+    return JobService(JobStore(), lambda key: InvictusEngine(key, **shared),
+                      workers=int(os.environ.get("OUROBOROS_JOB_WORKERS", "2")))
 
 # --- D. PLATINUM DASHBOARD ---
 
@@ -342,6 +221,10 @@ st.markdown("<h1 style='text-align: center; border-bottom: 1px solid #222; paddi
 if "prompt" not in st.session_state: st.session_state.prompt = ""
 if "page" not in st.session_state: st.session_state.page = "Builder"
 
+# Recorded before the sidebar: the menu's first-load st.rerun() ends this run, and only this run paid for the imports
+rerun_profile = get_rerun_profile()
+rerun_profile.record_imports(_imports_done - _rerun_started)
+
 # SIDEBAR
 with st.sidebar:
     st.markdown("### 🔐 ACCESS")
@@ -358,14 +241,55 @@ with st.sidebar:
         st.rerun()
         
     st.divider()
-    if st.button("⚠️ HARD RESET SYSTEM", use_container_width=True):
+    if st.button("⚠️ HARD RESET SYSTEM", width="stretch"):
         st.session_state.clear()
-        clean_artifacts()
+        st.query_params.clear()
         st.rerun()
         
     st.markdown("### 🚦 STATUS")
     st.success("SYSTEM ONLINE (INVICTUS V46 FINAL)")
-
+    response_cache = get_response_cache()
+    use_cache = st.toggle("Response Cache", value=response_cache.enabled, help="Reuse answers for identical prompts and outputs of identical deterministic scripts. Disable to force a fresh model call and run.")
+    execution_cache = get_execution_cache()
+    st.caption(f"Cache: {response_cache.summary()} · Runs: {execution_cache.summary()}")
+    live_output = st.toggle("Live Output", value=True, help="Stream generated code and the script's stdout/stderr while they are produced.")
+    model_health = get_model_health()
+    warm_pool = get_warm_pool() # Spawned on first page load so templates are hot before the first build
+    exec_slots = get_exec_slots()
+    jobs = get_job_service()
+    get_metrics_server()
+    q = jobs.store.counts()
+    st.caption(f"Jobs: {q.get('queued', 0)} queued · {q.get('running', 0)} running · {len(jobs.workers)} workers")
+    with st.expander("🩺 Model Health"):
+        st.caption(f"Gemini client: {client_summary()}")
+        rows = model_health.snapshot()
+        if rows: st.dataframe(rows, hide_index=True, width="stretch")
+        else: st.caption("No model calls recorded yet.")
+    with st.expander("🚥 Rate Limits"):
+        rate_limiter = get_rate_limiter()
+        st.caption(rate_limiter.summary())
+        rows = rate_limiter.snapshot()
+        if rows: st.dataframe(rows, hide_index=True, width="stretch")
+    with st.expander("🧬 Repair Memory"):
+        repair_memory = get_repair_memory()
+        st.caption(repair_memory.summary())
+        st.dataframe(repair_memory.snapshot(), hide_index=True, width="stretch")
+    with st.expander("🗃️ Data Files"):
+        data_registry = get_data_registry()
+        st.caption(data_registry.summary())
+        rows = data_registry.snapshot()
+        if rows: st.dataframe(rows, hide_index=True, width="stretch")
+    with st.expander("🗂️ Run History"):
+        run_history = get_run_history()
+        st.caption(run_history.summary())
+        rows = run_history.recent()
+        if rows: st.dataframe(rows, hide_index=True, width="stretch")
+    with st.expander("⏱️ Profile"):
+        p = rerun_profile.summary()
+        st.caption(f"Rerun p50 {p['p50_ms']} ms · p95 {p['p95_ms']} ms (n={p['n']})")
+        st.caption(f"Cold-start imports {p['cold_imports_ms']} ms · `python ouroboros_profile.py` for the full report")
+
+run_build = False
 try:
     # 1. BUILDER MODE
     if st.session_state.page == 'Code Builder':
@@ -374,7 +298,7 @@ try:
             st.write("### ⚡ Quick Ops")
             def set_p(t): st.session_state.prompt = t
             
-            if st.button("Simulate Snake Path 🐍", use_container_width=True):
+            if st.button("Simulate Snake Path 🐍", width="stretch"):
                 code_snake = (
                     "import matplotlib.pyplot as plt\n"
                     "import numpy as np\n"
@@ -397,7 +321,7 @@ try:
                 set_p(f"Execute this EXACT Python code for the Snake simulation:\n```python\n{code_snake}\n```")
                 st.rerun()
 
-            if st.button("Lorenz Attractor (Chaos) 🦋", use_container_width=True):
+            if st.button("Lorenz Attractor (Chaos) 🦋", width="stretch"):
                 code_lorenz = (
                     "import numpy as np\n"
                     "import matplotlib.pyplot as plt\n"
@@ -417,124 +341,115 @@ try:
                 )
                 set_p(f"Execute this EXACT Python code for Lorenz Attractor:\n```python\n{code_lorenz}\n```")
                 st.rerun()
-            if st.button("Generate QR Code 📱", use_container_width=True):
+            if st.button("Generate QR Code 📱", width="stretch"):
                 set_p("Write a Python script using the 'qrcode' library. Generate a QR code for the URL 'https://ouroboros.streamlit.app'. Save it as 'my_qr.png'. Print 'QR Code Saved'.")
                 st.rerun()
 
         with c1:
             st.write("### 📝 Directives")
             u_input = st.text_area("Builder Input", value=st.session_state.prompt, height=200, placeholder="Describe the software you want to build...")
-            run_build = st.button("INITIALIZE BUILD", type="primary", use_container_width=True)
+            run_build = st.button("INITIALIZE BUILD", type="primary", width="stretch")
+            # V51 RUN HISTORY: close past successes, one click to re-run their script as is
+            matches = get_run_history().similar(u_input) if u_input.strip() and not verbatim_code(u_input) else []
+            if matches:
+                with st.expander(f"🗂️ Similar past runs ({len(matches)})"):
+                    for m in matches:
+                        h1, h2 = st.columns([4, 1])
+                        h1.caption(f"{m['score']:.0%} match · run #{m['id']} · {m['build_s'] or 0:.1f}s build · reused {m['uses']}x\n\n{m['prompt'][:200]}")
+                        if h2.button("▶ Re-run", key=f"rerun_{m['id']}", width="stretch"):
+                            set_p(f"Execute this EXACT Python code from run #{m['id']}:\n```python\n{m['code']}\n```")
+                            st.rerun()
 
     # 2. SURGEON MODE
     elif st.session_state.page == 'Code Surgeon':
         st.write("### 🚑 Operations Table")
         u_input = st.text_area("Paste Broken Code", height=150, placeholder="# Paste code here...")
         err_input = st.text_area("Paste Error Message", height=80, placeholder="TypeError: ...")
-        run_build = st.button("INITIALIZE REPAIR", type="primary", use_container_width=True)
-
-    # --- E. EXECUTION POOL ---
-    def render_hud(phase, pct, color="#3b82f6"):
-        return f"""
-        <div class="hud-card">
-            <div style="color:{color}; font-weight:600; font-family:'Inter'; letter-spacing:1px;">
-                {phase}
-            </div>
-            <div class="hud-progress-track">
-                <div class="hud-progress-bar" style="width: {pct}%; background:{color};"></div>
-            </div>
-        </div>
-        """
+        run_build = st.button("INITIALIZE REPAIR", type="primary", width="stretch")
+
+    # --- E. EXECUTION POOL (thin client over the job queue) ---
 
     if run_build and u_input:
         if not api_key: st.error("Authentication Missing")
         else:
-            eng = InvictusEngine(api_key)
-            ph = st.empty()
-            
-            # 1. ARCHITECTING (TITANIUM LOOP -> DIAMOND DISCOVERY)
-            ph.markdown(render_hud("INITIATING INVICTUS CORE...", 20), unsafe_allow_html=True)
-            
-            reflexion_attempts = 0
-            max_reflexion = 5 # V30 OMEGA: Max Retries
-            last_error_context = err_input if st.session_state.page == 'Code Surgeon' else None
-            last_code_attempt = "" # Track code to feed back
-            
-            while reflexion_attempts <= max_reflexion:
-                # GENERATE
-                if reflexion_attempts > 0:
-                     ph.markdown(render_hud(f"🧠 REFLEXION ({reflexion_attempts}/{max_reflexion}): FIXING LOGIC...", 40, "#ec4899"), unsafe_allow_html=True)
-                     # V37 GOD MODE: Aggressive Debugging Prompt
-                     current_prompt = (
-                         f"You wrote this code:\n{last_code_attempt}\n\n"
-                         f"EXECUTION ERROR:\n{last_error_context}\n\n"
-                         f"CRITICAL FIX INSTRUCTIONS:\n"
-                         f"1. Analyze the error trace above. Which line failed?\n"
-                         f"2. If 'Invalid shape', you MUST reshape your array before plotting (e.g., array.reshape(H,W)).\n"
-                         f"3. If 'no attribute zlabel', ensure you used `ax = fig.add_subplot(projection='3d')`.\n"
-                         f"4. Correct consistency errors. Close all syntax.\n"
-                         f"5. RETURN THE FIXED, COMPLETE CODE."
-                     )
-                     mode = "surgeon" 
-                else:
-                     current_prompt = u_input
-                     mode = "surgeon" if st.session_state.page == 'Code Surgeon' else "architect"
-
-                code = eng.generate(current_prompt, mode=mode, error_context=last_error_context, status_ph=ph)
-                last_code_attempt = code # Save for next loop if needed
-                time.sleep(0.3)
-                
-                # 2. COMPILING (SELF-HEALING)
-                ph.markdown(render_hud("COMPILING ASSETS...", 50, "#fbbf24"), unsafe_allow_html=True)
-                res = eng.execute_with_healing(code, ph)
-                
-                # V26 LOUDMOUTH CHECK: Detect Silent Failure
-                found_artifacts = []
-                for ext in ["*.png", "*.jpg", "*.jpeg", ".svg"]:
-                    found_artifacts.extend(glob.glob(ext))
-                
-                has_output = bool(res['stdout'].strip()) or bool(found_artifacts)
-                
-                if res['success'] and has_output:
-                    break # success and loud!
-                elif res['success'] and not has_output:
-                     # SILENT FAILURE -> Force Reflexion
-                     last_error_context = "RUNTIME ERROR: SILENT FAILURE. The code ran successfully but produced NO OUTPUT (no print statements, no images). You MUST use print() to show the result."
-                     reflexion_attempts += 1
-                else:
-                    # Standard Failure
-                    last_error_context = res['stderr']
-                    with st.expander("🛑 Error Logs (Debug)", expanded=True):
-                        st.code(res['stderr'], language="text")
-                    reflexion_attempts += 1
-            
-            # 3. VERIFYING
-            
-            # 3. VERIFYING
+            surgeon = st.session_state.page == 'Code Surgeon'
+            st.session_state.job_id = jobs.submit(u_input, key=api_key, mode="surgeon" if surgeon else "architect",
+                                                  error_context=err_input if surgeon else None, use_cache=use_cache)
+            st.query_params["job"] = st.session_state.job_id # a browser refresh re-attaches instead of killing the build
+
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = jobs.store.get(job_id) if job_id else None
+    if job:
+        st.session_state.job_id = job_id
+        following = job['status'] not in FINISHED
+        ph = st.empty()
+        live = st.empty()
+        errors = st.container()
+        seq = 0
+        while True:
+            job = jobs.store.get(job_id)
+            for seq, phase, payload in jobs.store.events(job_id, after=seq):
+                if phase == "failed" and not payload['silent']:
+                    with errors.expander("🛑 Error Logs (Debug)", expanded=True):
+                        st.code(payload['stderr'], language="text")
+            if job['status'] in FINISHED: break
+            snap = jobs.store.live(job_id)
+            if 'hud' in snap: ph.markdown(snap['hud'], unsafe_allow_html=True)
+            feed = json.loads(snap['live']) if 'live' in snap else None
+            if feed is None:
+                live.empty()
+            elif live_output and feed['kind'] == "code":
+                # Source as it streams in; StreamGuard aborts bad completions before they finish
+                with live.container():
+                    st.caption(f"✍️ {feed['model']} is writing...")
+                    st.code(feed['text'], language='python')
+            elif live_output:
+                # Ring-buffered tail of the running script (full logs stay in the workspace)
+                body = f"<div class='terminal-card'>{html.escape(feed['stdout']) or '...'}</div>"
+                if feed['stderr']: body += f"<div class='terminal-card error-card'>{html.escape(feed['stderr'])}</div>"
+                live.markdown(body, unsafe_allow_html=True)
+            time.sleep(0.15)
+        live.empty()
+
+        # 3. VERIFYING
+        if following:
             ph.markdown(render_hud("VERIFICATION COMPLETE", 100, "#10b981"), unsafe_allow_html=True)
-            time.sleep(0.5)
-            
-            # --- F. RESULTS DECK ---
+        else:
+            ph.empty()
+
+        # --- F. RESULTS DECK ---
+        res = job['result']
+        if res is None:
+            st.error(f"BUILD {job['status'].upper()}: {job['error'] or 'no result'}")
+        else:
             st.write("### 📡 Mission Report")
             
-            t1, t2, t3 = st.tabs(["Output View", "Terminal Stream", "Source Code"])
+            t1, t2, t3, t4 = st.tabs(["Output View", "Terminal Stream", "Source Code", "Timeline"])
             
             with t1:
-                # CHECK FOR RATE LIMIT WARNING
-                if "429" in res['stdout'] or "429" in res['stderr']:
-                    st.warning("⚠️ QUOTA EXCEEDED (429): Google Gemini API rate limit reached. Please wait a moment or check your billing.")
+                # CHECK FOR RATE LIMIT WARNING (structured: 429 outcomes of the model spans)
+                throttled = res.get('throttled') or {}
+                if throttled.get('429s') and (throttled.get('exhausted') or not res['success']):
+                    hint = f" The API asked to retry in {throttled['retry_after']:.0f}s." if throttled.get('retry_after') else ""
+                    st.warning(f"⚠️ QUOTA EXCEEDED (429): Google Gemini API rate limit reached.{hint} Please wait a moment or check your billing.")
+                elif throttled.get('waited_s', 0) >= 1:
+                    st.caption(f"🚥 Held {throttled['waited_s']:.1f}s by the shared rate limiter ({throttled.get('429s', 0)} throttled call(s)).")
                 
-                # UNIVERSAL VISUALIZER
-                images = []
-                for ext in ["*.png", "*.jpg", "*.jpeg", ".svg"]:
-                    images.extend(glob.glob(ext))
+                # UNIVERSAL VISUALIZER: hash-cached thumbnails, full resolution only on request
+                images = res.get('manifest') or [{"name": os.path.basename(p), "path": p, "type": "", "bytes": 0, "sha256": ""}
+                                                 for p in res['artifacts']]
                 
                 if images:
                     st.info(f"Visual Artifacts Detected: {len(images)}")
+                    thumbs = get_thumbnails()
                     cols = st.columns(len(images)) if len(images) < 4 else st.columns(3)
-                    for i, img_path in enumerate(images):
+                    for i, art in enumerate(images):
                         with cols[i % len(cols)]:
-                            st.image(img_path, caption=img_path, use_column_width=True)
+                            size = f" · {art['bytes'] / 1024:.0f} KB" if art['bytes'] else ""
+                            preview = thumbs.get(art)
+                            st.image(preview, caption=art['name'] + size, width="stretch")
+                            if preview != art['path'] and st.toggle("🔍 Full size", key=f"full_{job_id}_{i}"):
+                                st.image(art['path'], width="stretch")
                 
                 if res['stdout'].strip():
                     st.markdown(f"<div class='terminal-card'>{res['stdout']}</div>", unsafe_allow_html=True)
@@ -546,10 +461,34 @@ try:
                         st.info("Program completed silently.")
 
             with t2:
+                m = res['metrics']
+                if m:
+                    ttfo = f"{m['ttfo_s']:.2f}s" if m['ttfo_s'] is not None else "n/a"
+                    if m.get('cached'): st.caption("Replayed from the execution cache (identical script and environment).")
+                    else: st.caption(f"Run time {m['run_s']:.2f}s · time to first output {ttfo} · stdout {m['stdout_bytes']} B · stderr {m['stderr_bytes']} B")
+                st.caption(f"Job {job_id} · {res['attempts']} attempt(s) · queued {res['timings']['queued_s']:.2f}s · build {res['timings']['run_s']:.2f}s")
+                for r, spec in enumerate(res.get('speculation') or [], 1):
+                    temp = f" @ temperature {spec['temperature']}" if spec['temperature'] is not None else ""
+                    won = f"candidate {spec['winner'] + 1} ({spec['model']}{temp}) won" if spec['winner'] is not None else "no candidate passed"
+                    st.caption(f"Speculative round {r}: {spec['n']} candidates raced · {won}")
+                hist = res.get('history')
+                if hist:
+                    how = "re-ran its script without a model call" if hist['use'] == "reuse" else "sent its script as a verified example"
+                    st.caption(f"Run history: {hist['score']:.0%} match with run #{hist['run']} · {how}")
                 st.text_area("Full Stderr", value=res['stderr'], height=200)
                 
             with t3:
                 st.code(res['code'], language='python')
+
+            with t4:
+                if res.get('trace'):
+                    st.markdown(render_waterfall(res['trace']), unsafe_allow_html=True)
+                    st.caption(f"{len(res['trace']['spans'])} spans · {res['trace']['duration']:.2f}s · full traces in `.ouroboros_cache/traces.jsonl`")
+                else:
+                    st.caption("No trace recorded for this build.")
                 
 except Exception as e:
     st.error(f"CRITICAL SYSTEM FAILURE: {str(e)}")
+
+# --- G. RERUN PROFILE ---
+rerun_profile.record("build" if run_build else "rerun", time.perf_counter() - _rerun_started)
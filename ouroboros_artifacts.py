@@ -0,0 +1,264 @@
+"""ARTIFACT PIPELINE: manifest of what a sandbox run saved, plus hash-keyed thumbnails.
+
+Inside the sandbox, `install_hooks` wraps `Figure.savefig` and
+`PIL.Image.Image.save`, so every saved file is appended to a per-workspace
+journal the moment it is written. Warm children install the hooks directly.
+Cold interpreters load them through a generated sitecustomize (see `hook_env`),
+which then runs the sitecustomize it shadows, so the script, its tracebacks
+and the environment's own startup hooks are untouched. The runner turns the
+journal into a manifest:
+
+    [{"name": "sine.png", "path": ".../sine.png", "type": "image/png",
+      "bytes": 48213, "sha256": "9f2c...", "via": "savefig"}]
+
+Files written any other way, or restored from the execution cache, are still
+picked up by a scan of the workspace. `ThumbnailCache` renders each image once
+per content hash, so the UI sends small previews and loads originals only on
+request.
+"""
+import json
+import os
+import sys
+import threading
+
+JOURNAL = ".ouroboros_artifacts.jsonl"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".svg", ".gif", ".webp")
+_pkg_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- A. SANDBOX SIDE (keep this part import-light: it runs in every child) ---
+
+def _record(journal, target, via):
+    if not isinstance(target, (str, os.PathLike)): return  # file objects / BytesIO never reach the disk by name
+    try:
+        with open(journal, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"path": os.path.abspath(os.fspath(target)), "via": via}) + "\n")
+    except OSError:
+        pass
+
+
+def _patch_matplotlib(journal):
+    from matplotlib.figure import Figure
+    original = Figure.savefig
+    if getattr(original, "_ouroboros_hook", False): return
+
+    def savefig(self, fname, *args, **kwargs):
+        out = original(self, fname, *args, **kwargs)
+        _record(journal, fname, "savefig")
+        return out
+    savefig._ouroboros_hook = True
+    Figure.savefig = savefig
+
+
+def _patch_pil(journal):
+    from PIL import Image
+    original = Image.Image.save
+    if getattr(original, "_ouroboros_hook", False): return
+
+    def save(self, fp, *args, **kwargs):
+        out = original(self, fp, *args, **kwargs)
+        _record(journal, fp, "PIL")
+        return out
+    save._ouroboros_hook = True
+    Image.Image.save = save
+
+
+class _PostImportHook:
+    """Meta-path finder that patches a module right after its first import (cold runs never pay for it otherwise)"""
+    def __init__(self, hooks):
+        self.hooks = hooks  # module name -> callable
+
+    def find_spec(self, name, path, target=None):
+        if name not in self.hooks: return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"): continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None: break
+        else:
+            return None
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"): return spec
+        exec_module, hook = spec.loader.exec_module, self.hooks.pop(name)
+
+        def exec_and_patch(module):
+            exec_module(module)
+            try: hook()
+            except Exception: pass
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+
+def install_hooks(journal):
+    """Journal every savefig / PIL save of this process to `journal`"""
+    if not journal: return
+    pending = {}
+    for module, patch in (("matplotlib.figure", _patch_matplotlib), ("PIL.Image", _patch_pil)):
+        hook = lambda patch=patch: patch(journal)
+        if module in sys.modules:
+            try: hook()
+            except Exception: pass
+        else:
+            pending[module] = hook
+    if pending: sys.meta_path.insert(0, _PostImportHook(pending))
+
+
+def _site_dir():
+    """Directory with a sitecustomize that installs the hooks in a cold interpreter"""
+    site = os.path.join(os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache")), "sandbox_site")
+    path = os.path.join(site, "sitecustomize.py")
+    body = ("import os, sys\n"
+            f"sys.path.insert(0, {_pkg_dir!r})\n"
+            "try:\n"
+            "    import ouroboros_artifacts\n"
+            "    ouroboros_artifacts.install_hooks(os.environ.get('OUROBOROS_ARTIFACT_JOURNAL'))\n"
+            "except Exception:\n"
+            "    pass\n"
+            "finally:\n"
+            f"    sys.path.remove({_pkg_dir!r})\n"
+            # This file shadows any sitecustomize further down the path (a venv's, a distro's): run that one too
+            "import importlib.machinery, importlib.util\n"
+            "_here = os.path.dirname(os.path.abspath(__file__))\n"
+            "_spec = importlib.machinery.PathFinder.find_spec('sitecustomize', [p for p in sys.path if os.path.abspath(p or '.') != _here])\n"
+            "if _spec is not None:\n"
+            "    _mod = sys.modules['sitecustomize'] = importlib.util.module_from_spec(_spec)\n"
+            "    _spec.loader.exec_module(_mod)\n")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == body: return site
+    except OSError:
+        pass
+    os.makedirs(site, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f: f.write(body)
+    os.replace(tmp, path)
+    return site
+
+
+def hook_env(journal, env=None):
+    """Environment for a cold `python script.py` that journals its saves to `journal`"""
+    env = dict(env if env is not None else os.environ)
+    try:
+        site = _site_dir()
+    except OSError:
+        return env
+    env["PYTHONPATH"] = site + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    env["OUROBOROS_ARTIFACT_JOURNAL"] = journal
+    return env
+
+
+# --- B. RUNNER SIDE ---
+
+def file_sha256(path):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+    return h.hexdigest()
+
+
+def build_manifest(root, patterns, hashes=None):
+    """Journal entries inside `root` first (in save order), then anything else the scan finds.
+    `hashes` memoises digests by (path, size, mtime) across calls."""
+    import glob
+    import mimetypes
+    hashes = {} if hashes is None else hashes
+    seen, entries = set(), []
+
+    def add(path, via):
+        path = os.path.abspath(path)
+        if path in seen or os.path.islink(path) or not os.path.isfile(path): return
+        if os.path.dirname(path) != os.path.abspath(root) or not path.lower().endswith(IMAGE_EXTS): return
+        st = os.stat(path)
+        sig = (path, st.st_size, st.st_mtime_ns)
+        if sig not in hashes: hashes[sig] = file_sha256(path)
+        seen.add(path)
+        entries.append({"name": os.path.basename(path), "path": path, "type": mimetypes.guess_type(path)[0] or "application/octet-stream",
+                        "bytes": st.st_size, "sha256": hashes[sig], "via": via})
+
+    journaled = {}
+    try:
+        with open(os.path.join(root, JOURNAL), "r", encoding="utf-8") as f:
+            for line in f:
+                try: rec = json.loads(line)
+                except ValueError: continue
+                # savefig("plot") writes plot.png; matplotlib's own PIL save of the same file keeps the savefig label
+                path = rec["path"] if os.path.exists(rec["path"]) else rec["path"] + ".png"
+                if journaled.get(path) != "savefig": journaled[path] = rec["via"]
+    except OSError:
+        pass
+    for path, via in journaled.items(): add(path, via)
+    for p in patterns:
+        for path in sorted(glob.glob(os.path.join(root, p))): add(path, "scan")
+    return entries
+
+
+def copy_out(manifest, out_dir):
+    """Copy a run's artifacts somewhere durable -> manifest pointing at the copies"""
+    if not manifest: return []
+    import shutil
+    os.makedirs(out_dir, exist_ok=True)
+    copied = []
+    for entry in manifest:
+        dest = os.path.join(out_dir, entry["name"])
+        shutil.copy2(entry["path"], dest)
+        copied.append(dict(entry, path=dest))
+    return copied
+
+
+class ThumbnailCache:
+    """Downscaled previews keyed by content hash: rendered once, reused by every rerun, job and session"""
+    def __init__(self, root, size=(640, 640), max_files=2000):
+        self.root = root
+        self.size = size
+        self.max_files = max_files
+        self.stats = {"hits": 0, "renders": 0, "passthrough": 0}
+        self._lock = threading.Lock()
+
+    def get(self, entry):
+        """-> path of the preview (the original itself for SVGs, small files and anything PIL cannot read)"""
+        if entry["type"] == "image/svg+xml" or entry["bytes"] < 32 * 1024:
+            with self._lock: self.stats["passthrough"] += 1
+            return entry["path"]
+        stem = os.path.join(self.root, entry["sha256"][:2], f"{entry['sha256']}_{self.size[0]}")
+        for ext in (".jpg", ".png"):
+            if os.path.exists(stem + ext):
+                with self._lock: self.stats["hits"] += 1
+                return stem + ext
+        try:
+            return self._render(entry["path"], stem)
+        except Exception:
+            with self._lock: self.stats["passthrough"] += 1
+            return entry["path"]
+
+    def _render(self, src, stem):
+        from PIL import Image
+        with Image.open(src) as img:
+            img.seek(0)
+            img.thumbnail(self.size)
+            # Photos/plots without transparency compress far better as JPEG
+            if img.mode in ("RGBA", "LA"): alpha = img.getchannel("A").getextrema()[0] < 255
+            else: alpha = img.mode == "P" and "transparency" in img.info
+            ext = ".png" if alpha else ".jpg"
+            os.makedirs(os.path.dirname(stem), exist_ok=True)
+            tmp = f"{stem}.{os.getpid()}.{threading.get_ident()}.tmp"
+            if alpha: img.save(tmp, "PNG", optimize=True)
+            else: img.convert("RGB").save(tmp, "JPEG", quality=82, optimize=True)
+        os.replace(tmp, stem + ext)
+        with self._lock:
+            self.stats["renders"] += 1
+            prune = self.stats["renders"] % 64 == 0
+        if prune: self._prune()
+        return stem + ext
+
+    def _prune(self):
+        import glob
+        files = []
+        for p in glob.glob(os.path.join(self.root, "*", "*")):
+            try: files.append((os.path.getatime(p), p))
+            except OSError: pass
+        files.sort()
+        for _, p in files[:max(0, len(files) - self.max_files)]:
+            try: os.remove(p)
+            except OSError: pass
+
+    def summary(self):
+        return f"{self.stats['renders']} rendered / {self.stats['hits']} reused"
@@ -0,0 +1,171 @@
+"""BATCH MODE: run a JSONL file of builder/surgeon tasks through the Invictus pipeline.
+
+Each input line is a task:
+
+    {"id": "q3-report", "prompt": "Plot monthly revenue from sales_data.csv"}
+    {"id": "fix-17", "mode": "surgeon", "prompt": "<broken code>", "error": "<traceback>"}
+
+and produces one output line (final code, stdout/stderr, artifacts, attempts,
+timings). Tasks already present in the output file are skipped, so a crashed
+or interrupted batch is resumed by running the same command again; tasks whose
+record carries an `error` (the pipeline raised) are run again. Ids name the
+artifact directory of a task, so they must be unique and must not contain path
+separators. Data files are linked from the current directory, exactly like the
+dashboard.
+
+    python ouroboros_batch.py tasks.jsonl -o results.jsonl --concurrency 4 --rpm 60
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ouroboros_artifacts import copy_out
+from ouroboros_ratelimit import RateLimiter
+from ouroboros_jobs import default_engine_factory
+
+MODES = {"builder": "architect", "architect": "architect", "surgeon": "surgeon"}
+
+
+def bad_id(task_id):
+    """Why an id cannot name an artifact directory, or None"""
+    if not task_id: return "empty id"
+    if any(c in task_id for c in "/\\\0") or task_id in (".", ".."): return "path separator or '..' in id"
+    return None
+
+
+def load_tasks(path):
+    """-> [task]; tasks without an id get a stable one derived from their content; bad or repeated ids are skipped"""
+    tasks, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try:
+                task = json.loads(line)
+            except ValueError:
+                print(f"skipping line {n}: not JSON", file=sys.stderr)
+                continue
+            task["id"] = str(task.get("id") or hashlib.sha1(line.strip().encode("utf-8")).hexdigest()[:12])
+            problem = bad_id(task["id"]) or ("duplicate id" if task["id"] in seen else None)
+            if problem:
+                print(f"skipping line {n}: {problem} {task['id']!r}", file=sys.stderr)
+                continue
+            seen.add(task["id"])
+            task["mode"] = MODES.get(task.get("mode", "builder"), "architect")
+            tasks.append(task)
+    return tasks
+
+
+def finished_ids(path):
+    """Ids already written to the output file without an error (a torn last line from a crash is ignored)"""
+    done = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if "error" not in record: done.add(record["id"])
+                except (ValueError, KeyError, TypeError): pass
+    except OSError:
+        pass
+    return done
+
+
+class BatchRunner:
+    """Bounded pool of pipeline runs; one engine per worker thread, one rate limiter for all"""
+
+    def __init__(self, engine_factory, key, out_path, artifacts_dir, concurrency=4, use_cache=True, max_reflexion=5):
+        self.engine_factory = engine_factory
+        self.key = key
+        self.out_path = out_path
+        self.artifacts_dir = artifacts_dir
+        self.concurrency = concurrency
+        self.use_cache = use_cache
+        self.max_reflexion = max_reflexion
+        self.stats = {"ok": 0, "failed": 0, "errors": 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _engine(self):
+        if getattr(self._local, "engine", None) is None:
+            self._local.engine = self.engine_factory(self.key)
+        return self._local.engine
+
+    def run_task(self, task):
+        started = time.time()
+        record = {"id": task["id"], "mode": task["mode"]}
+        try:
+            self._engine().client = task["id"]
+            res = self._engine().build(task["prompt"], mode=task["mode"], error_context=task.get("error"),
+                                       use_cache=self.use_cache, max_reflexion=self.max_reflexion)
+            manifest = copy_out(res['manifest'], os.path.join(self.artifacts_dir, task["id"]))
+            res['workspace'].discard()
+            record.update(success=res['success'], code=res['code'], stdout=res['stdout'], stderr=res['stderr'],
+                          artifacts=[m["path"] for m in manifest], manifest=manifest, attempts=res['attempts'], speculation=res['speculation'], metrics=res['metrics'],
+                          limit=res.get('limit'), throttled=res.get('throttled'), history=res.get('history'), phase_s=self._engine().tracer.summary())
+        except Exception as e:
+            record.update(success=False, error=str(e))
+        record["elapsed_s"] = round(time.time() - started, 3)
+        return record
+
+    def write(self, out, record):
+        with self._lock:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            self.stats["ok" if record["success"] else ("errors" if "error" in record else "failed")] += 1
+
+    def run(self, tasks):
+        started = time.time()
+        with open(self.out_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="invictus-batch") as pool:
+            futures = {pool.submit(self.run_task, t): t for t in tasks}
+            for n, fut in enumerate(as_completed(futures), 1):
+                record = fut.result()
+                self.write(out, record)
+                status = "ok" if record["success"] else "FAILED"
+                print(f"[{n}/{len(tasks)}] {record['id']}: {status} in {record['elapsed_s']:.1f}s", file=sys.stderr)
+        return time.time() - started
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Run a JSONL file of builder/surgeon tasks through the Invictus pipeline.")
+    p.add_argument("tasks", help="input JSONL, one task per line")
+    p.add_argument("-o", "--output", help="output JSONL (default: <tasks>.results.jsonl); existing ids are skipped")
+    p.add_argument("--concurrency", type=int, default=int(os.environ.get("OUROBOROS_BATCH_CONCURRENCY", "4")))
+    p.add_argument("--rpm", type=float, default=float(os.environ.get("OUROBOROS_RPM", "60")),
+                   help="model requests per minute across all workers (per-model budgets: OUROBOROS_MODEL_RPM / OUROBOROS_TPM)")
+    p.add_argument("--speculate", type=int, default=None,
+                   help="candidate scripts raced per generation round (default: OUROBOROS_SPECULATE or 1)")
+    p.add_argument("--max-reflexion", type=int, default=5)
+    p.add_argument("--no-cache", action="store_true", help="bypass the response and execution caches")
+    args = p.parse_args(argv)
+
+    key = os.environ.get("OUROBOROS_API_KEY")
+    if not key:
+        p.error("set OUROBOROS_API_KEY")
+    out_path = args.output or os.path.splitext(args.tasks)[0] + ".results.jsonl"
+    tasks = load_tasks(args.tasks)
+    done = finished_ids(out_path)
+    todo = [t for t in tasks if t["id"] not in done]
+    print(f"{len(tasks)} tasks, {len(tasks) - len(todo)} already done, running {len(todo)} "
+          f"(concurrency {args.concurrency}, {args.rpm:g} rpm)", file=sys.stderr)
+    if not todo:
+        return 0
+
+    limiter = RateLimiter.from_env(rpm=args.rpm)
+    runner = BatchRunner(default_engine_factory(limiter=limiter, speculate=args.speculate), key, out_path,
+                         os.path.splitext(out_path)[0] + "_artifacts", concurrency=args.concurrency,
+                         use_cache=not args.no_cache, max_reflexion=args.max_reflexion)
+    elapsed = runner.run(todo)
+    s = runner.stats
+    print(f"done: {s['ok']} ok, {s['failed']} failed, {s['errors']} errors in {elapsed:.1f}s "
+          f"-> {len(todo) / elapsed * 60:.1f} tasks/min (rate limiter: {limiter.summary()})", file=sys.stderr)
+    return 0 if s["failed"] == s["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
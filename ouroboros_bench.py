@@ -0,0 +1,183 @@
+"""PIPELINE BENCHMARK: end-to-end latency of representative builds on the fake backend.
+
+Every task runs the full InvictusEngine.build (cascade, healing, reflexion,
+sandbox) against a scripted FakeGemini, so numbers only move when the pipeline
+does. Reports per-phase latency, model attempts, prompt volume, sandbox spawns
+and reflexion rounds, and compares with the last saved baseline:
+
+    python ouroboros_bench.py                       # all tasks, 3 repeats
+    python ouroboros_bench.py --save                # ... and store as the new baseline
+    python ouroboros_bench.py --task repair --repeat 10 --cold
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from ouroboros_core import InvictusEngine, ModelHealth, DependencyResolver, current_dir, cache_dir
+from ouroboros_fake import FakeGemini
+from ouroboros_history import RunHistory
+from ouroboros_memory import RepairMemory
+from ouroboros_ratelimit import RateLimiter
+
+BASELINE = os.path.join(cache_dir, "bench_baseline.json")
+
+PLOT = ("# bench:plot\nimport matplotlib\nmatplotlib.use('Agg')\nimport matplotlib.pyplot as plt\nimport numpy as np\n"
+        "x = np.linspace(0, 2 * np.pi, 200)\nplt.plot(x, np.sin(x))\nplt.savefig('sine.png')\nprint('saved sine.png')")
+LORENZ = ("import numpy as np\nimport matplotlib.pyplot as plt\nfrom scipy.integrate import odeint\n"
+          "def lorenz(state, t, sigma=10, rho=28, beta=8/3):\n    x, y, z = state\n"
+          "    return sigma * (y - x), x * (rho - z) - y, x * y - beta * z\n"
+          "states = odeint(lorenz, [1.0, 1.0, 1.0], np.arange(0.0, 40.0, 0.01))\n"
+          "fig = plt.figure()\nax = fig.add_subplot(111, projection='3d')\n"
+          "ax.plot(states[:, 0], states[:, 1], states[:, 2])\nplt.savefig('lorenz_final.png')\nprint('Chaos Theory Visualized.')")
+SNAKE = ("import matplotlib.pyplot as plt\nimport random\nx, y = [0], [0]\nfor _ in range(50):\n"
+         "    dx, dy = random.choice([(0,1), (0,-1), (1,0), (-1,0)])\n    x.append(x[-1] + dx)\n    y.append(y[-1] + dy)\n"
+         "plt.plot(x, y)\nplt.savefig('snake_final.png')\nprint('Snake Path Generated Successfully.')")
+BROKEN = "# bench:repair\nvalues = [3, 1, 2]\nprint(sorted(values)[3])"
+FIXED = "# bench:repair\nvalues = [3, 1, 2]\nprint(sorted(values)[-1])"
+SILENT = "# bench:silent\ntotal = sum(range(10))"
+LOUD = "# bench:silent\ntotal = sum(range(10))\nprint(total)"
+HEAL = "# bench:heal\nprint(np.arange(5).sum())"
+# Optional import with a fallback: must run as is, not bounce off the pre-flight (regression)
+GUARDED = ("# bench:guarded\ntry:\n    import ujson_xyz as json\nexcept ImportError:\n    import json\n"
+           "print(json.dumps({'ok': True}))")
+SCATTER = ("# bench:scatter\nimport numpy as np\nimport matplotlib\nmatplotlib.use('Agg')\nimport matplotlib.pyplot as plt\n"
+           "x, y = np.random.default_rng(0).random((2, 200))\nplt.scatter(x, y, c='viridis')\nplt.savefig('dots.png')\nprint('saved dots.png')")
+# Streamed with Live Output: the fake wraps every answer in ```python fences (regression)
+CHATTY = "# bench:chatty\nprint('fenced')\n```\nThis prints one line."
+PATCH_BROKEN = ("# bench:patch\nimport numpy as np\nimport matplotlib\nmatplotlib.use('Agg')\nimport matplotlib.pyplot as plt\n\n"
+                "data = np.random.default_rng(0).random(10000)\nfig, axes = plt.subplots(1, 2, figsize=(8, 3))\n"
+                "axes[0].hist(data, bins=40)\naxes[1].imshow(data)\nfig.savefig('panels.png')\nprint('mean', data.mean())")
+PATCH_DIFF = "@@ -10,2 +10,2 @@\n axes[0].hist(data, bins=40)\n-axes[1].imshow(data)\n+axes[1].imshow(data.reshape(100, 100))\n fig.savefig('panels.png')"
+
+# name -> (prompt, mode, error_context, fake script[, engine options])
+# Options the bench itself takes: "stream" (stream like Live Output), "expect_calls" (any other call count fails the task)
+TASKS = {
+    "plot": ("Plot a sine wave (bench:plot)", "architect", None,
+             {"responses": [{"match": "bench:plot", "code": PLOT}]}),
+    "lorenz": (f"Execute this EXACT Python code for Lorenz Attractor:\n```python\n{LORENZ}\n```", "architect", None, {}),
+    "snake": (f"Execute this EXACT Python code for the Snake simulation:\n```python\n{SNAKE}\n```", "architect", None, {}),
+    "repair": (BROKEN, "surgeon", "IndexError: list index out of range",
+               {"responses": [{"match": "bench:repair", "replies": [BROKEN, FIXED]}]}),
+    "silent": ("Sum the first ten integers (bench:silent)", "architect", None,
+               {"responses": [{"match": "bench:silent", "replies": [SILENT, LOUD]}]}),
+    "speculate": ("Sum the first ten integers (bench:silent)", "architect", None,
+                  {"responses": [{"match": "bench:silent", "replies": [SILENT, LOUD]}]}, {"speculate": 2}),
+    "repair-diff": ("Histogram and heatmap of random data (bench:patch)", "architect", None,
+                    {"responses": [{"match": "unified diff", "code": PATCH_DIFF}, {"match": "bench:patch", "code": PATCH_BROKEN}]}),
+    "memory-fix": ("Scatter plot of random points (bench:scatter)", "architect", None,
+                   {"responses": [{"match": "bench:scatter", "code": SCATTER}]}),
+    "heal-import": ("Sum a numpy range (bench:heal)", "architect", None,
+                    {"responses": [{"match": "bench:heal", "code": HEAL}]}),
+    "guarded-import": ("Dump a dict as JSON (bench:guarded)", "architect", None,
+                       {"responses": [{"match": "bench:guarded", "code": GUARDED}]}),
+    "stream-fenced": ("Print a line (bench:fenced)", "architect", None,
+                      {"trailer": "\n", "responses": [{"match": "bench:fenced", "code": "print('fenced')"}]},
+                      {"stream": True, "expect_calls": 1}),
+    "stream-prose": ("Print a line (bench:chatty)", "architect", None,
+                     {"responses": [{"match": "bench:chatty", "replies": [CHATTY, "print('fenced')"]}]},
+                     {"stream": True, "expect_calls": 2}),
+    "cascade-404": ("Plot a sine wave (bench:plot)", "architect", None,
+                    {"models": {"gemini-1.5-flash": {"fail": "404"}}, "responses": [{"match": "bench:plot", "code": PLOT}]}),
+    "quota-429": ("Plot a sine wave (bench:plot)", "architect", None,
+                  {"models": {"gemini-1.5-flash": {"fail": "429"}, "gemini-1.5-pro": {"fail": "429"}},
+                   "responses": [{"match": "bench:plot", "code": PLOT}]}),
+    "quota-retry": ("Plot a sine wave (bench:plot)", "architect", None,
+                    {"models": {m: {"fail": "429", "fail_times": 1, "retry_after": 1}
+                                for m in ("gemini-1.5-flash", "gemini-1.5-pro", "gemini-1.0-pro", "gemini-pro")},
+                     "responses": [{"match": "bench:plot", "code": PLOT}]}),
+    "slow-flash": ("Plot a sine wave (bench:plot)", "architect", None,
+                   {"models": {"gemini-1.5-flash": {"fail": "timeout", "hang": 8}},
+                    "responses": [{"match": "bench:plot", "code": PLOT}]}),
+}
+FIELDS = ["wall_s", "generate_s", "execute_s", "model_calls", "prompt_kb", "sandbox_runs", "reflexion_rounds"]
+
+
+def run_task(name, pool=None, resolver=None, latency=0.3):
+    """One fresh engine + fake backend + health board per run -> metrics dict"""
+    prompt, mode, error_context, script, *options = TASKS[name]
+    options = dict(options[0]) if options else {}
+    stream = options.pop("stream", False)
+    expect_calls = options.pop("expect_calls", None)
+    fake = FakeGemini(dict({"latency": latency}, **script))
+    tmp = tempfile.mkdtemp(prefix="ouroboros_bench_")
+    eng = InvictusEngine("bench", backend=fake, health=ModelHealth(os.path.join(tmp, "health.json")),
+                         pool=pool, resolver=resolver, memory=RepairMemory(os.path.join(tmp, "repair_memory.json")),
+                         history=RunHistory(os.path.join(tmp, "history.sqlite3")), limiter=RateLimiter(), **options)
+    marks = []
+    started = time.perf_counter()
+    try:
+        res = eng.build(prompt, mode=mode, error_context=error_context, use_cache=False,
+                        on_partial=(lambda model, text: None) if stream else None,
+                        on_event=lambda phase, payload: marks.append((phase, time.perf_counter())))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    ended = time.perf_counter()
+    res['workspace'].discard()
+
+    # generate -> execute is model time, execute -> next event (or the end) is sandbox time
+    phases = {"generate": 0.0, "execute": 0.0}
+    for (phase, at), (_, nxt) in zip(marks, marks[1:] + [(None, ended)]):
+        if phase in phases: phases[phase] += nxt - at
+    calls = fake.summary()["calls"]
+    return {"ok": res['success'] and expect_calls in (None, calls), "wall_s": ended - started, "generate_s": phases["generate"], "execute_s": phases["execute"],
+            "model_calls": calls,
+            "prompt_kb": sum(sp.get("bytes_in", 0) for sp in res['trace']['spans'] if sp["name"] == "model") / 1024,
+            "sandbox_runs": eng.sandbox_runs, "reflexion_rounds": res['attempts'] - 1}
+
+
+def _median(xs):
+    xs = sorted(xs)
+    return xs[len(xs) // 2]
+
+
+def _delta(now, before):
+    if not before or now is None: return ""
+    return f" ({(now - before) / before * 100:+.0f}%)"
+
+
+def main(argv):
+    repeat = int(argv[argv.index("--repeat") + 1]) if "--repeat" in argv else 3
+    names = [argv[argv.index("--task") + 1]] if "--task" in argv else list(TASKS)
+    try:
+        with open(BASELINE, "r", encoding="utf-8") as f: base = json.load(f)["tasks"]
+    except (OSError, ValueError, KeyError):
+        base = {}
+
+    pool = None
+    if "--cold" not in argv:
+        from ouroboros_warm import WarmPool
+        if WarmPool.available():
+            pool = WarmPool(size=1, cwd=current_dir)
+            pool._idle.queue[0].wait_ready()
+    resolver = DependencyResolver()
+
+    report = {}
+    print(f"{'task':<15}" + "".join(f"{f:>18}" for f in FIELDS))
+    try:
+        for name in names:
+            runs = [run_task(name, pool, resolver) for _ in range(repeat)]
+            row = {f: round(_median([r[f] for r in runs]), 3) for f in FIELDS}
+            row["ok"] = all(r["ok"] for r in runs)
+            report[name] = row
+            prev = base.get(name, {})
+            cells = []
+            for f in FIELDS:
+                cell = f"{row[f]:.2f}" if f.endswith(("_s", "_kb")) else f"{row[f]:g}"
+                cells.append(f"{cell + _delta(row[f], prev.get(f)):>18}")
+            print(f"{name:<15}" + "".join(cells) + ("" if row["ok"] else "  FAILED"))
+    finally:
+        if pool: pool.close()
+
+    if "--save" in argv:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump({"at": time.time(), "repeat": repeat, "tasks": dict(base, **report)}, f, indent=1)
+        print(f"baseline saved -> {BASELINE}")
+    return 0 if all(r["ok"] for r in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
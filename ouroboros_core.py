@@ -0,0 +1,1636 @@
+"""INVICTUS CORE: model cascade, sandbox and healing, free of any Streamlit import.
+
+Streamlit re-executes ouroboros.py on every interaction but imports this module
+once per process, so nothing here is rebuilt on a rerun. The slow
+google.generativeai SDK is only imported on the first model call.
+"""
+import subprocess
+import sys
+import os
+import time
+import re
+import glob
+import shutil
+import tempfile
+import json
+import hashlib
+import threading
+import codecs
+import codeop
+import ast
+import builtins
+import warnings
+import signal
+import html
+import copy
+import sqlite3
+import importlib.metadata
+from functools import lru_cache
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ouroboros_deps import DependencyResolver, PIP_MAP, imports_of, is_installed
+from ouroboros_trace import Tracer
+from ouroboros_warm import apply_rlimits, read_capped
+from ouroboros_artifacts import JOURNAL, build_manifest, hook_env
+from ouroboros_patch import PatchError, compact_traceback, number_lines, resolve_reply
+from ouroboros_memory import failure_signature
+from ouroboros_gemini import GeminiClient
+from ouroboros_history import example_prompt
+from ouroboros_ratelimit import RateLimitTimeout, is_throttle, retry_after_hint
+
+# CRITICAL PATH FIX: Always execute in current CWD
+current_dir = os.getcwd()
+runs_dir = os.environ.get("OUROBOROS_RUNS_DIR", os.path.join(tempfile.gettempdir(), "ouroboros_runs"))
+cache_dir = os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(current_dir, ".ouroboros_cache"))
+
+_configured_key = None
+_configure_lock = threading.Lock()
+
+def genai_sdk():
+    """google.generativeai costs ~1s to import: pay it on the first model call, not on page load"""
+    import google.generativeai as genai
+    return genai
+
+def configure_key(key):
+    """genai.configure is process-global: only touch it when the key actually changes"""
+    global _configured_key
+    with _configure_lock:
+        if key != _configured_key:
+            genai_sdk().configure(api_key=key)
+            _configured_key = key
+
+class GeminiBackend:
+    """Legacy backend over google.generativeai (OUROBOROS_BACKEND=legacy): one process-global key, so one key per process"""
+    def __init__(self, key):
+        configure_key(key)
+        self._models = {}  # model name -> GenerativeModel handle
+
+    def _model(self, model_name):
+        handle = self._models.get(model_name)
+        if handle is None: handle = self._models[model_name] = genai_sdk().GenerativeModel(model_name)
+        return handle
+
+    def generate(self, model_name, prompt, timeout, temperature=None):
+        config = {"temperature": temperature} if temperature is not None else None
+        return self._model(model_name).generate_content(prompt, generation_config=config, request_options={"timeout": timeout}).text
+
+    def stream(self, model_name, prompt, timeout):
+        response = self._model(model_name).generate_content(prompt, stream=True, request_options={"timeout": timeout})
+        for chunk in response:
+            try: yield chunk.text
+            except ValueError: continue  # chunk without parts (finish/safety metadata)
+
+    def list_models(self):
+        return [m.name for m in genai_sdk().list_models() if 'generateContent' in m.supported_generation_methods]
+
+def backend_for(key):
+    """google-genai client by default; OUROBOROS_BACKEND=legacy keeps google.generativeai,
+    fake[:script.json] swaps in the scripted stand-in (benchmarks, demos, CI)"""
+    spec = os.environ.get("OUROBOROS_BACKEND", "gemini")
+    if spec.startswith("fake"):
+        from ouroboros_fake import FakeGemini
+        return FakeGemini.from_file(spec.partition(":")[2] or None)
+    if spec == "legacy" or not GeminiClient.available():
+        return GeminiBackend(key)
+    return GeminiClient(key)
+
+def render_hud(phase, pct, color="#3b82f6"):
+    return f"""
+    <div class="hud-card">
+        <div style="color:{color}; font-weight:600; font-family:'Inter'; letter-spacing:1px;">
+            {phase}
+        </div>
+        <div class="hud-progress-track">
+            <div class="hud-progress-bar" style="width: {pct}%; background:{color};"></div>
+        </div>
+    </div>
+    """
+
+def render_waterfall(trace):
+    """Mission Report timeline: one bar per span, nested by parent"""
+    total = max(trace["duration"], 1e-6)
+    depth = {}
+    rows = []
+    for sp in trace["spans"]:
+        depth[sp["id"]] = depth.get(sp["parent"], -1) + 1
+        color = "#10b981" if sp["outcome"] in ("ok", "hit", "cache_hit") else "#fbbf24" if sp["outcome"] in ("miss", "silent") else "#ef4444"
+        label = sp["name"] + "".join(f" · {sp[k]}" for k in ("model", "action") if sp.get(k))
+        left, width = sp["start"] / total * 100, max(sp["duration"] / total * 100, 0.4)
+        rows.append(
+            f"<div style='display:flex; align-items:center; gap:8px; font-size:12px; font-family:JetBrains Mono, monospace;'>"
+            f"<div style='width:32%; padding-left:{depth[sp['id']] * 14}px; white-space:nowrap; overflow:hidden; color:#cbd5e1;'>{html.escape(label)}</div>"
+            f"<div style='flex:1; position:relative; height:12px; background:#111; border-radius:3px;'>"
+            f"<div style='position:absolute; left:{left:.2f}%; width:{width:.2f}%; height:100%; background:{color}; border-radius:3px;'></div></div>"
+            f"<div style='width:90px; text-align:right; color:#94a3b8;'>{sp['duration'] * 1000:.0f} ms</div></div>")
+    return "<div class='hud-card'>" + "".join(rows) + "</div>"
+
+class Workspace:
+    """Private Sandbox: one temp dir per execution holding the script, its artifacts and logs"""
+    SCRIPT_NAME = "ouroboros_exe_v21.py"
+    ARTIFACT_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.svg", "*.gif", "*.webp"]
+    DATA_EXTS = (".csv", ".tsv", ".json", ".txt", ".xlsx", ".xls", ".parquet", ".npy", ".npz", ".dat")
+
+    def __init__(self, root=None, data_dir=None, data=None):
+        root = root or runs_dir
+        os.makedirs(root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix="run_", dir=root)
+        self.script = os.path.join(self.path, self.SCRIPT_NAME)
+        self.journal = os.path.join(self.path, JOURNAL)
+        self.pidfile = os.path.join(self.path, ".ouroboros_pid")  # session leader of the running script
+        self.killed = False
+        self._hashes = {}
+        self._link_data(data_dir or current_dir)
+        if data: data.expose(self.path)  # column cache map + load_table() helper
+
+    def _link_data(self, data_dir):
+        """Scripts open data files by relative path ('sales_data.csv'): expose them read-through"""
+        for name in os.listdir(data_dir):
+            src = os.path.join(data_dir, name)
+            if not name.lower().endswith(self.DATA_EXTS) or not os.path.isfile(src): continue
+            try: os.symlink(src, os.path.join(self.path, name))
+            except OSError:
+                try: shutil.copy2(src, self.path)
+                except OSError: pass
+
+    def write_script(self, code):
+        with open(self.script, "w", encoding='utf-8') as f: f.write(code)
+
+    @property
+    def stdout_log(self): return os.path.join(self.path, "stdout.log")
+
+    @property
+    def stderr_log(self): return os.path.join(self.path, "stderr.log")
+
+    def write_logs(self, stdout, stderr):
+        for name, text in ((self.stdout_log, stdout), (self.stderr_log, stderr)):
+            try:
+                with open(os.path.join(self.path, name), "w", encoding='utf-8') as f: f.write(text or "")
+            except OSError: pass
+
+    def manifest(self):
+        """Saved images (hooked savefig/PIL saves first, then a scan) with type, size and sha256"""
+        return build_manifest(self.path, self.ARTIFACT_PATTERNS, self._hashes)
+
+    def artifacts(self):
+        return [m["path"] for m in self.manifest()]
+
+    def kill(self):
+        """Stop the script running here, with everything it spawned; later runs in this workspace are skipped"""
+        self.killed = True
+        try:
+            with open(self.pidfile, "r", encoding="utf-8") as f: pid = int(f.read())
+            os.killpg(pid, signal.SIGKILL)
+        except (OSError, ValueError):
+            pass
+
+    def discard(self):
+        """Async cleanup so the session never waits on rmtree"""
+        threading.Thread(target=shutil.rmtree, args=(self.path, True), daemon=True).start()
+
+class OutputTail:
+    """Live view of a growing log file: ring buffer of the last lines, full text stays on disk"""
+    def __init__(self, path, max_lines=200):
+        self.path = path
+        self.lines = deque(maxlen=max_lines)
+        self.partial = ""
+        self.size = 0
+        self.first_output_at = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def poll(self):
+        """Pull new bytes -> True if anything arrived"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.size)
+                chunk = f.read(1 << 20)
+        except OSError:
+            return False
+        if not chunk: return False
+        if self.first_output_at is None: self.first_output_at = time.monotonic()
+        self.size += len(chunk)
+        text = self.partial + self._decoder.decode(chunk)
+        *complete, self.partial = text.split("\n")
+        self.lines.extend(complete)
+        return True
+
+    def text(self):
+        return "\n".join(list(self.lines) + ([self.partial] if self.partial else []))
+
+class SandboxLimits:
+    """Per-run resource caps (OUROBOROS_LIMIT_* env vars; 0 disables one)"""
+    DEFAULTS = {"memory_mb": 4096, "cpu_s": 60, "nproc": 64, "fsize_mb": 200,
+                "capture_kb": 2048, "max_artifacts": 20, "artifact_mb": 50}
+
+    def __init__(self, **overrides):
+        for name, default in self.DEFAULTS.items():
+            value = overrides.get(name)
+            if value is None: value = float(os.environ.get(f"OUROBOROS_LIMIT_{name.upper()}", default))
+            setattr(self, name, value)
+
+    @property
+    def capture_cap(self):
+        return int(self.capture_kb * 1024) if self.capture_kb else 1 << 62
+
+    def rlimits(self):
+        """-> [(RLIMIT_NAME, value)] for apply_rlimits()"""
+        out = []
+        if self.memory_mb: out.append(("RLIMIT_AS", int(self.memory_mb * 1024 * 1024)))
+        if self.cpu_s: out.append(("RLIMIT_CPU", int(self.cpu_s)))
+        if self.fsize_mb: out.append(("RLIMIT_FSIZE", int(self.fsize_mb * 1024 * 1024)))
+        if self.nproc:
+            # RLIMIT_NPROC counts every process/thread of the user: allow nproc on top of what already runs
+            out.append(("RLIMIT_NPROC", _user_tasks() + int(self.nproc)))
+        return out
+
+    def breach(self, returncode, stderr):
+        """-> {"kind", "limit", "hint"} when the run died on one of the caps, else None"""
+        sig = -returncode if returncode and returncode < 0 else None
+        if sig == signal.SIGXCPU:
+            return {"kind": "cpu", "limit": f"{self.cpu_s:g} CPU seconds",
+                    "hint": "Reduce the amount of computation: fewer iterations, smaller inputs, vectorised numpy instead of Python loops."}
+        if sig == signal.SIGKILL:
+            return {"kind": "killed", "limit": f"{self.memory_mb:g} MB address space / host memory",
+                    "hint": "The process was killed, usually for running out of memory. Use far smaller data structures."}
+        if sig == signal.SIGXFSZ or "File too large" in stderr:
+            return {"kind": "file_size", "limit": f"{self.fsize_mb:g} MB per file",
+                    "hint": "Write less: summarise instead of printing or saving everything, and save compact images."}
+        if "MemoryError" in stderr or "Unable to allocate" in stderr or "std::bad_alloc" in stderr:
+            return {"kind": "memory", "limit": f"{self.memory_mb:g} MB address space",
+                    "hint": "Use smaller arrays, lower resolution, float32, or process the data in chunks."}
+        if "can't start new thread" in stderr or ("Resource temporarily unavailable" in stderr and ("fork" in stderr or "Thread" in stderr)):
+            return {"kind": "processes", "limit": f"{self.nproc:g} extra processes/threads",
+                    "hint": "Do not spawn processes or thread pools; run the work sequentially."}
+        return None
+
+    def enforce_artifacts(self, paths):
+        """Delete artifacts beyond the count/size quota -> breach dict or None"""
+        budget = self.artifact_mb * 1024 * 1024 if self.artifact_mb else float("inf")
+        kept, total, dropped = 0, 0, 0
+        for p in paths:
+            size = os.path.getsize(p)
+            if (self.max_artifacts and kept >= self.max_artifacts) or total + size > budget:
+                os.remove(p)
+                dropped += 1
+            else:
+                kept += 1
+                total += size
+        if not dropped: return None
+        return {"kind": "artifacts", "limit": f"{self.max_artifacts:g} files / {self.artifact_mb:g} MB",
+                "hint": f"{dropped} file(s) over quota were discarded. Save fewer, smaller images (one figure with subplots, dpi <= 100)."}
+
+def _user_tasks():
+    """Processes + threads the current user already runs (what RLIMIT_NPROC counts)"""
+    uid, n = os.getuid(), 0
+    try:
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit(): continue
+            try:
+                if os.stat(f"/proc/{pid}").st_uid == uid:
+                    n += max(os.stat(f"/proc/{pid}/task").st_nlink - 2, 1)
+            except OSError:
+                pass
+    except OSError:
+        return 0
+    return n
+
+def limit_error(breach, stderr):
+    """Structured limit breach as the stderr the reflexion loop feeds back to the model"""
+    tail = "\n".join(stderr.strip().splitlines()[-5:])
+    return (f"RESOURCE LIMIT EXCEEDED: {breach['kind']} (limit: {breach['limit']}).\n"
+            f"ACTION: {breach['hint']}\n" + (f"LAST OUTPUT:\n{tail}\n" if tail else ""))
+
+def sweep_workspaces(max_age=6 * 3600, root=None):
+    """Remove workspaces orphaned by crashed or killed sessions"""
+    cutoff = time.time() - max_age
+    for p in glob.glob(os.path.join(root or runs_dir, "run_*")):
+        try:
+            if os.path.getmtime(p) < cutoff: shutil.rmtree(p, ignore_errors=True)
+        except OSError: pass
+
+class ResponseCache:
+    """Two-Tier Response Cache: in-process LRU in front of an on-disk store"""
+    def __init__(self, root, max_items=256, max_disk_items=2048, ttl=7 * 24 * 3600, enabled=True):
+        self.root = root
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self.enabled = enabled and os.environ.get("OUROBOROS_CACHE", "1") != "0"
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(full_prompt, mode, model_name):
+        h = hashlib.sha256()
+        for part in (mode, model_name, full_prompt):
+            h.update(part.encode('utf-8'))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key):
+        return self.lookup([key])[1]
+
+    def peek(self, keys):
+        """Is any of keys stored? (no stats, no LRU update)"""
+        if not self.enabled: return False
+        with self._lock:
+            if any(key in self._mem for key in keys): return True
+        return any(os.path.exists(self._path(key)) for key in keys)
+
+    def lookup(self, keys):
+        """First live entry among keys -> (key, text); one miss if none match"""
+        if not self.enabled: return None, None
+        for key in keys:
+            text = self._get(key)
+            if text is not None: return key, text
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, None
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if now - entry["created"] <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry["text"]
+                del self._mem[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding='utf-8') as f: entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                return None
+            if now - entry.get("created", 0) > self.ttl:
+                try: os.remove(path)
+                except OSError: pass
+                return None
+            self._remember(key, entry)
+            self.stats["disk_hits"] += 1
+            return entry["text"]
+
+    def put(self, key, text, model_name="", mode=""):
+        if not self.enabled: return
+        entry = {"created": time.time(), "model": model_name, "mode": mode, "text": text}
+        with self._lock:
+            self._remember(key, entry)
+            self.stats["writes"] += 1
+            prune = self.stats["writes"] % 32 == 0
+        try:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding='utf-8') as f: json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        if prune: self._prune_disk()
+
+    def discard(self, key):
+        """Drop an entry (e.g. cached code that later failed to run)"""
+        if not key: return
+        with self._lock:
+            self._mem.pop(key, None)
+        try: os.remove(self._path(key))
+        except OSError: pass
+
+    def _remember(self, key, entry):
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def _prune_disk(self):
+        """Expire stale files, then evict oldest until under max_disk_items"""
+        files = []
+        for p in glob.glob(os.path.join(self.root, "*", "*.json")):
+            try: files.append((os.path.getmtime(p), p))
+            except OSError: pass
+        files.sort()
+        cutoff = time.time() - self.ttl
+        excess = len(files) - self.max_disk_items
+        for i, (mtime, p) in enumerate(files):
+            if i < excess or mtime < cutoff:
+                try: os.remove(p)
+                except OSError: pass
+
+    def summary(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        rate = (100.0 * hits / total) if total else 0.0
+        return f"{hits} hits / {self.stats['misses']} misses ({rate:.0f}%)"
+
+VERBATIM_DIRECTIVE = re.compile(r'\b(?:execute|run)\s+(?:this|the following)\s+(?:exact|verbatim)\b', re.I)
+
+def verbatim_code(prompt):
+    """Quick Ops style 'Execute this EXACT Python code' prompts carry their own script: no model needed"""
+    if not prompt or not VERBATIM_DIRECTIVE.search(prompt): return None
+    blocks = re.findall(r'```(?:python|py)?[ \t]*\n(.*?)```', prompt, re.S)
+    if len(blocks) != 1: return None
+    try:
+        compile(blocks[0], "<verbatim>", "exec")
+    except (SyntaxError, ValueError):
+        return None
+    return blocks[0].strip()
+
+# Calls whose result changes between runs (suffix match on the dotted call name)
+NONDETERMINISTIC_CALLS = {
+    "time.time", "time.time_ns", "time.perf_counter", "time.monotonic", "time.process_time",
+    "time.localtime", "time.gmtime", "time.ctime", "time.strftime", "datetime.now", "datetime.today",
+    "datetime.utcnow", "date.today", "os.urandom", "os.getpid", "uuid.uuid1", "uuid.uuid4", "input",
+}
+NONDETERMINISTIC_MODULES = {"secrets", "socket", "requests", "urllib", "http", "httpx", "aiohttp",
+                            "getpass", "multiprocessing", "threading", "subprocess"}
+
+def _dotted(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name): parts.append(node.id)
+    elif isinstance(node, ast.Call): parts.append(_dotted(node.func) + "()")
+    return ".".join(reversed(parts))
+
+def is_deterministic(code):
+    """Conservative: no clock reads, no I/O-ish modules, randomness only when explicitly seeded"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    uses_random = seeded = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for a in node.names:
+                root = a.name.split(".")[0]
+                if root in NONDETERMINISTIC_MODULES: return False
+                if root == "random": uses_random = True
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            if node.module.split(".")[0] in NONDETERMINISTIC_MODULES: return False
+            for a in node.names:
+                if f"{node.module}.{a.name}" in NONDETERMINISTIC_CALLS or f"{node.module.split('.')[-1]}.{a.name}" in NONDETERMINISTIC_CALLS:
+                    return False
+            if "random" in node.module.split("."): uses_random = True
+        elif isinstance(node, ast.Call):
+            name = _dotted(node.func)
+            if any(name == c or name.endswith("." + c) for c in NONDETERMINISTIC_CALLS): return False
+            last = name.split(".")[-1]
+            if "random" in name.split(".") or last in ("default_rng", "RandomState", "Random"): uses_random = True
+            if last == "seed" or (last in ("default_rng", "RandomState", "Random") and (node.args or node.keywords)):
+                seeded = True
+    return seeded or not uses_random
+
+@lru_cache(maxsize=512)
+def _package_version(module):
+    if module in sys.stdlib_module_names: return "stdlib"
+    try:
+        return importlib.metadata.version(PIP_MAP.get(module, module))
+    except Exception:
+        return "?"
+
+def env_fingerprint(code, data_dir=None):
+    """Interpreter, versions of every imported package and the data files the script names"""
+    data_dir = data_dir or current_dir
+    parts = [sys.version, sys.platform]
+    parts += [f"{m}=={_package_version(m)}" for m in sorted(imports_of(code))]
+    try:
+        for name in sorted(os.listdir(data_dir)):
+            path = os.path.join(data_dir, name)
+            if name in code and name.lower().endswith(Workspace.DATA_EXTS) and os.path.isfile(path):
+                st_ = os.stat(path)
+                parts.append(f"{name}:{st_.st_size}:{st_.st_mtime_ns}")
+    except OSError:
+        pass
+    return "|".join(parts)
+
+class ExecutionCache:
+    """Run Result Cache: stdout/stderr + artifact bytes of deterministic scripts, keyed by code and environment"""
+    def __init__(self, root, max_entries=256, max_entry_bytes=20 * 1024 * 1024, ttl=7 * 24 * 3600, enabled=True):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.enabled = enabled and os.environ.get("OUROBOROS_EXEC_CACHE", "1") != "0"
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(code, fingerprint):
+        return hashlib.sha256(f"{fingerprint}\0{code}".encode('utf-8')).hexdigest()
+
+    def _dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def restore(self, key, ws):
+        """Copy a cached run into the workspace -> {"stdout", "stderr", "code"} or None"""
+        if not self.enabled: return None
+        entry_dir = self._dir(key)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        try:
+            with open(meta_path, "r", encoding='utf-8') as f: meta = json.load(f)
+            if time.time() - meta["created"] > self.ttl: raise ValueError("expired")
+            for name in meta["artifacts"]:
+                shutil.copy2(os.path.join(entry_dir, "artifacts", name), os.path.join(ws.path, name))
+            os.utime(meta_path)  # LRU touch
+        except (OSError, ValueError, KeyError):
+            with self._lock: self.stats["misses"] += 1
+            return None
+        with self._lock: self.stats["hits"] += 1
+        return meta
+
+    def put(self, key, code, stdout, stderr, artifacts):
+        if not self.enabled: return
+        if sum(os.path.getsize(p) for p in artifacts) > self.max_entry_bytes:
+            with self._lock: self.stats["skipped"] += 1
+            return
+        entry_dir = self._dir(key)
+        tmp = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.join(tmp, "artifacts"), exist_ok=True)
+            for p in artifacts: shutil.copy2(p, os.path.join(tmp, "artifacts", os.path.basename(p)))
+            meta = {"created": time.time(), "code": code, "stdout": stdout, "stderr": stderr,
+                    "artifacts": [os.path.basename(p) for p in artifacts]}
+            with open(os.path.join(tmp, "meta.json"), "w", encoding='utf-8') as f: json.dump(meta, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(tmp, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        with self._lock:
+            self.stats["writes"] += 1
+            prune = self.stats["writes"] % 16 == 0
+        if prune: self._prune()
+
+    def _prune(self):
+        entries = []
+        for meta in glob.glob(os.path.join(self.root, "*", "*", "meta.json")):
+            try: entries.append((os.path.getmtime(meta), os.path.dirname(meta)))
+            except OSError: pass
+        entries.sort()
+        cutoff = time.time() - self.ttl
+        excess = len(entries) - self.max_entries
+        for i, (mtime, d) in enumerate(entries):
+            if i < excess or mtime < cutoff: shutil.rmtree(d, ignore_errors=True)
+
+    def summary(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return f"{self.stats['hits']} hits / {self.stats['misses']} misses" + (f" ({100.0 * self.stats['hits'] / total:.0f}%)" if total else "")
+
+class ModelHealth:
+    """Model Scoreboard: rolling latency/error stats, circuit breakers and cached discovery"""
+    WINDOW = 20
+
+    def __init__(self, path, failure_threshold=3, cooldown=60.0, not_found_cooldown=6 * 3600,
+                 discovery_ttl=3600, default_latency=8.0):
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.not_found_cooldown = not_found_cooldown
+        self.discovery_ttl = discovery_ttl
+        self.default_latency = default_latency
+        self._models = {}
+        self._discovery = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        try:
+            with open(path, "r", encoding='utf-8') as f: data = json.load(f)
+            self._models = data.get("models", {})
+            self._discovery = data.get("discovery", {})
+        except (OSError, ValueError):
+            pass
+
+    def _entry(self, model_name):
+        return self._models.setdefault(model_name, {
+            "latency": None, "outcomes": [], "failures": 0, "open_until": 0.0,
+            "last_429": None, "last_404": None, "last_error": ""})
+
+    def record(self, model_name, latency, error=None, retry_after=None):
+        now = time.time()
+        with self._lock:
+            e = self._entry(model_name)
+            e["outcomes"] = (e["outcomes"] + [0 if error else 1])[-self.WINDOW:]
+            if error is None:
+                e["latency"] = round(latency if e["latency"] is None else 0.7 * e["latency"] + 0.3 * latency, 3)
+                e["failures"] = 0
+                e["open_until"] = 0.0
+            else:
+                msg = str(error)
+                e["failures"] += 1
+                e["last_error"] = msg[:200]
+                if "404" in msg or "not found" in msg.lower():
+                    # Retired / unknown model: park it for hours, not seconds
+                    e["last_404"] = now
+                    e["open_until"] = now + self.not_found_cooldown
+                elif is_throttle(error):
+                    # The server's retry hint beats our default cooldown
+                    e["last_429"] = now
+                    e["open_until"] = max(e["open_until"], now + (retry_after if retry_after is not None else self.cooldown))
+                elif e["failures"] >= self.failure_threshold:
+                    backoff = 2 ** min(e["failures"] - self.failure_threshold, 5)
+                    e["open_until"] = now + self.cooldown * backoff
+            self._dirty = True
+        self.flush(force=False)
+
+    def is_open(self, model_name):
+        with self._lock:
+            return self._models.get(model_name, {}).get("open_until", 0.0) > time.time()
+
+    def expected_latency(self, model_name):
+        e = self._models.get(model_name)
+        if not e or e["latency"] is None: return self.default_latency
+        ok_rate = sum(e["outcomes"]) / len(e["outcomes"]) if e["outcomes"] else 1.0
+        return e["latency"] / max(ok_rate, 0.1)
+
+    def rank(self, models):
+        """Closed circuits sorted by expected latency (priority breaks ties)"""
+        now = time.time()
+        with self._lock:
+            closed = [m for m in models if self._models.get(m, {}).get("open_until", 0.0) <= now]
+            if not closed:
+                # Everything tripped: probe the breaker closest to closing instead of giving up
+                return sorted(models, key=lambda m: self._models[m]["open_until"])[:1]
+            return sorted(closed, key=lambda m: (self.expected_latency(m), models.index(m)))
+
+    def cached_discovery(self, key_id):
+        with self._lock:
+            hit = self._discovery.get(key_id)
+            if hit and time.time() - hit["at"] <= self.discovery_ttl:
+                return list(hit["models"])
+        return None
+
+    def remember_discovery(self, key_id, models):
+        with self._lock:
+            self._discovery[key_id] = {"at": time.time(), "models": list(models)}
+            self._dirty = True
+        self.flush(force=False)
+
+    def flush(self, force=True):
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._last_save < 5): return
+            data = json.dumps({"models": self._models, "discovery": self._discovery})
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding='utf-8') as f: f.write(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        now = time.time()
+        age = lambda t: f"{int(now - t)}s ago" if t else "-"
+        with self._lock:
+            rows = []
+            for name, e in sorted(self._models.items()):
+                outcomes = e["outcomes"]
+                rows.append({
+                    "model": name,
+                    "circuit": "OPEN" if e["open_until"] > now else "CLOSED",
+                    "latency_s": e["latency"],
+                    "error_rate": round(1 - sum(outcomes) / len(outcomes), 2) if outcomes else None,
+                    "last_429": age(e["last_429"]),
+                    "last_404": age(e["last_404"]),
+                })
+            return rows
+
+class BadOutput(Exception):
+    """Completion rejected mid-stream (prose, broken syntax, banned call)"""
+
+class StreamGuard:
+    """Incremental sanity check of a streaming completion: fail fast instead of waiting for the end"""
+    BANNED = [(re.compile(r'\bplt\.show\s*\('), "plt.show() is banned on the headless server")]
+    FENCE_END = re.compile(r'^```\s*$', re.M)
+
+    def __init__(self):
+        self.checked_upto = 0
+
+    @classmethod
+    def _split(cls, text):
+        """-> (code between the fences, text after the closing fence or None while it has not arrived)"""
+        body = re.sub(r'^\s*```[a-zA-Z]*\n', '', text)
+        end = cls.FENCE_END.search(body)
+        return (body, None) if end is None else (body[:end.start()], body[end.end():])
+
+    @classmethod
+    def _code(cls, text):
+        return cls._split(text)[0]
+
+    def feed(self, text):
+        code = self._code(text)
+        for pattern, reason in self.BANNED:
+            if pattern.search(code): raise BadOutput(reason)
+        # Only whole lines: codeop tells "incomplete" (None) apart from "invalid" (SyntaxError)
+        cut = code.rfind("\n") + 1
+        if cut <= self.checked_upto: return
+        self.checked_upto = cut
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                codeop.compile_command(code[:cut], "<stream>", "exec")
+        except (SyntaxError, ValueError, OverflowError) as e:
+            lineno = getattr(e, 'lineno', None) or 1
+            lines = code[:cut].splitlines()
+            offending = lines[lineno - 1].strip()[:80] if lineno <= len(lines) else ""
+            kind = "markdown/prose" if lineno == 1 else "syntax error"
+            raise BadOutput(f"{kind} at line {lineno}: {offending!r}")
+
+    def finish(self, text):
+        code, after = self._split(text.strip())
+        if after and after.strip():
+            raise BadOutput(f"markdown/prose after the code: {after.strip().splitlines()[0][:80]!r}")
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                compile(code, "<stream>", "exec")
+        except (SyntaxError, ValueError, OverflowError) as e:
+            raise BadOutput(f"truncated or invalid response: {e}")
+
+class Preflight:
+    """Static Pre-Flight: compile, resolve imports and inject missing module imports before anything spawns"""
+    ALIASES = {
+        "np": "import numpy as np",
+        "pd": "import pandas as pd",
+        "plt": "import matplotlib\nmatplotlib.use('Agg')\nimport matplotlib.pyplot as plt",
+    }
+    ALIAS_MODULES = {"np": "numpy", "pd": "pandas", "plt": "matplotlib"}
+
+    def __init__(self, resolver=None, filename=Workspace.SCRIPT_NAME):
+        self.resolver = resolver
+        self.filename = filename
+
+    def run(self, code, tracer=None):
+        """-> (code, fixes, error). error is a stderr-style message the model must handle, else None."""
+        fixes = []
+        code, tree, error = self._parse(code, fixes)
+        if error: return code, fixes, error
+
+        code, tree, error = self._resolve_imports(code, tree, fixes, tracer or Tracer())
+        if error: return code, fixes, error
+
+        code = self._inject_missing(code, tree, fixes)
+        return code, fixes, None
+
+    def _parse(self, code, fixes):
+        try:
+            return code, ast.parse(code, self.filename), None
+        except SyntaxError as e:
+            # Stray markdown fences are the one syntax error we can fix ourselves
+            if re.search(r'^\s*```', code, re.M):
+                stripped = re.sub(r'^\s*```[a-zA-Z]*\s*$\n?', '', code, flags=re.M)
+                try:
+                    tree = ast.parse(stripped, self.filename)
+                    fixes.append("removed markdown fences")
+                    return stripped, tree, None
+                except SyntaxError:
+                    pass
+            text = (e.text or "").rstrip("\n")
+            caret = " " * max((e.offset or 1) - 1 - (len(text) - len(text.lstrip())), 0) + "^"
+            return code, None, (f'  File "{self.filename}", line {e.lineno}\n'
+                                f'    {text.strip()}\n    {caret}\n{type(e).__name__}: {e.msg}\n')
+
+    def _resolve_imports(self, code, tree, fixes, tracer):
+        if re.search(r'^\s*import plt\s*$', code, re.M):
+            # V31 SMART HEALER, ahead of time
+            code = re.sub(r'^(\s*)import plt\s*$', r'\1import matplotlib.pyplot as plt', code, flags=re.M)
+            tree = ast.parse(code, self.filename)
+            fixes.append("import plt -> import matplotlib.pyplot as plt")
+        if not self.resolver: return code, tree, None
+
+        with tracer.span("resolve_imports") as sp:
+            # Optional imports (try/except ImportError with a fallback) never fail the build
+            installed, unavailable = self.resolver.resolve(imports_of(code, optional=False))
+            sp["installed"], sp["unavailable"] = installed, unavailable
+        if installed:
+            fixes.append(f"installed {', '.join(PIP_MAP.get(m, m) for m in installed)}")
+        if not unavailable: return code, tree, None
+
+        # V29: HALLUCINATION FIREWALL, without a wasted run
+        names = ", ".join(f"'{m}'" for m in unavailable)
+        pips = ", ".join(PIP_MAP.get(m, m) for m in unavailable)
+        return code, tree, (
+            f"CRITICAL ERROR: The module(s) {names} (Pip: {pips}) FAILED to install.\n"
+            f"It likely does not exist or is incompatible.\n"
+            f"ACTION: Rewrite code to NOT use {names}."
+        )
+
+    def _inject_missing(self, code, tree, fixes):
+        bound = set(dir(builtins)) | {"__file__", "__name__", "__doc__"}
+        loaded = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    if node.id not in loaded: loaded.append(node.id)
+                else: bound.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)): bound.add(node.name)
+            elif isinstance(node, ast.arg): bound.add(node.arg)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for a in node.names: bound.add(a.asname or a.name.split(".")[0])
+            elif isinstance(node, ast.ExceptHandler) and node.name: bound.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)): bound.update(node.names)
+            elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name: bound.add(node.name)
+
+        lines = []
+        for name in loaded:
+            if name in bound: continue
+            if name in self.ALIASES and is_installed(self.ALIAS_MODULES[name]):
+                lines.append(self.ALIASES[name])
+            elif name in sys.stdlib_module_names and not name.startswith("_"):
+                lines.append(f"import {name}")
+        if not lines: return code
+
+        # Never in front of a docstring or `from __future__` imports
+        at = 0
+        for i, stmt in enumerate(tree.body):
+            is_doc = i == 0 and isinstance(stmt, ast.Expr) and isinstance(getattr(stmt, 'value', None), ast.Constant) and isinstance(stmt.value.value, str)
+            if is_doc or (isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__"): at = stmt.end_lineno
+            else: break
+        src = code.split("\n")
+        fixes.append("injected " + "; ".join(l.split("\n")[-1] for l in lines))
+        return "\n".join(src[:at] + lines + src[at:])
+
+class InvictusEngine:
+    def __init__(self, key, cache=None, hedge_delay=None, deadline=None, health=None, pool=None, slots=None, resolver=None,
+                 exec_cache=None, limiter=None, backend=None, limits=None, patch_repair=None, memory=None,
+                 history=None, data=None, speculate=None, speculate_cpus=None, speculate_quota=None):
+        self.key = key
+        self.backend = backend or backend_for(key)
+        # INVICTUS MODEL CASCADE (Updated with fallback to discovery)
+        self.models = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
+        self.health = health
+        self.pool = pool
+        self.slots = slots
+        self.last_run_metrics = {}
+        self.sandbox_runs = 0
+        self.limits = limits or SandboxLimits()
+        self.tracer = Tracer()
+        self.exec_cache = exec_cache
+        self.limiter = limiter
+        self.client = None  # fair-queue identity at the limiter (job / batch task); None -> per thread
+        self.exhausted = False  # the last generate() fell through to the "All routes exhausted" script
+        self.memory = memory
+        self.history = history
+        self.data = data
+        self.resolver = resolver or DependencyResolver()
+        self.preflight = Preflight(self.resolver)
+        self.last_preflight = []
+        self.key_id = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        # HEDGED DISPATCH: launch the next model after hedge_delay (or at once on failure),
+        # never spend more than deadline seconds on one generate() call
+        self.hedge_delay = hedge_delay if hedge_delay is not None else float(os.environ.get("OUROBOROS_HEDGE_DELAY", "4"))
+        self.deadline = deadline if deadline is not None else float(os.environ.get("OUROBOROS_DEADLINE", "120"))
+        self.cache = cache
+        self.last_cache_key = None
+        self.last_cache_hit = False
+        # PATCH REPAIR: reflexion asks for a diff first, full regeneration only when it does not apply
+        self.patch_repair = patch_repair if patch_repair is not None else os.environ.get("OUROBOROS_PATCH_REPAIR", "1") != "0"
+        # SPECULATIVE BEST-OF-N: candidates per generation round, how many may execute at once, extra model calls per build
+        self.speculate = max(1, speculate if speculate is not None else int(os.environ.get("OUROBOROS_SPECULATE", "1")))
+        self.speculate_cpus = speculate_cpus or int(os.environ.get("OUROBOROS_SPECULATE_CPUS", os.cpu_count() or 2))
+        self.speculate_quota = speculate_quota if speculate_quota is not None else int(
+            os.environ.get("OUROBOROS_SPECULATE_QUOTA", 4 * (self.speculate - 1)))
+        self._speculate_left = self.speculate_quota
+
+    def discover_models(self):
+        """Emergency Discovery Mode (list_models() result cached per key)"""
+        if self.health:
+            cached = self.health.cached_discovery(self.key_id)
+            if cached is not None: return cached
+        try:
+            found = self.backend.list_models()
+        except Exception as e:
+            return []
+        if self.health and found:
+            self.health.remember_discovery(self.key_id, found)
+        return found
+
+    def _full_prompt(self, prompt, mode="architect", error_context=None):
+        base_instruct = (
+            "You are a professional Python engineer. Return ONLY raw executable code. No markdown fences.\n"
+            "IMPORTS:\n"
+            "- If using matplotlib, you MUST write exactly this sequence:\n"
+            "  import matplotlib\n"
+            "  matplotlib.use('Agg')\n"
+            "  import matplotlib.pyplot as plt\n"
+            "- CRITICAL RULE: For 3D plots, use `ax.scatter(x, y, z, c=z, cmap='viridis')`. NEVER use `c='viridis'`.\n"
+            "- VISUALS: If creating an image, save it as a PNG file (e.g., 'chart.png'). DO NOT use `plt.show()`.\n"
+            "- NUMPY RULE: Verify array shapes. Do NOT use `len()` on scalar numpy types (float64).\n"
+            "- DECORATOR RULE: Wrappers MUST accept `*args` and `**kwargs` to avoid TypeError.\n"
+            "- OUTPUT RULE: Silent success is failure. PROVE your work by printing the final result or saving a plot.\n"
+            "- ALIAS RULE: Do NOT import 'plt'. Use `import matplotlib.pyplot as plt`. Do NOT import 'cv2' without installing `opencv-python`.\n"
+            "- IMPORT RULE: Do NOT import 'shift', 'utils', or other imaginary modules. Only use Standard Library or PyPI packages.\n"
+            "- LOGIC RULE: Ensure coordinate tuples (x,y) are consistent. Do not mix 2D and 3D coordinates.\n"
+            "- 3D PLOT RULE: IF AND ONLY IF plotting 3D, use `ax = fig.add_subplot(111, projection='3d')`.\n"
+            "- IMAGE RULE: For `imshow`, inputs MUST be 2D (H, W) or 3D (H, W, 3). If array is flat, use `.reshape(H, W)`.\n"
+            "- HEADLESS RULE: Server has NO MONITOR. `plt.show` is BANNED. Use `plt.savefig()`.\n"
+            "- LIBRARY RULE: Do NOT use `cv2`. Use `PIL` (Pillow) or `scikit-image` for image processing.\n"
+            "- If asking for a game, write a non-interactive simulation (500 steps) and print results.\n"
+            "- PRINT ALL OUTPUTS TO STDOUT."
+        )
+        
+        if mode == "surgeon":
+            full_prompt = (
+                f"{base_instruct}\n\n"
+                f"DEBUG TASK: Fix this broken code based on the error.\n"
+                f"ERROR:\n{error_context}\n\n"
+                f"BROKEN CODE:\n{prompt}"
+            )
+        elif mode == "patch":
+            # V49 PATCH REPAIR: the rules were applied when the script was written; only the fix travels
+            full_prompt = (
+                "You are a professional Python engineer fixing a script that failed.\n"
+                "Return ONLY a unified diff against the script below: @@ hunks with 2 lines of context, "
+                "without the reference line numbers. Do NOT return the whole file. "
+                "Keep saving plots with plt.savefig (never plt.show) and keep printing the results.\n\n"
+                f"ERROR:\n{error_context}\n\n"
+                f"SCRIPT (line numbers are for reference only):\n{number_lines(prompt)}"
+            )
+        else:
+            full_prompt = f"{base_instruct}\n\nTASK: {prompt}"
+
+        # V52 DATA REGISTRY: real column names and sample rows of the data files the task (or script) names
+        data_note = self.data.describe(prompt) if self.data else ""
+        if data_note: full_prompt += f"\n\n{data_note}"
+
+        # V30 OMEGA: Force Headless Config in Prompt
+        if mode != "patch" and ("matplotlib" in full_prompt.lower() or "plot" in full_prompt.lower()):
+             full_prompt = "You MUST start your code with:\nimport matplotlib\nmatplotlib.use('Agg')\n\n" + full_prompt
+        return full_prompt
+
+    def generate(self, prompt, mode="architect", error_context=None, status_ph=None, use_cache=True, on_partial=None):
+        self.exhausted = False
+        full_prompt = self._full_prompt(prompt, mode, error_context)
+
+        # 1. TITANIUM LOOP: Hedged race over the cascade (priority order kept)
+        last_error = ""
+
+        # 0. RESPONSE CACHE: Identical prompt already answered by a cascade model?
+        self.last_cache_key = None
+        self.last_cache_hit = False
+        cache = self.cache if use_cache else None
+        if cache:
+            with self.tracer.span("response_cache") as sp:
+                key, cached = cache.lookup([cache.make_key(full_prompt, mode, m) for m in self.models])
+                sp["outcome"] = "miss" if cached is None else "hit"
+            if cached is not None:
+                self.last_cache_key = key
+                self.last_cache_hit = True
+                if status_ph:
+                    status_ph.markdown(render_hud("CACHE HIT: REUSING VERIFIED RESPONSE", 50, "#10b981"), unsafe_allow_html=True)
+                return cached
+
+        deadline = time.monotonic() + self.deadline
+
+        def on_reroute(model_name, n):
+            # Update HUD if we are hedging past the preferred model
+            if status_ph and n > 1:
+                status_ph.markdown(render_hud(f"REROUTING: {model_name.upper()}...", 50, "#eab308"), unsafe_allow_html=True)
+
+        cascade = self.health.rank(self.models) if self.health else self.models
+        model_name, code, errors = self._hedged_dispatch(cascade, full_prompt, deadline, on_reroute, on_partial)
+        if code is not None:
+            self._store(cache, full_prompt, mode, model_name, code)
+            return code
+        last_error = errors[-1] if errors else ""
+
+        # 2. DIAMOND DISCOVERY (Emergency)
+        if time.monotonic() < deadline:
+            if status_ph:
+                status_ph.markdown(render_hud("DIAGNOSTIC SCAN INITIATED...", 75, "#a855f7"), unsafe_allow_html=True)
+
+            # Skip what the cascade already tried ("models/gemini-pro" == "gemini-pro")
+            with self.tracer.span("discovery") as sp:
+                found_models = [m for m in self.discover_models() if m.split("/")[-1] not in self.models]
+                sp["found"] = len(found_models)
+            if self.health and found_models:
+                found_models = self.health.rank(found_models)
+
+            if found_models:
+                # V22 UPGRADE: Deep Scan - Try ALL found models
+                def on_diagnostic(valid_model, n):
+                    if status_ph:
+                        status_ph.markdown(render_hud(f"DIAGNOSTIC TRY ({n}/{len(found_models)}): {valid_model}", 80, "#a855f7"), unsafe_allow_html=True)
+
+                model_name, code, errors = self._hedged_dispatch(found_models, full_prompt, deadline, on_diagnostic, on_partial)
+                if code is not None:
+                    self._store(cache, full_prompt, mode, model_name, code)
+                    return code
+                last_error = errors[-1] if errors else last_error
+            else:
+                last_error += " | Diagnostic Scan: No models found."
+
+        # Final Failure
+        self.exhausted = True
+        error_msg = f"Diamond System Failure: All routes exhausted. Last error: {last_error}"
+        return f"print({repr(error_msg)})"
+
+    def repair(self, code, error, status_ph=None, use_cache=True):
+        """Diff against the failed script -> fixed code, or None when the reply cannot be applied"""
+        with self.tracer.span("patch", bytes_in=len(code)) as sp:
+            # Not streamed: StreamGuard would reject a diff as broken Python
+            reply = self.generate(code, mode="patch", error_context=error, status_ph=status_ph, use_cache=use_cache)
+            try:
+                fixed = resolve_reply(code, reply)
+            except PatchError as e:
+                sp["outcome"] = "rejected"
+                sp["error"] = str(e)[:200]
+                self.invalidate_last()
+                return None
+            sp["outcome"] = "full_code" if fixed is reply else "applied"
+            sp["bytes_out"] = len(reply)
+            return fixed
+
+    def _call_model(self, model_name, full_prompt, timeout, partials=None, parent=None, temperature=None):
+        if self.limiter:
+            # ~4 bytes per token; the answer is charged once it is known
+            with self.tracer.span("rate_limit_wait", parent=parent, model=model_name) as sp:
+                try:
+                    timeout -= self.limiter.acquire(self.key_id, model_name, cost=len(full_prompt) // 4, client=self.client, timeout=timeout)
+                except RateLimitTimeout:
+                    sp["outcome"] = "timeout"
+                    raise
+        with self.tracer.span("model", parent=parent, model=model_name, stream=partials is not None, bytes_in=len(full_prompt)) as sp:
+            started = time.monotonic()
+            try:
+                if temperature is not None:
+                    sp["temperature"] = temperature
+                    text = self.backend.generate(model_name, full_prompt, timeout, temperature=temperature)
+                elif partials is None:
+                    text = self.backend.generate(model_name, full_prompt, timeout)
+                else:
+                    text = self._stream_text(model_name, full_prompt, timeout, partials)
+                code = re.sub(r'^```[a-zA-Z]*\n|\n```$', '', text.strip())
+                if not code.strip():
+                    raise ValueError("Empty response")
+            except BadOutput:
+                sp["outcome"] = "bad_output"
+                raise  # the model is fine, this answer is not: keep it out of the health stats
+            except Exception as e:
+                msg = str(e)
+                sp["outcome"] = "404" if "404" in msg else "429" if is_throttle(e) else "timeout" if "504" in msg or "eadline" in msg else "error"
+                if sp["outcome"] == "429": sp["retry_after"] = retry_after_hint(e)
+                if self.limiter: self.limiter.report(self.key_id, model_name, error=e)
+                if self.health: self.health.record(model_name, time.monotonic() - started, error=e, retry_after=sp.get("retry_after"))
+                raise
+            sp["bytes_out"] = len(text)
+            if self.limiter: self.limiter.report(self.key_id, model_name, tokens=len(text) // 4)
+            if self.health: self.health.record(model_name, time.monotonic() - started)
+            return code
+
+    def _stream_text(self, model_name, full_prompt, timeout, partials):
+        """Accumulate streamed chunks into partials[model_name], aborting on the first bad sign"""
+        guard = StreamGuard()
+        text = ""
+        for piece in self.backend.stream(model_name, full_prompt, timeout):
+            text += piece
+            partials[model_name] = text
+            guard.feed(text)
+        guard.finish(text)
+        return text
+
+    def _hedged_dispatch(self, models, full_prompt, deadline, on_launch=None, on_partial=None):
+        """Race models in priority order -> (model, code, errors); first valid response wins.
+        With on_partial(model, text) the models stream and the leading partial is pushed from this thread."""
+        partials = {} if on_partial else None
+        shown = None
+        pool = ThreadPoolExecutor(max_workers=max(len(models), 1), thread_name_prefix="invictus-hedge")
+        queue = list(models)
+        running = {}
+        errors = []
+        next_launch = time.monotonic()
+        try:
+            while queue or running:
+                now = time.monotonic()
+                if now >= deadline:
+                    errors.append(f"Deadline exceeded ({self.deadline:.0f}s) with {len(running)} model(s) still pending")
+                    break
+
+                # Launch the next model: nothing in flight, hedge delay elapsed, or a fast failure
+                if queue and (not running or now >= next_launch):
+                    model_name = queue.pop(0)
+                    if on_launch: on_launch(model_name, len(models) - len(queue))
+                    running[pool.submit(self._call_model, model_name, full_prompt, deadline - now, partials, self.tracer.current())] = model_name
+                    next_launch = now + self.hedge_delay
+                    continue
+
+                timeout = deadline - now
+                if queue: timeout = min(timeout, next_launch - now)
+                if on_partial: timeout = min(timeout, 0.2)
+                done, _ = wait(running, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+                if on_partial and running:
+                    # Show the highest-priority model that is still streaming
+                    leader = min(running.values(), key=models.index)
+                    text = partials.get(leader)
+                    if text and (leader, len(text)) != shown:
+                        shown = (leader, len(text))
+                        on_partial(leader, text)
+
+                # Several may land together: honour the cascade priority
+                for fut in sorted(done, key=lambda f: models.index(running[f])):
+                    model_name = running.pop(fut)
+                    try:
+                        return model_name, fut.result(), errors
+                    except Exception as e:
+                        errors.append(f"Model {model_name} failed: {e}")
+                        next_launch = time.monotonic()
+        finally:
+            # Losers are abandoned: queued calls are cancelled, in-flight ones die on their own timeout
+            pool.shutdown(wait=False, cancel_futures=True)
+        return None, None, errors
+
+    def _store(self, cache, full_prompt, mode, model_name, code):
+        if not cache or not code.strip(): return
+        self.last_cache_key = cache.make_key(full_prompt, mode, model_name)
+        cache.put(self.last_cache_key, code, model_name=model_name, mode=mode)
+
+    def invalidate_last(self):
+        """Forget the last response so a retry actually reaches the model"""
+        if self.cache: self.cache.discard(self.last_cache_key)
+        self.last_cache_key = None
+
+    def _run_script(self, ws, timeout, status_ph=None, on_output=None):
+        """Warm fork when the pool is up, cold interpreter otherwise (same result shape)"""
+        if self.slots and not self.slots.acquire(blocking=False):
+            if status_ph:
+                status_ph.markdown(render_hud("QUEUED: WAITING FOR AN EXECUTION SLOT...", 55, "#64748b"), unsafe_allow_html=True)
+            self.slots.acquire()
+        self.sandbox_runs += 1
+        try:
+            if ws.killed:
+                return subprocess.CompletedProcess([sys.executable, ws.script], -signal.SIGKILL, "", "")
+            with self.tracer.span("sandbox", warm=bool(self.pool), streaming=bool(on_output)) as sp:
+                rlimits = self.limits.rlimits()
+                try:
+                    if on_output:
+                        res = self._run_streaming(ws, timeout, on_output, rlimits)
+                    elif self.pool:
+                        res = self.pool.run(ws.script, cwd=ws.path, timeout=timeout, stdout_path=ws.stdout_log,
+                                            stderr_path=ws.stderr_log, rlimits=rlimits, capture_cap=self.limits.capture_cap,
+                                            journal=ws.journal, pidfile=ws.pidfile)
+                    else:
+                        res = self._run_cold(ws, timeout, rlimits)
+                        res = subprocess.CompletedProcess(res.args, res.returncode, read_capped(ws.stdout_log, self.limits.capture_cap),
+                                                          read_capped(ws.stderr_log, self.limits.capture_cap))
+                except subprocess.TimeoutExpired:
+                    sp["outcome"] = "timeout"
+                    raise
+                sp["returncode"] = res.returncode
+                sp["outcome"] = "ok" if res.returncode == 0 else "error"
+                sp["bytes_out"] = len(res.stdout) + len(res.stderr)
+                return res
+        finally:
+            try: os.remove(ws.pidfile)
+            except OSError: pass
+            if self.slots: self.slots.release()
+
+    def _run_cold(self, ws, timeout, rlimits, env=None):
+        """Fresh interpreter in its own session with output on disk (logs are read by the caller)"""
+        with open(ws.stdout_log, "wb") as out, open(ws.stderr_log, "wb") as err:
+            proc = subprocess.Popen([sys.executable, ws.script], stdout=out, stderr=err, stdin=subprocess.DEVNULL,
+                                    cwd=ws.path, env=hook_env(ws.journal, env), start_new_session=True, preexec_fn=lambda: apply_rlimits(rlimits))
+            with open(ws.pidfile, "w", encoding="utf-8") as f: f.write(str(proc.pid))
+            try:
+                returncode = proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, 9)
+                proc.wait()
+                raise
+        return subprocess.CompletedProcess(proc.args, returncode, "", "")
+
+    def _run_streaming(self, ws, timeout, on_output, rlimits=()):
+        """Run in a helper thread with output on disk; tail it here and push to on_output(stdout, stderr)"""
+        def run_cold():
+            return self._run_cold(ws, timeout, rlimits, env=dict(os.environ, PYTHONUNBUFFERED="1"))
+
+        def run_warm():
+            return self.pool.run(ws.script, cwd=ws.path, timeout=timeout, stdout_path=ws.stdout_log,
+                                 stderr_path=ws.stderr_log, line_buffered=True, rlimits=rlimits,
+                                 capture_cap=self.limits.capture_cap, journal=ws.journal, pidfile=ws.pidfile)
+
+        out_tail, err_tail = OutputTail(ws.stdout_log), OutputTail(ws.stderr_log)
+        started = time.monotonic()
+        runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="invictus-run")
+        fut = runner.submit(run_warm if self.pool else run_cold)
+        runner.shutdown(wait=False)
+        while True:
+            done, _ = wait([fut], timeout=0.1)
+            # Poll both tails every tick (no short-circuit) so neither falls behind
+            if any([out_tail.poll(), err_tail.poll()]):
+                on_output(out_tail.text(), err_tail.text())
+            if done: break
+
+        firsts = [t.first_output_at for t in (out_tail, err_tail) if t.first_output_at]
+        self.last_run_metrics = {
+            "run_s": round(time.monotonic() - started, 3),
+            "ttfo_s": round(min(firsts) - started, 3) if firsts else None,
+            "stdout_bytes": out_tail.size,
+            "stderr_bytes": err_tail.size,
+        }
+        res = fut.result()  # re-raises TimeoutExpired
+        return subprocess.CompletedProcess(res.args, res.returncode, read_capped(ws.stdout_log, self.limits.capture_cap),
+                                           read_capped(ws.stderr_log, self.limits.capture_cap))
+
+    def _result(self, ws, success, stdout, stderr, code):
+        if not os.path.exists(ws.stdout_log):
+            ws.write_logs(stdout, stderr)
+        manifest = ws.manifest()
+        return {"success": success, "stdout": stdout, "stderr": stderr, "code": code,
+                "workspace": ws, "artifacts": [m["path"] for m in manifest], "manifest": manifest, "metrics": dict(self.last_run_metrics),
+                "preflight": list(self.last_preflight)}
+
+    def execute_with_healing(self, code, status_ph, on_output=None, use_cache=True, ws=None):
+        """Self-Healing Execution Loop (runs in a fresh Workspace unless given one; caller discards it)"""
+        ws = ws or Workspace(data=self.data)
+        self.last_run_metrics = {}
+        
+        # V47 PRE-FLIGHT: apply every static fix in one pass, bounce the rest to reflexion without spawning
+        with self.tracer.span("preflight") as sp:
+            code, self.last_preflight, error = self.preflight.run(code, self.tracer)
+            sp["fixes"] = len(self.last_preflight)
+            if error: sp["outcome"] = "rejected"
+        if self.last_preflight and status_ph:
+            status_ph.markdown(render_hud(f"PRE-FLIGHT: {'; '.join(self.last_preflight)[:90].upper()}", 55, "#10b981"), unsafe_allow_html=True)
+        ws.write_script(code)
+        if error:
+            return self._result(ws, False, "", error, code)
+
+        # V48 EXECUTION CACHE: same deterministic script, same environment -> same output
+        exec_key = None
+        if self.exec_cache and use_cache and is_deterministic(code):
+            with self.tracer.span("exec_cache") as sp:
+                exec_key = self.exec_cache.make_key(code, env_fingerprint(code))
+                hit = self.exec_cache.restore(exec_key, ws)
+                sp["outcome"] = "miss" if hit is None else "hit"
+            if hit is not None:
+                if status_ph:
+                    status_ph.markdown(render_hud("EXECUTION CACHE HIT: REPLAYING VERIFIED RUN", 90, "#10b981"), unsafe_allow_html=True)
+                self.last_run_metrics = {"run_s": 0.0, "ttfo_s": 0.0, "stdout_bytes": len(hit["stdout"]),
+                                         "stderr_bytes": len(hit["stderr"]), "cached": True}
+                return self._result(ws, True, hit["stdout"], hit["stderr"], hit["code"])
+        
+        max_retries = 3
+        attempt = 1
+        recalled = None # repair-memory key whose fix is on trial in this run
+        
+        while attempt <= max_retries:
+            try:
+                # EXECUTE
+                res = self._run_script(ws, timeout=45, status_ph=status_ph, on_output=on_output)
+                if recalled:
+                    sig = failure_signature(res.stderr, code) if res.returncode != 0 else None
+                    self.memory.confirm(recalled, ok=sig is None or sig[0] != recalled)
+                    recalled = None
+
+                # V49 RESOURCE GUARD: a run that hit a cap goes straight back to reflexion with a structured error
+                breach = self.limits.breach(res.returncode, res.stderr) if res.returncode != 0 else None
+                breach = breach or self.limits.enforce_artifacts(ws.artifacts())
+                if breach:
+                    result = self._result(ws, False, res.stdout, limit_error(breach, res.stderr), code)
+                    result["limit"] = breach
+                    return result
+                
+                # CHECK FOR MISSING MODULES (PIP & SMART ALIASES)
+                if res.returncode != 0 and "ModuleNotFoundError" in res.stderr:
+                    match = re.search(r"No module named '(\w+)'", res.stderr)
+                    if match:
+                        missing_lib = match.group(1)
+                        if status_ph: status_ph.markdown(render_hud(f"HEALING: DIAGNOSING {missing_lib.upper()}...", 60 + (attempt*10), "#ef4444"), unsafe_allow_html=True)
+                        
+                        # V31 SMART HEALER: Logic for Aliases
+                        if missing_lib == "plt":
+                            # Fix Code directly
+                            if status_ph: status_ph.markdown(render_hud(f"HEALING: REPLACING 'import plt' -> 'import matplotlib.pyplot as plt'...", 70, "#10b981"), unsafe_allow_html=True)
+                            with self.tracer.span("heal", action="import plt -> matplotlib.pyplot"):
+                                code = code.replace("import plt", "import matplotlib.pyplot as plt")
+                            ws.write_script(code)
+                            attempt += 1
+                            continue
+                        
+                        install_name = PIP_MAP.get(missing_lib, missing_lib)
+                        
+                        # Dynamic imports the pre-flight could not see; known-bad names are not retried
+                        with self.tracer.span("heal", action=f"install {install_name}") as sp:
+                            installed, _ = self.resolver.resolve([missing_lib])
+                            if not installed: sp["outcome"] = "failed"
+                        if installed:
+                            attempt += 1
+                            continue # RETRY LOOP
+
+                        # V29: HALLUCINATION FIREWALL -> Refined
+                        error_msg = (
+                            f"CRITICAL ERROR: The module '{missing_lib}' (Pip: {install_name}) FAILED to install.\n"
+                            f"It likely does not exist or is incompatible.\n"
+                            f"ACTION: Rewrite code to NOT use '{missing_lib}'."
+                        )
+                        return self._result(ws, False, "", error_msg, code)
+
+                # CHECK FOR MISSING IMPORTS (STDLIB/Structure)
+                if res.returncode != 0 and "NameError" in res.stderr:
+                    match = re.search(r"name '(\w+)' is not defined", res.stderr)
+                    if match:
+                        missing_var = match.group(1)
+                        # Heuristic: If it looks like a package (all lowercase, no underscores), try importing it
+                        if missing_var.islower() and "_" not in missing_var:
+                            if status_ph: status_ph.markdown(render_hud(f"HEALING: INJECTING IMPORT {missing_var.upper()}...", 60 + (attempt*10), "#ef4444"), unsafe_allow_html=True)
+                            with self.tracer.span("heal", action=f"import {missing_var}"):
+                                code = f"import {missing_var}\n{code}"
+                            ws.write_script(code)
+                            attempt += 1
+                            continue # RETRY LOOP
+
+                # V49 REPAIR MEMORY: a failure fixed before is patched locally, no model round trip
+                if res.returncode != 0 and self.memory:
+                    with self.tracer.span("heal", action="repair memory") as sp:
+                        hit = self.memory.recall(code, res.stderr)
+                        sp["outcome"] = "hit" if hit else "miss"
+                    if hit:
+                        recalled, code = hit
+                        if status_ph: status_ph.markdown(render_hud("HEALING: APPLYING LEARNED FIX...", 60 + (attempt*10), "#10b981"), unsafe_allow_html=True)
+                        ws.write_script(code)
+                        attempt += 1
+                        continue # RETRY LOOP
+
+                result = self._result(ws, res.returncode==0, res.stdout, res.stderr, code)
+                if exec_key and result['success']:
+                    self.exec_cache.put(exec_key, code, res.stdout, res.stderr, result['artifacts'])
+                return result
+                
+            except subprocess.TimeoutExpired:
+                result = self._result(ws, False, "", "TIMEOUT: Execution exceeded 45s.", code)
+                result["limit"] = {"kind": "wall_clock", "limit": "45s", "hint": "Finish faster: fewer steps, smaller inputs."}
+                return result
+            except Exception as e:
+                return self._result(ws, False, "", str(e), code)
+        
+        return self._result(ws, False, "", "Max retries exceeded during self-healing.", code)
+
+    def _draft(self, source, mode, error_context, error_brief=None, status_ph=None, use_cache=True, on_partial=None):
+        """Next script from the model: a diff against `source` first when repairing, full (re)generation otherwise"""
+        code = None
+        if error_brief is not None and self.patch_repair:
+            with self.tracer.span("generate", mode="patch") as sp:
+                code = self.repair(source, error_brief, status_ph=status_ph, use_cache=use_cache)
+                sp["outcome"] = "rejected" if code is None else "cache_hit" if self.last_cache_hit else "ok"
+        if code is None:
+            with self.tracer.span("generate", mode=mode) as sp:
+                code = self.generate(source, mode=mode, error_context=error_context, status_ph=status_ph,
+                                     use_cache=use_cache, on_partial=on_partial)
+                sp["outcome"] = "cache_hit" if self.last_cache_hit else "ok"
+        return code
+
+    def _speculation_width(self, draft, use_cache):
+        """Candidates for this round: 1 (serial) when off, out of quota, or when the cache already has the answer"""
+        extra = min(self.speculate - 1, self._speculate_left)
+        if extra <= 0: return 1
+        if use_cache and self.cache:
+            full_prompt = self._full_prompt(*draft[:3])
+            if self.cache.peek([self.cache.make_key(full_prompt, draft[1], m) for m in self.models]): return 1
+        return 1 + extra
+
+    def _speculate(self, n, draft, status_ph=None, use_cache=True, on_execute=None, cancelled=None):
+        """n candidates through generate -> execute_with_healing at once; the first loud pass wins, the rest are killed.
+        Candidate 0 is the serial path (hedged cascade / patch repair); the others are single calls to the next
+        ranked models, then the same models hotter. No winner -> candidate 0's result. None when cancelled."""
+        source, mode, error_context, error_brief = draft
+        self._speculate_left -= n - 1
+        cascade = self.health.rank(self.models) if self.health else self.models
+        full_prompt = self._full_prompt(source, mode, error_context)
+        deadline = time.monotonic() + self.deadline
+        cpus = threading.BoundedSemaphore(max(1, self.speculate_cpus))
+        lock = threading.Lock()
+        won = threading.Event()
+        executing = threading.Event()
+        running = {} # candidate -> Workspace of its sandbox run
+        round_id = self.tracer.current()
+
+        def variant(i):
+            """-> (model, temperature): next ranked models first, then the same ones hotter"""
+            if i == 0: return None, None
+            return cascade[i % len(cascade)], None if i < len(cascade) else min(0.4 + 0.3 * (i // len(cascade)), 1.0)
+
+        def candidate(i):
+            # Shallow fork: shared caches, pool, limiter and tracer; private per-run state
+            fork = copy.copy(self)
+            fork.sandbox_runs = 0
+            model, temperature = variant(i)
+            with self.tracer.span("candidate", parent=round_id, index=i, model=model or "cascade", temperature=temperature) as sp:
+                if i == 0:
+                    code = fork._draft(source, mode, error_context, error_brief, use_cache=use_cache)
+                else:
+                    try:
+                        code = fork._call_model(model, full_prompt, deadline - time.monotonic(), temperature=temperature)
+                    except Exception:
+                        sp["outcome"] = "no_code"
+                        return fork, None, None
+                with cpus:
+                    with lock:
+                        if won.is_set():
+                            sp["outcome"] = "cancelled"
+                            return fork, code, None
+                        ws = running[i] = Workspace(data=self.data)
+                    executing.set()
+                    try:
+                        with self.tracer.span("execute") as ex:
+                            res = fork.execute_with_healing(code, None, use_cache=use_cache, ws=ws)
+                            ex["outcome"] = "ok" if res['success'] else "error"
+                    finally:
+                        with lock: running.pop(i, None)
+                loud = res['success'] and (bool(res['stdout'].strip()) or bool(res['artifacts']))
+                sp["outcome"] = "loud" if loud else "silent" if res['success'] else "failed"
+                return fork, code, res
+
+        def discard(fut):
+            try: fork, _, res = fut.result()
+            except Exception: return
+            self.sandbox_runs += fork.sandbox_runs
+            if res: res['workspace'].discard()
+
+        pool = ThreadPoolExecutor(max_workers=n, thread_name_prefix="invictus-spec")
+        futures = {pool.submit(candidate, i): i for i in range(n)}
+        pool.shutdown(wait=False)
+        pending, finished, winner = set(futures), {}, None
+        while pending and winner is None:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            if on_execute and executing.is_set():
+                on_execute()
+                on_execute = None
+            if status_ph:
+                status_ph.markdown(render_hud(f"SPECULATING: {n - len(pending)}/{n} CANDIDATES DONE", 50, "#06b6d4"), unsafe_allow_html=True)
+            for fut in sorted(done, key=futures.get):
+                try: fork, code, res = fut.result()
+                except Exception: continue
+                self.sandbox_runs += fork.sandbox_runs
+                if res is None: continue
+                finished[futures[fut]] = (fork, code, res)
+                if winner is None and res['success'] and (res['stdout'].strip() or res['artifacts']):
+                    winner = futures[fut]
+            if cancelled and cancelled():
+                break
+        # Losers: sandboxes are killed now, model calls still in flight clean up after themselves
+        with lock:
+            won.set()
+            for ws in running.values(): ws.kill()
+        for fut in pending: fut.add_done_callback(discard)
+        pick = winner if winner is not None else 0 if 0 in finished else min(finished, default=None)
+        for i, (fork, _, res) in finished.items():
+            if i == pick: continue
+            if i == 0 and not (res['success'] and (res['stdout'].strip() or res['artifacts'])):
+                fork.invalidate_last()  # failed: never serve it from the cache
+            res['workspace'].discard()
+        if pick is None or (cancelled and cancelled()):
+            if pick is not None: finished[pick][2]['workspace'].discard()
+            return None
+
+        fork, code, res = finished[pick]
+        self.exhausted = fork.exhausted
+        if pick == 0:
+            self.last_cache_key, self.last_cache_hit = fork.last_cache_key, fork.last_cache_hit
+        else:
+            self.last_cache_key, self.last_cache_hit = None, False
+            if winner is not None: self._store(self.cache if use_cache else None, full_prompt, mode, variant(pick)[0], code)
+        model, temperature = variant(pick)
+        res["speculative"] = {"n": n, "winner": winner, "model": model or "cascade", "temperature": temperature}
+        return res
+
+    def build(self, prompt, mode="architect", error_context=None, status_ph=None, use_cache=True,
+              on_partial=None, on_output=None, on_event=None, cancelled=None, max_reflexion=5):
+        """Generate -> execute_with_healing -> reflexion until the script runs loud (caller discards res['workspace'])"""
+        emit = on_event or (lambda phase, payload: None)
+        self.tracer = Tracer("surgeon" if mode == "surgeon" else "build")
+        self.exhausted = False
+        if status_ph:
+            status_ph.markdown(render_hud("INITIATING INVICTUS CORE...", 20), unsafe_allow_html=True)
+
+        reflexion_attempts = 0 # V30 OMEGA: Max Retries
+        last_error_context = error_context
+        last_code_attempt = "" # Track code to feed back
+        last_failure = None # (code, stderr) of the last failed run: the next pass teaches the repair memory
+        res = None
+        rounds = 0
+        speculation = [] # one {"n", "winner", ...} per speculative round
+        recalled = None # run-history match used this build: {"id", "score", "use", ...}
+        self._speculate_left = self.speculate_quota
+
+        while reflexion_attempts <= max_reflexion:
+            if cancelled and cancelled():
+                break
+            with self.tracer.span("round", attempt=reflexion_attempts) as round_span:
+                # GENERATE
+                code = None
+                if reflexion_attempts > 0:
+                    if status_ph:
+                        status_ph.markdown(render_hud(f"🧠 REFLEXION ({reflexion_attempts}/{max_reflexion}): FIXING LOGIC...", 40, "#ec4899"), unsafe_allow_html=True)
+                    # V49 PATCH REPAIR: only the script's own frames and the final exception go back to the model
+                    error_brief = compact_traceback(last_error_context)
+                    # V37 GOD MODE: Aggressive Debugging Prompt (full rewrite when no patch applies)
+                    fix_context = (
+                        f"{error_brief}\n\n"
+                        f"CRITICAL FIX INSTRUCTIONS:\n"
+                        f"1. Analyze the error trace above. Which line failed?\n"
+                        f"2. If 'Invalid shape', you MUST reshape your array before plotting (e.g., array.reshape(H,W)).\n"
+                        f"3. If 'no attribute zlabel', ensure you used `ax = fig.add_subplot(projection='3d')`.\n"
+                        f"4. Correct consistency errors. Close all syntax.\n"
+                        f"5. RETURN THE FIXED, COMPLETE CODE."
+                    )
+                    draft = (last_code_attempt, "surgeon", fix_context, error_brief)
+                else:
+                    # V48 DIRECT EXECUTE: "Execute this EXACT code" prompts need no model on the first pass
+                    code = verbatim_code(prompt) if mode == "architect" else None
+                    draft = (prompt, mode, last_error_context, None)
+                    # V51 RUN HISTORY: a near-duplicate of a past loud success re-runs its script, a close one guides the model
+                    if code is None and mode == "architect" and self.history:
+                        with self.tracer.span("history") as sp:
+                            recalled = self.history.match(prompt)
+                            if recalled and recalled["use"] == "reuse" and not use_cache: recalled["use"] = "example"
+                            sp["outcome"] = recalled["use"] if recalled else "miss"
+                            if recalled: sp.update(run=recalled["id"], score=recalled["score"])
+                        if recalled and recalled["use"] == "reuse":
+                            code = recalled["code"]
+                        elif recalled:
+                            draft = (example_prompt(prompt, recalled), mode, last_error_context, None)
+                width = 1 if code else self._speculation_width(draft, use_cache)
+
+                if width > 1:
+                    # V50 SPECULATIVE BEST-OF-N: candidates race through generate -> sandbox, first loud pass wins
+                    emit("generate", {"attempt": reflexion_attempts, "direct": False, "speculative": width})
+                    if res: res['workspace'].discard()
+                    res = self._speculate(width, draft, status_ph, use_cache, on_execute=lambda: emit("execute", {"attempt": reflexion_attempts}),
+                                          cancelled=cancelled)
+                    if res is None: break
+                    speculation.append(res.pop("speculative"))
+                    code = res['code']
+                else:
+                    if reflexion_attempts > 0:
+                        emit("generate", {"attempt": reflexion_attempts, "direct": False, "patch": self.patch_repair})
+                    else:
+                        emit("generate", {"attempt": reflexion_attempts, "direct": bool(code),
+                                          "history": recalled and {"run": recalled["id"], "score": recalled["score"], "use": recalled["use"]}})
+                    if code:
+                        if status_ph:
+                            label = f"HISTORY REUSE: RUN #{recalled['id']}" if recalled and recalled["use"] == "reuse" else "DIRECT EXECUTE"
+                            status_ph.markdown(render_hud(f"{label}: SKIPPING MODEL", 45, "#10b981"), unsafe_allow_html=True)
+                        self.last_cache_key = None # no model response to evict if it fails
+                    else:
+                        code = self._draft(*draft, status_ph=status_ph, use_cache=use_cache, on_partial=on_partial)
+
+                    # 2. COMPILING (SELF-HEALING)
+                    emit("execute", {"attempt": reflexion_attempts})
+                    if status_ph:
+                        status_ph.markdown(render_hud("COMPILING ASSETS...", 50, "#fbbf24"), unsafe_allow_html=True)
+                    if res: res['workspace'].discard()
+                    with self.tracer.span("execute") as sp:
+                        res = self.execute_with_healing(code, status_ph, on_output=on_output, use_cache=use_cache)
+                        sp["outcome"] = "ok" if res['success'] else "error"
+                last_code_attempt = code # Save for next loop if needed
+                rounds += 1
+
+                # V26 LOUDMOUTH CHECK: Detect Silent Failure
+                has_output = bool(res['stdout'].strip()) or bool(res['artifacts'])
+                if res['success'] and has_output:
+                    if last_failure and self.memory: self.memory.learn(*last_failure, res['code'])
+                    break # success and loud!
+                round_span["outcome"] = "silent" if res['success'] else "failed"
+                # Never serve code from the cache again once it failed
+                self.invalidate_last()
+                if res['success']:
+                    # SILENT FAILURE -> Force Reflexion
+                    last_error_context = "RUNTIME ERROR: SILENT FAILURE. The code ran successfully but produced NO OUTPUT (no print statements, no images). You MUST use print() to show the result."
+                else:
+                    # Standard Failure
+                    last_error_context = res['stderr']
+                    last_failure = (res['code'], res['stderr'])
+                emit("failed", {"attempt": reflexion_attempts, "stderr": last_error_context, "silent": res['success']})
+            reflexion_attempts += 1
+
+        if res is not None:
+            res["attempts"] = rounds
+            res["speculation"] = speculation
+            res["trace"] = self.tracer.export("success" if res['success'] else "failed")
+            # Structured quota signal for the UI (no more scanning stdout for "429")
+            spans = res["trace"]["spans"]
+            res["throttled"] = {"429s": sum(s["name"] == "model" and s["outcome"] == "429" for s in spans),
+                                "waited_s": round(sum(s["duration"] for s in spans if s["name"] == "rate_limit_wait"), 2),
+                                "retry_after": max((s.get("retry_after") or 0 for s in spans if s["name"] == "model"), default=0),
+                                "exhausted": self.exhausted}
+            if recalled:
+                res["history"] = {"run": recalled["id"], "score": recalled["score"], "use": recalled["use"]}
+            # Everything but Quick Ops style verbatim scripts goes into the run history (cancelled builds too, as failures)
+            if self.history and not (mode == "architect" and verbatim_code(prompt)):
+                try:
+                    self.history.record(prompt, mode, res, reused_from=recalled["id"] if recalled and recalled["use"] == "reuse" else None)
+                except sqlite3.Error:
+                    pass
+        if self.health: self.health.flush()
+        if self.memory: self.memory.flush()
+        return res
@@ -0,0 +1,278 @@
+"""DATA REGISTRY: tabular files of the data dir, cached column by column, described to the model.
+
+The registry scans the data dir (the directory the app runs from) for tables
+(csv, tsv, json, parquet, xlsx). It parses each one once and stores every
+column as a .npy file: numeric, bool and datetime columns can be
+memory-mapped, text columns are pickled object arrays. An entry is checked
+against the file's size and mtime first. When those changed but the sha256 did
+not (a touch, a copy), it is reused.
+
+Two things come out of it:
+
+  * the model sees the schema of the files a task names (columns, dtypes,
+    ranges, two sample rows), instead of guessing `Sales` for `Price`
+  * every sandbox gets this file plus a `.ouroboros_data.json` map of cache
+    entries, so scripts can skip the parse:
+
+        from ouroboros_data import load_table
+        df = load_table("sales_data.csv")       # falls back to pandas readers if the file changed
+
+    python ouroboros_data.py                    # scan and print what the model would see
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+
+MAP_NAME = ".ouroboros_data.json"
+TABLE_EXTS = (".csv", ".tsv", ".json", ".parquet", ".xlsx", ".xls")
+MIN_STEM = 4 # shorter file stems ("db", "out") only count when the full file name is given
+RESCAN_S = 30 # prompts re-check the data dir in the background at most this often (sooner when a file is added or removed)
+GENERIC = frozenset("data file files table sheet export final copy test sample".split())
+
+
+# --- A. SANDBOX SIDE (import-light: numpy/pandas load only when a table does) ---
+
+def _read(path):
+    """Plain pandas read by extension (no cache)"""
+    import pandas as pd
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".tsv": return pd.read_csv(path, sep="\t")
+    if ext == ".json": return pd.read_json(path)
+    if ext == ".parquet": return pd.read_parquet(path)
+    if ext in (".xlsx", ".xls"): return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def load_table(name, columns=None):
+    """DataFrame of a data file, from the column cache when it still matches the file"""
+    import numpy as np
+    import pandas as pd
+    try:
+        with open(MAP_NAME, "r", encoding="utf-8") as f: entry = json.load(f).get(os.path.basename(name))
+        st = os.stat(name)
+        if entry is None or [st.st_size, st.st_mtime_ns] != entry["stat"]: entry = None
+    except (OSError, ValueError):
+        entry = None
+    if entry is None:
+        df = _read(name)
+        return df if columns is None else df[list(columns)]
+    with open(os.path.join(entry["dir"], "meta.json"), "r", encoding="utf-8") as f: meta = json.load(f)
+    cols = meta["columns"] if columns is None else [c for c in meta["columns"] if c["name"] in columns]
+    data = {}
+    for c in cols:
+        arr = np.load(os.path.join(entry["dir"], c["file"]), mmap_mode=None if c["pickled"] else "r", allow_pickle=c["pickled"])
+        data[c["name"]] = pd.Series(arr, dtype=c["dtype"]) if c["pickled"] else arr
+    return pd.DataFrame(data, columns=[c["name"] for c in cols])
+
+
+# --- B. HOST SIDE ---
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+    return h.hexdigest()
+
+
+def _short(value, width=24):
+    text = str(value)
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+class DataRegistry:
+    """Data dir scan -> column cache + schema notes (one per process; refresh() is cheap when nothing changed)"""
+
+    def __init__(self, root, data_dir=None, max_mb=None):
+        self.root = root
+        self.data_dir = data_dir or os.getcwd()
+        self.max_mb = max_mb if max_mb is not None else float(os.environ.get("OUROBOROS_DATA_MAX_MB", "512"))
+        self.stats = {"scans": 0, "converted": 0, "reused": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._scanned = (None, 0.0) # (data dir mtime, monotonic time) of the last scan
+        self._index_path = os.path.join(root, "index.json")
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f: self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}  # file name -> {"stat", "sha", "dir", "meta"} or {"stat", "error"}
+
+    def refresh(self):
+        """Convert new or changed tables; stat-only when nothing changed -> {name: entry}"""
+        with self._lock:
+            self.stats["scans"] += 1
+            self._scanned = (self._dir_mtime(), time.monotonic())
+            seen, changed = set(), False
+            try:
+                names = sorted(os.listdir(self.data_dir))
+            except OSError:
+                names = []
+            for name in names:
+                path = os.path.join(self.data_dir, name)
+                if not name.lower().endswith(TABLE_EXTS) or not os.path.isfile(path): continue
+                seen.add(name)
+                st = os.stat(path)
+                stat = [st.st_size, st.st_mtime_ns]
+                old = self._index.get(name)
+                if old and old["stat"] == stat: continue
+                if st.st_size > self.max_mb * 1024 * 1024:
+                    self._index[name] = {"stat": stat, "error": f"over {self.max_mb:g} MB"}
+                    changed = True
+                    continue
+                sha = _sha256(path)
+                if old and old.get("sha") == sha and os.path.isdir(old.get("dir", "")):
+                    old["stat"] = stat  # touched or copied, same bytes
+                    self.stats["reused"] += 1
+                else:
+                    self._index[name] = self._convert(path, stat, sha)
+                changed = True
+            for name in set(self._index) - seen:
+                del self._index[name]
+                changed = True
+            if changed: self._save()
+            return {n: e for n, e in self._index.items() if "dir" in e}
+
+    def _dir_mtime(self):
+        try:
+            return os.stat(self.data_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def tables(self):
+        """Cached tables as of the last scan: no stat, no hash, never waits for a conversion"""
+        return {n: e for n, e in dict(self._index).items() if "dir" in e}
+
+    def refresh_soon(self, max_age=RESCAN_S):
+        """Background refresh() when the dir listing changed or the last scan is older than max_age"""
+        mtime, at = self._scanned
+        if self._lock.locked() or (self._dir_mtime() == mtime and time.monotonic() - at < max_age): return
+        self._scanned = (mtime, time.monotonic())  # one scan per window, however many prompts ask
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def _convert(self, path, stat, sha):
+        import numpy as np
+        entry_dir = os.path.join(self.root, sha[:16])
+        try:
+            df = _read(path)
+            if df.index.nlevels > 1 or df.index.name is not None: df = df.reset_index()
+            tmp = f"{entry_dir}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            columns = []
+            for i, name in enumerate(df.columns):
+                col = df.iloc[:, i]
+                kind = col.dtype.kind if isinstance(col.dtype, np.dtype) else "O"
+                pickled = kind not in "biufcmM"
+                arr = col.to_numpy(dtype=object) if pickled else col.to_numpy()
+                np.save(os.path.join(tmp, f"c{i}.npy"), arr, allow_pickle=pickled)
+                info = {"name": name if isinstance(name, (str, int, float)) else str(name), "dtype": str(col.dtype),
+                        "file": f"c{i}.npy", "pickled": pickled, "nulls": int(col.isna().sum())}
+                if kind in "iuf" and len(col) and col.notna().any():
+                    info["range"] = [_short(col.min(), 12), _short(col.max(), 12)]
+                elif pickled:
+                    info["unique"] = int(col.nunique())
+                columns.append(info)
+            meta = {"rows": len(df), "columns": columns,
+                    "sample": [[_short(v) for v in row] for row in df.head(2).itertuples(index=False)]}
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f: json.dump(meta, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp, entry_dir)
+        except Exception as e:
+            self.stats["failed"] += 1
+            return {"stat": stat, "sha": sha, "error": f"{type(e).__name__}: {_short(e, 120)}"}
+        self.stats["converted"] += 1
+        return {"stat": stat, "sha": sha, "dir": entry_dir, "meta": {k: meta[k] for k in ("rows", "columns", "sample")}}
+
+    def _save(self):
+        live = {e["dir"] for e in self._index.values() if "dir" in e}
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if os.path.isdir(path) and path not in live and not name.endswith(".tmp"): shutil.rmtree(path, ignore_errors=True)
+            tmp = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: json.dump(self._index, f)
+            os.replace(tmp, self._index_path)
+        except OSError:
+            pass
+
+    def mentioned(self, text, tables):
+        """Tables the text names: 'sales_data.csv', or as whole words 'sales_data' / 'sales data'"""
+        low = text.lower()
+        out = []
+        for name in tables:
+            stem = os.path.splitext(name)[0].lower()
+            forms = {name.lower()} | ({stem, re.sub(r"[_\-]+", " ", stem)} if len(stem) >= MIN_STEM else set())
+            if any(re.search(rf"(?<![\w.]){re.escape(f)}(?!\w)", low) for f in forms): out.append(name)
+        return out
+
+    def related(self, text, tables, limit=3):
+        """Tables the text does not name but hints at ("plot sales by price"), else the only table there is"""
+        words = set(re.findall(r"[a-z0-9]+(?:_[a-z0-9]+)*", text.lower())) - GENERIC
+        out = []
+        for name, entry in tables.items():
+            hints = {w for w in re.split(r"[_\-\s.]+", os.path.splitext(name)[0].lower()) if len(w) >= MIN_STEM}
+            for c in entry["meta"]["columns"]:
+                col = str(c["name"]).lower()
+                hints.update(w for w in [col] + re.split(r"[_\-\s]+", col) if len(w) >= MIN_STEM)
+            if words & hints: out.append(name)
+        return out[:limit] or (list(tables) if len(tables) == 1 else [])
+
+    def describe(self, text):
+        """Schema note for the prompt: the tables the text names, else related ones; '' when there are none.
+        Built from the cached index, so every draft, retry and speculative fork stays cheap."""
+        self.refresh_soon()
+        tables = self.tables()
+        names = self.mentioned(text, tables)
+        header = "DATA FILES (in the working directory, use these exact column names):"
+        if not names:
+            names = self.related(text, tables)
+            header = "DATA FILES in the working directory (the task names none; if it needs data, use these exact column names):"
+        if not names: return ""
+        lines = [header]
+        for name in names:
+            meta = tables[name]["meta"]
+            cols = []
+            for c in meta["columns"]:
+                extra = f" {c['range'][0]}..{c['range'][1]}" if "range" in c else f", {c['unique']} distinct" if "unique" in c else ""
+                if c["nulls"]: extra += f", {c['nulls']} missing"
+                cols.append(f"{c['name']} ({c['dtype']}{extra})")
+            lines.append(f"- {name}: {meta['rows']} rows; columns: " + ", ".join(cols))
+            for row in meta["sample"]: lines.append("    " + ", ".join(row))
+        lines.append("Load tables with `from ouroboros_data import load_table; df = load_table('<file name>')` (cached, same DataFrame as pandas).")
+        return "\n".join(lines)
+
+    def expose(self, workspace_dir):
+        """Let a sandbox use the cache: this module + the name -> entry map next to the script"""
+        entries = {n: {"dir": e["dir"], "stat": e["stat"]} for n, e in dict(self._index).items() if "dir" in e}
+        if not entries: return
+        try:
+            with open(os.path.join(workspace_dir, MAP_NAME), "w", encoding="utf-8") as f: json.dump(entries, f)
+            try: os.symlink(os.path.abspath(__file__), os.path.join(workspace_dir, "ouroboros_data.py"))
+            except OSError: shutil.copy2(os.path.abspath(__file__), workspace_dir)
+        except OSError:
+            pass
+
+    def summary(self):
+        index = dict(self._index)  # no lock: a conversion in progress must not stall the sidebar
+        tables = [e for e in index.values() if "dir" in e]
+        failed = len(index) - len(tables)
+        return f"{len(tables)} tables cached · {sum(e['meta']['rows'] for e in tables)} rows" + (f" · {failed} unreadable" if failed else "")
+
+    def snapshot(self):
+        return [{"file": n, "rows": e["meta"]["rows"] if "meta" in e else None,
+                 "columns": len(e["meta"]["columns"]) if "meta" in e else None, "status": e.get("error", "cached")}
+                for n, e in sorted(dict(self._index).items())]
+
+
+if __name__ == "__main__":
+    cache = os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache"))
+    registry = DataRegistry(os.path.join(cache, "data"))
+    tables = registry.refresh()
+    for row in registry.snapshot(): print(f"{row['file']:<30} {row['status']:<10} {row['rows'] or '-':>8} rows")
+    note = registry.describe(" ".join(tables))
+    if note: print("\n" + note)
+    sys.exit(0)
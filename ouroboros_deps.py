@@ -0,0 +1,248 @@
+"""OMNI-LINK RESOLVER: batched dependency installs with an offline wheelhouse.
+
+Every import of a script is resolved up front, missing ones are mapped to pip
+names and installed in ONE pip call that prefers the local wheelhouse. Names
+that cannot be installed are remembered on disk so they are never retried.
+
+    python ouroboros_deps.py seed -r requirements.txt   # fill the wheelhouse (online)
+    python ouroboros_deps.py seed qrcode networkx
+    OUROBOROS_OFFLINE=1 streamlit run ouroboros.py      # install from the wheelhouse only
+"""
+import ast
+import importlib.util
+import json
+import os
+import re
+import site
+import subprocess
+import sys
+import threading
+import time
+
+# Map common import names to Pip package names
+PIP_MAP = {
+    "sklearn": "scikit-learn",
+    "cv2": "opencv-python-headless",
+    "PIL": "Pillow",
+    "skimage": "scikit-image",
+    "yaml": "PyYAML",
+    "bs4": "beautifulsoup4",
+    "dateutil": "python-dateutil",
+    "dotenv": "python-dotenv",
+    "docx": "python-docx",
+    "pptx": "python-pptx",
+    "fitz": "PyMuPDF",
+    "Crypto": "pycryptodome",
+    "OpenSSL": "pyOpenSSL",
+    "jwt": "PyJWT",
+    "serial": "pyserial",
+    "usb": "pyusb",
+    "zmq": "pyzmq",
+    "attr": "attrs",
+    "magic": "python-magic",
+    "Levenshtein": "python-Levenshtein",
+    "IPython": "ipython",
+    "mpl_toolkits": "matplotlib",
+    "google.generativeai": "google-generativeai",
+    "streamlit_antd_components": "streamlit-antd-components",
+}
+
+# Hallucinated modules the model keeps inventing (see IMPORT RULE in the prompt)
+NEVER_INSTALLABLE = {"plt", "shift", "utils", "helpers", "my_module", "your_module"}
+
+cache_dir = os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache"))
+
+
+IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+
+
+def _guarded_imports(tree):
+    """Import nodes inside a `try:` body whose handlers catch ImportError (optional imports with a fallback)"""
+    guarded = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Try): continue
+        caught = set()
+        for handler in node.handlers:
+            types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+            for t in types:
+                if t is None: caught.add("BaseException")  # bare except
+                elif isinstance(t, ast.Name): caught.add(t.id)
+                elif isinstance(t, ast.Attribute): caught.add(t.attr)
+        if caught & IMPORT_ERRORS:
+            for stmt in node.body:
+                guarded.update(id(n) for n in ast.walk(stmt) if isinstance(n, (ast.Import, ast.ImportFrom)))
+    return guarded
+
+
+def imports_of(code, optional=True):
+    """Top-level module names imported anywhere in the script (regex fallback if it does not parse).
+    optional=False leaves out imports guarded by `try: ... except ImportError:`"""
+    roots = []
+    try:
+        tree = ast.parse(code)
+        skip = set() if optional else _guarded_imports(tree)
+        for node in ast.walk(tree):
+            if id(node) in skip: continue
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            roots.extend(n.split(".")[0] for n in names)
+    except SyntaxError:
+        roots = re.findall(r'^\s*(?:from|import)\s+([A-Za-z_]\w*)', code, re.M)
+    return list(dict.fromkeys(roots))
+
+
+def is_installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class DependencyResolver:
+    """Resolve many modules with one pip call; remember what can never be installed"""
+
+    def __init__(self, wheelhouse=None, state_path=None, offline=None, negative_ttl=7 * 24 * 3600):
+        self.wheelhouse = wheelhouse or os.environ.get("OUROBOROS_WHEELHOUSE", os.path.join(cache_dir, "wheelhouse"))
+        self.state_path = state_path or os.path.join(cache_dir, "unavailable_modules.json")
+        self.offline = offline if offline is not None else os.environ.get("OUROBOROS_OFFLINE") == "1"
+        self.negative_ttl = negative_ttl
+        self.stats = {"pip_calls": 0, "installed": 0, "skipped_unavailable": 0}
+        self._lock = threading.Lock()
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self._unavailable = json.load(f)
+        except (OSError, ValueError):
+            self._unavailable = {}
+
+    # --- lookups ---
+
+    def is_unavailable(self, module):
+        if module in NEVER_INSTALLABLE:
+            return True
+        hit = self._unavailable.get(module)
+        return bool(hit) and time.time() - hit["at"] < self.negative_ttl
+
+    def missing(self, modules):
+        _refresh_user_site()
+        return [m for m in dict.fromkeys(modules) if m not in sys.stdlib_module_names and not is_installed(m)]
+
+    # --- installs ---
+
+    def resolve(self, modules):
+        """-> (installed, unavailable) for the modules that were missing"""
+        with self._lock:
+            missing = self.missing(modules)
+            if not missing:
+                return [], []
+            unavailable = [m for m in missing if self.is_unavailable(m)]
+            self.stats["skipped_unavailable"] += len(unavailable)
+            todo = [m for m in missing if m not in unavailable]
+            if not todo:
+                return [], unavailable
+
+            if not self._pip([PIP_MAP.get(m, m) for m in todo]) and len(todo) > 1:
+                # pip resolves a batch all-or-nothing: isolate the culprit(s) one by one
+                for m in todo:
+                    self._pip([PIP_MAP.get(m, m)])
+
+            _refresh_user_site()
+            installed = [m for m in todo if is_installed(m)]
+            failed = [m for m in todo if m not in installed]
+            self.stats["installed"] += len(installed)
+            for m in failed:
+                self._unavailable[m] = {"at": time.time(), "pip": PIP_MAP.get(m, m), "offline": self.offline}
+            if failed:
+                self._save()
+            return installed, unavailable + failed
+
+    def ensure(self, requirements):
+        """Bootstrap: {import_name: pip_name}; installs whatever is missing in one call"""
+        missing = [name for name in requirements if not is_installed(name)]
+        if missing:
+            self._pip([requirements[name] for name in missing])
+            _refresh_user_site()
+        return missing
+
+    def pip_command(self, packages):
+        cmd = [sys.executable, "-m", "pip", "install", "--disable-pip-version-check"]
+        if sys.prefix == sys.base_prefix:
+            cmd.append("--user")  # Use --user to avoid permission errors on Cloud (not valid inside a venv)
+        if os.path.isdir(self.wheelhouse):
+            cmd += ["--find-links", self.wheelhouse]
+        if self.offline:
+            cmd.append("--no-index")
+        return cmd + list(packages)
+
+    def _pip(self, packages):
+        self.stats["pip_calls"] += 1
+        try:
+            subprocess.check_call(self.pip_command(packages), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            importlib.invalidate_caches()
+            return True
+        except (subprocess.CalledProcessError, OSError):
+            return False
+
+    def seed(self, packages=(), requirement_files=()):
+        """Download wheels (and their deps) into the wheelhouse for later offline installs"""
+        os.makedirs(self.wheelhouse, exist_ok=True)
+        cmd = [sys.executable, "-m", "pip", "download", "--disable-pip-version-check", "-d", self.wheelhouse]
+        for req in requirement_files:
+            cmd += ["-r", req]
+        return subprocess.call(cmd + [PIP_MAP.get(p, p) for p in packages])
+
+    def forget(self, module=None):
+        """Drop one (or every) negative entry, e.g. after seeding the wheelhouse"""
+        with self._lock:
+            if module: self._unavailable.pop(module, None)
+            else: self._unavailable.clear()
+            self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._unavailable, f, indent=1)
+            os.replace(tmp, self.state_path)
+        except OSError:
+            pass
+
+
+_bootstrapped = set()
+
+
+def bootstrap(requirements):
+    """ensure() once per process: Streamlit reruns re-execute the caller, not this module"""
+    key = tuple(sorted(requirements.items()))
+    if key not in _bootstrapped:
+        DependencyResolver().ensure(requirements)
+        _bootstrapped.add(key)
+
+
+def _refresh_user_site():
+    # Packages pip-installed with --user after startup must be visible to find_spec
+    user_site = site.getusersitepackages()
+    if os.path.isdir(user_site) and user_site not in sys.path:
+        sys.path.append(user_site)
+    importlib.invalidate_caches()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "seed":
+        print(__doc__)
+        sys.exit(1)
+    files, pkgs, rest = [], [], args[1:]
+    while rest:
+        arg = rest.pop(0)
+        if arg == "-r" and rest: files.append(rest.pop(0))
+        else: pkgs.append(arg)
+    resolver = DependencyResolver()
+    code = resolver.seed(pkgs, files)
+    if code == 0:
+        resolver.forget()
+    sys.exit(code)
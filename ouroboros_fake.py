@@ -0,0 +1,119 @@
+"""FAKE GEMINI: scripted, deterministic stand-in for the model backend.
+
+Drop-in for `GeminiBackend` (generate / stream / list_models) that never
+touches the network. A script decides what each model answers, how long it
+takes and how it fails:
+
+    {
+      "latency": 0.3,                     # seconds before the answer (per call)
+      "chunk_latency": 0.01,              # seconds between streamed chunks
+      "models": {
+        "gemini-1.5-flash": {"fail": "404"},                  # 404 | 429 | timeout | any message
+        "gemini-1.0-pro":   {"fail": "timeout", "hang": 5},   # hang 5s (default: the request timeout)
+        "gemini-1.5-pro":   {"fail": "429", "fail_times": 2, # fail twice, then answer;
+                             "retry_after": 3},               # the 429 carries a RetryInfo hint
+        "gemini-pro":       {"latency": 12.0}
+      },
+      "responses": [
+        {"match": "bench:repair", "replies": ["<broken code>", "<fixed code>"]}
+      ],
+      "default": "print('hello from the fake backend')",
+      "trailer": "\n"                    # text after the closing fence (real models often add a newline)
+    }
+
+Each matching call takes the next reply of its rule (the last one repeats),
+so a reflexion round can be scripted as "wrong first, right second".
+
+    OUROBOROS_BACKEND=fake:script.json streamlit run ouroboros.py
+"""
+import json
+import random
+import re
+import threading
+import time
+
+DEFAULT_MODELS = ["models/gemini-1.5-flash", "models/gemini-1.5-pro", "models/gemini-1.0-pro", "models/gemini-pro"]
+
+
+class FakeError(Exception):
+    """Carries the same status text the SDK puts in its exceptions (ModelHealth keys off it)"""
+
+
+class FakeGemini:
+    def __init__(self, script=None, seed=0):
+        self.script = script or {}
+        self.calls = [] # (model, outcome)
+        self._served = {}
+        self._failed = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=None):
+        if not path: return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _config(self, model_name):
+        return self.script.get("models", {}).get(model_name.split("/")[-1], {})
+
+    def _reply(self, prompt):
+        with self._lock:
+            for i, rule in enumerate(self.script.get("responses", [])):
+                if re.search(rule["match"], prompt):
+                    replies = rule["replies"] if "replies" in rule else [rule["code"]]
+                    n = self._served.get(i, 0)
+                    self._served[i] = n + 1
+                    return replies[min(n, len(replies) - 1)]
+        return self.script.get("default", "print('hello from the fake backend')")
+
+    def _answer(self, model_name, prompt, timeout):
+        """Sleep, fail or pick the scripted code -> full response text"""
+        cfg = self._config(model_name)
+        latency = cfg.get("latency", self.script.get("latency", 0.0))
+        with self._lock:
+            latency *= 1 + self._rng.uniform(-1, 1) * self.script.get("jitter", 0.0)
+            fail = cfg.get("fail")
+            if fail and "fail_times" in cfg:
+                n = self._failed.get(model_name, 0)
+                if n >= cfg["fail_times"]: fail = None
+                else: self._failed[model_name] = n + 1
+        if fail == "timeout" or latency > timeout:
+            time.sleep(min(timeout, cfg.get("hang", self.script.get("hang", timeout))))
+            self._log(model_name, "timeout")
+            raise TimeoutError("504 Deadline Exceeded")
+        time.sleep(latency)
+        if fail:
+            self._log(model_name, str(fail))
+            if fail == "404": raise FakeError(f"404 models/{model_name.split('/')[-1]} is not found for API version v1beta")
+            if fail == "429":
+                hint = f" retry_delay {{ seconds: {cfg['retry_after']} }}" if "retry_after" in cfg else ""
+                raise FakeError("429 Resource has been exhausted (e.g. check quota)." + hint)
+            raise FakeError(str(fail))
+        self._log(model_name, "ok")
+        return f"```python\n{self._reply(prompt)}\n```" + self.script.get("trailer", "")
+
+    def _log(self, model_name, outcome):
+        with self._lock:
+            self.calls.append((model_name, outcome))
+
+    # --- backend protocol ---
+
+    def generate(self, model_name, prompt, timeout, temperature=None):
+        return self._answer(model_name, prompt, timeout)
+
+    def stream(self, model_name, prompt, timeout):
+        text = self._answer(model_name, prompt, timeout)
+        delay = self.script.get("chunk_latency", 0.0)
+        for i in range(0, len(text), 32):
+            if delay: time.sleep(delay)
+            yield text[i:i + 32]
+
+    def list_models(self):
+        return list(self.script.get("list_models", DEFAULT_MODELS))
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+        return {"calls": len(calls), "errors": sum(1 for _, o in calls if o != "ok"),
+                "by_model": {m: sum(1 for c, _ in calls if c == m) for m in dict.fromkeys(c for c, _ in calls)}}
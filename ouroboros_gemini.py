@@ -0,0 +1,197 @@
+"""GEMINI CLIENT: google-genai backend on one shared event loop, with per-key clients and single-flight calls.
+
+Same three methods as the other backends (generate / stream / list_models),
+plus `agenerate` for asyncio callers. How it works:
+
+  * one `genai.Client` per API key for the whole process. There is no global
+    `configure`, so sessions with different keys never see each other's key.
+    Each client keeps its pooled HTTP connections alive between calls.
+  * every request runs on one asyncio loop in a daemon thread. The sync API,
+    which the engine's hedging threads use, blocks on a future. `agenerate`
+    awaits the same future from any other event loop.
+  * per-request deadline: the HTTP timeout, plus an asyncio timeout around it
+    that raises "504 Deadline exceeded", so the cascade classifies it as a
+    timeout
+  * single flight: identical (key, model, prompt, temperature) calls that are
+    in flight at the same time share one request. A waiter that gives up does
+    not cancel it for the others.
+  * a stream that its reader abandons (StreamGuard abort, lost hedge) closes
+    its HTTP response
+
+    backend = GeminiClient(key)
+    backend.generate("gemini-1.5-flash", prompt, timeout=30)
+    await backend.agenerate("gemini-1.5-flash", prompt, timeout=30)
+    GEMINI_API_KEY=... python ouroboros_gemini.py "Say hi" --n 4       # 4 identical calls -> 1 request
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import importlib.util
+import os
+import queue
+import sys
+import threading
+import time
+
+STATS = {"clients": 0, "requests": 0, "coalesced": 0, "streams": 0, "timeouts": 0}
+_DONE = object()
+_lock = threading.Lock()
+_client_lock = threading.Lock() # held while a new key's client is built (imports, TLS setup): never by the loop thread
+_loop = None
+_clients = {}   # key id -> genai.Client
+_inflight = {}  # (key id, model, temperature, prompt sha) -> asyncio.Task; only touched on the loop thread
+
+
+def _event_loop():
+    """The process-wide loop every request runs on (started on first use)"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="ouroboros-genai", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _timeout_error(model_name, timeout):
+    STATS["timeouts"] += 1
+    return TimeoutError(f"504 Deadline exceeded: {model_name} gave no answer within {timeout:.0f}s")
+
+
+def client_summary():
+    s = STATS
+    return f"{s['clients']} client(s) · {s['requests']} requests · {s['coalesced']} coalesced · {s['streams']} streams"
+
+
+class GeminiClient:
+    """Model backend over google-genai (see module doc); cheap to create, the client behind it is shared per key"""
+
+    def __init__(self, key):
+        self.key = key
+        self.key_id = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("google.genai") is not None
+
+    @property
+    def client(self):
+        """Shared genai.Client of this key; the first call imports and builds it, so never call it on the loop thread"""
+        client = _clients.get(self.key_id)
+        if client is not None: return client
+        with _client_lock:
+            client = _clients.get(self.key_id)
+            if client is None:
+                import httpx
+                from google import genai
+                from google.genai import types
+                size = int(os.environ.get("OUROBOROS_GENAI_CONNECTIONS", "32"))
+                limits = httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=120)
+                client = _clients[self.key_id] = genai.Client(
+                    api_key=self.key, http_options=types.HttpOptions(async_client_args={"limits": limits}))
+                STATS["clients"] += 1
+            return client
+
+    def _config(self, timeout, temperature):
+        from google.genai import types
+        return types.GenerateContentConfig(temperature=temperature, http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+    async def _request(self, client, model_name, prompt, timeout, temperature):
+        call = client.aio.models.generate_content(model=model_name, contents=prompt, config=self._config(timeout, temperature))
+        # A bare TimeoutError: each waiter turns it into its own 504 in _shared, counted once there
+        response = await asyncio.wait_for(call, timeout)
+        return response.text or ""
+
+    async def _shared(self, client, model_name, prompt, timeout, temperature):
+        """Join an identical request in flight, or start one"""
+        key = (self.key_id, model_name, temperature, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        task = _inflight.get(key)
+        if task is None:
+            task = _inflight[key] = asyncio.ensure_future(self._request(client, model_name, prompt, timeout, temperature))
+            STATS["requests"] += 1
+
+            def done(t):
+                if _inflight.get(key) is t: del _inflight[key]
+                if not t.cancelled(): t.exception()  # retrieved: no "never retrieved" noise when every waiter left
+            task.add_done_callback(done)
+        else:
+            STATS["coalesced"] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise _timeout_error(model_name, timeout) from None
+
+    def generate(self, model_name, prompt, timeout, temperature=None):
+        future = asyncio.run_coroutine_threadsafe(self._shared(self.client, model_name, prompt, timeout, temperature), _event_loop())
+        # Only a wedged loop ends up here; the request's own deadline raises from inside the future, as is
+        if not concurrent.futures.wait([future], timeout + 5).done:
+            future.cancel()
+            raise _timeout_error(model_name, timeout)
+        return future.result()
+
+    async def agenerate(self, model_name, prompt, timeout, temperature=None):
+        """Awaitable generate() for callers on their own event loop (the request itself runs on the shared one)"""
+        client = _clients.get(self.key_id) or await asyncio.to_thread(lambda: self.client)  # first use: build it off this loop too
+        future = asyncio.run_coroutine_threadsafe(self._shared(client, model_name, prompt, timeout, temperature), _event_loop())
+        return await asyncio.wrap_future(future)
+
+    def stream(self, model_name, prompt, timeout):
+        chunks = queue.Queue()
+        client = self.client
+
+        async def pump():
+            async def read():
+                response = await client.aio.models.generate_content_stream(
+                    model=model_name, contents=prompt, config=self._config(timeout, None))
+                async for chunk in response:
+                    chunks.put(chunk.text or "")  # metadata-only chunks carry no text
+            try:
+                await asyncio.wait_for(read(), timeout)
+                chunks.put(_DONE)
+            except asyncio.TimeoutError:
+                chunks.put(_timeout_error(model_name, timeout))
+            except BaseException as e:
+                chunks.put(e)
+                if isinstance(e, asyncio.CancelledError): raise
+
+        STATS["streams"] += 1
+        future = asyncio.run_coroutine_threadsafe(pump(), _event_loop())
+        deadline = time.monotonic() + timeout + 5
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Empty:
+                    raise _timeout_error(model_name, timeout) from None
+                if item is _DONE: return
+                if isinstance(item, BaseException): raise item
+                if item: yield item
+        finally:
+            future.cancel()  # the reader stopped early: drop the HTTP stream
+
+    def list_models(self):
+        return [m.name for m in self.client.models.list() if "generateContent" in (m.supported_actions or [])]
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Fire identical concurrent prompts through one shared client.")
+    p.add_argument("prompt")
+    p.add_argument("--model", default="gemini-1.5-flash")
+    p.add_argument("--n", type=int, default=1, help="identical concurrent calls (coalesced into one request)")
+    p.add_argument("--timeout", type=float, default=60)
+    args = p.parse_args()
+    key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    if not key:
+        print("set GEMINI_API_KEY")
+        sys.exit(1)
+    backend = GeminiClient(key)
+
+    async def main():
+        t0 = time.monotonic()
+        replies = await asyncio.gather(*(backend.agenerate(args.model, args.prompt, args.timeout) for _ in range(args.n)))
+        print(replies[0])
+        print(f"\n{time.monotonic() - t0:.2f}s · {client_summary()}")
+
+    asyncio.run(main())
+    sys.exit(0)
@@ -0,0 +1,197 @@
+"""RUN HISTORY: every build's prompt, final code, outcome and timings, with similar-prompt retrieval.
+
+Builds are appended to a local SQLite file. Builder prompts of loud successes
+feed a TF-IDF index: word unigrams and bigrams for meaning, character trigrams
+for typos and inflections ("plot sales by product" ~ "plotting product
+sales"). For a new prompt the engine asks `match()`:
+
+    score >= OUROBOROS_HISTORY_REUSE (0.9), same numbers -> re-run the stored script, no model call
+    score >= OUROBOROS_HISTORY_EXAMPLE (0.45)              -> the stored script goes into the prompt as a verified example
+
+The dashboard also lists close matches under the prompt box for one-click re-execution.
+
+    python ouroboros_history.py search "plot sales by product"
+    python ouroboros_history.py list 20
+"""
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+
+STOPWORDS = frozenset("a an and as at be by for from in into is it me of on or please python script show that the this "
+                      "to using with write".split())
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL, mode TEXT, prompt TEXT, code TEXT,
+    success INTEGER, attempts INTEGER, build_s REAL, model TEXT, reused_from INTEGER, uses INTEGER DEFAULT 0);
+CREATE INDEX IF NOT EXISTS runs_success ON runs (mode, success);
+"""
+
+
+def _features(text):
+    """-> Counter of word unigrams/bigrams and per-word character trigrams"""
+    words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS]
+    feats = Counter(words)
+    feats.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"#{w}#"
+        feats.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return feats
+
+
+def _numbers(text):
+    return sorted(re.findall(r"\d+(?:\.\d+)?", text))
+
+
+def example_prompt(prompt, match):
+    """Architect task text with a verified script for a similar request attached"""
+    return (f"{prompt}\n\n"
+            f"VERIFIED EXAMPLE: this script ran successfully for a similar request (\"{match['prompt'][:200]}\"). "
+            f"Reuse what fits, change what this task needs:\n```python\n{match['code']}\n```")
+
+
+class RunHistory:
+    """SQLite run log + in-memory TF-IDF index over successful builder prompts (one per process)"""
+
+    def __init__(self, path, max_indexed=5000, reuse=None, example=None):
+        self.path = path
+        self.max_indexed = max_indexed
+        self.reuse = reuse if reuse is not None else float(os.environ.get("OUROBOROS_HISTORY_REUSE", "0.9"))
+        self.example = example if example is not None else float(os.environ.get("OUROBOROS_HISTORY_EXAMPLE", "0.45"))
+        self.stats = {"lookups": 0, "reused": 0, "examples": 0, "recorded": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._docs = {}     # run id -> {"prompt", "feats"}
+        self._postings = {} # feature -> {run id}
+        self._vectors = None # run id -> {feature: weight}, rebuilt after changes
+        self._idf = {}
+        self._conn().executescript(SCHEMA)
+        rows = self._conn().execute("SELECT id, prompt FROM runs WHERE mode = 'architect' AND success = 1 AND reused_from IS NULL "
+                                    "ORDER BY id DESC LIMIT ?", (max_indexed,)).fetchall()
+        for run_id, prompt in reversed(rows):
+            self._index(run_id, prompt)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- index ---
+
+    def _index(self, run_id, prompt):
+        """Caller holds the lock (or is __init__); the newest run of an identical prompt replaces the older one"""
+        norm = " ".join(prompt.lower().split())
+        for old_id, doc in list(self._docs.items()):
+            if doc["norm"] == norm: self._unindex(old_id)
+        feats = _features(prompt)
+        self._docs[run_id] = {"prompt": prompt, "norm": norm, "feats": feats}
+        for f in feats: self._postings.setdefault(f, set()).add(run_id)
+        while len(self._docs) > self.max_indexed:
+            self._unindex(min(self._docs))
+        self._vectors = None
+
+    def _unindex(self, run_id):
+        doc = self._docs.pop(run_id)
+        for f in doc["feats"]:
+            ids = self._postings.get(f)
+            if ids:
+                ids.discard(run_id)
+                if not ids: del self._postings[f]
+        self._vectors = None
+
+    def _weights(self, feats):
+        vec = {f: (1 + math.log(tf)) * self._idf.get(f, 0.0) for f, tf in feats.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {f: w / norm for f, w in vec.items() if w}
+
+    def _refresh(self):
+        if self._vectors is not None: return
+        n = len(self._docs)
+        self._idf = {f: math.log((1 + n) / (1 + len(ids))) + 1 for f, ids in self._postings.items()}
+        self._vectors = {run_id: self._weights(doc["feats"]) for run_id, doc in self._docs.items()}
+
+    # --- queries ---
+
+    def similar(self, prompt, k=3, min_score=None):
+        """-> [{"id", "prompt", "code", "score", "build_s", "attempts", "uses", "created"}] best first"""
+        min_score = self.example if min_score is None else min_score
+        feats = _features(prompt)
+        with self._lock:
+            self._refresh()
+            query = self._weights(feats)
+            candidates = set()
+            for f in query: candidates |= self._postings.get(f, set())
+            scored = sorted(((sum(w * self._vectors[c].get(f, 0.0) for f, w in query.items()), c) for c in candidates),
+                            reverse=True)
+        hits = [(round(score, 3), run_id) for score, run_id in scored[:k] if score >= min_score]
+        if not hits: return []
+        rows = {r[0]: r for r in self._conn().execute(
+            f"SELECT id, prompt, code, build_s, attempts, uses, created FROM runs WHERE id IN ({','.join('?' * len(hits))})",
+            [run_id for _, run_id in hits])}
+        return [{"id": run_id, "prompt": rows[run_id][1], "code": rows[run_id][2], "score": score, "build_s": rows[run_id][3],
+                 "attempts": rows[run_id][4], "uses": rows[run_id][5], "created": rows[run_id][6]}
+                for score, run_id in hits if run_id in rows]
+
+    def match(self, prompt):
+        """Best match for a new builder prompt with its use: "reuse" (run it as is), "example" (show it the model) or None"""
+        with self._lock: self.stats["lookups"] += 1
+        hits = self.similar(prompt, k=1)
+        if not hits: return None
+        hit = hits[0]
+        # "... for 2023" vs "... for 2024" is not a duplicate, whatever the score says
+        hit["use"] = "reuse" if hit["score"] >= self.reuse and _numbers(hit["prompt"]) == _numbers(prompt) else "example"
+        with self._lock: self.stats["reused" if hit["use"] == "reuse" else "examples"] += 1
+        return hit
+
+    # --- recording ---
+
+    def record(self, prompt, mode, res, reused_from=None):
+        """Append a finished build -> run id (loud builder successes that were not re-runs become retrievable)"""
+        spans = (res.get("trace") or {}).get("spans", [])
+        model = next((s["model"] for s in reversed(spans) if s["name"] == "model" and s["outcome"] == "ok"), None)
+        success = bool(res["success"] and (res["stdout"].strip() or res["artifacts"]))
+        build_s = (res.get("trace") or {}).get("duration")
+        conn = self._conn()
+        cur = conn.execute("INSERT INTO runs (created, mode, prompt, code, success, attempts, build_s, model, reused_from) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (time.time(), mode, prompt, res["code"], int(success), res.get("attempts", 1), build_s, model, reused_from))
+        if reused_from is not None and success:
+            conn.execute("UPDATE runs SET uses = uses + 1 WHERE id = ?", (reused_from,))
+        with self._lock:
+            self.stats["recorded"] += 1
+            # A re-run adds nothing to retrieve: its script is already indexed under the original prompt
+            if success and mode == "architect" and reused_from is None: self._index(cur.lastrowid, prompt)
+        return cur.lastrowid
+
+    def summary(self):
+        s = self.stats
+        return f"{len(self._docs)} indexed · {s['reused']} reused · {s['examples']} as examples / {s['lookups']} lookups"
+
+    def recent(self, n=20):
+        rows = self._conn().execute("SELECT id, created, mode, success, attempts, build_s, model, uses, prompt FROM runs "
+                                    "ORDER BY id DESC LIMIT ?", (n,)).fetchall()
+        return [{"id": r[0], "when": time.strftime("%Y-%m-%d %H:%M", time.localtime(r[1])), "mode": r[2], "ok": bool(r[3]),
+                 "attempts": r[4], "build_s": round(r[5] or 0, 2), "model": r[6], "uses": r[7], "prompt": r[8][:80]} for r in rows]
+
+
+if __name__ == "__main__":
+    cache = os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache"))
+    history = RunHistory(os.environ.get("OUROBOROS_HISTORY_DB", os.path.join(cache, "history.sqlite3")))
+    args = sys.argv[1:]
+    if args[:1] == ["search"] and len(args) > 1:
+        for hit in history.similar(" ".join(args[1:]), k=5, min_score=0.0):
+            print(f"{hit['score']:.3f}  #{hit['id']}  {hit['prompt'][:100]}")
+    elif args[:1] == ["list"]:
+        for row in history.recent(int(args[1]) if len(args) > 1 else 20):
+            print(f"#{row['id']:<5} {row['when']}  {'ok  ' if row['ok'] else 'FAIL'} {row['build_s']:>7.2f}s  {row['mode']:<9} {row['prompt']}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,419 @@
+"""JOB QUEUE: headless builds that outlive the Streamlit session that asked for them.
+
+Jobs live in a local SQLite file (no outside services). A pool of worker
+threads claims them, runs `InvictusEngine.build` and writes phase events, a
+live snapshot (HUD, streaming code, terminal tail) and the final result back.
+The dashboard only submits and polls, so a browser refresh re-attaches to a
+running build instead of killing it.
+
+The API key of a job is not in the job table. The job only stores a key id
+(sha256 prefix). Workers resolve it from the submitting process's memory, from
+OUROBOROS_API_KEY / OUROBOROS_API_KEYS, or, if OUROBOROS_KEYS_FILE is set, from
+that 0600 file. A worker that cannot resolve it fails the job with a clear
+error and never uses some other key. A key is forgotten once its last job
+finishes.
+
+    OUROBOROS_API_KEYS=k1,k2 python ouroboros_jobs.py worker --workers 4   # standalone workers
+    python ouroboros_jobs.py submit "Plot a sine wave"   # -> job id
+    python ouroboros_jobs.py status <job_id>
+    OUROBOROS_JOB_WORKERS=0 streamlit run ouroboros.py   # dashboard only enqueues
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from ouroboros_artifacts import copy_out
+from ouroboros_data import DataRegistry
+from ouroboros_history import RunHistory
+from ouroboros_memory import RepairMemory
+from ouroboros_ratelimit import RateLimiter
+from ouroboros_core import InvictusEngine, ResponseCache, ExecutionCache, ModelHealth, DependencyResolver, sweep_workspaces, cache_dir, current_dir
+
+jobs_db = os.environ.get("OUROBOROS_JOBS_DB", os.path.join(cache_dir, "jobs.sqlite3"))
+jobs_dir = os.path.join(cache_dir, "jobs")
+FINISHED = ("done", "failed", "cancelled")
+keys_file = os.environ.get("OUROBOROS_KEYS_FILE", "") # opt-in: share submitted keys with worker processes on this host
+STALE_AFTER = 300 # a running job without a heartbeat for this long lost its worker
+HEARTBEAT = 30 # a running job beats this often, also while a model call or the script is in progress
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, mode TEXT, prompt TEXT, error_context TEXT, use_cache INTEGER,
+    status TEXT, worker TEXT, cancel INTEGER DEFAULT 0,
+    created REAL, started REAL, finished REAL, heartbeat REAL,
+    result TEXT, error TEXT, key_ref TEXT);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT, at REAL, phase TEXT, payload TEXT);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq);
+CREATE TABLE IF NOT EXISTS live (
+    job_id TEXT, kind TEXT, body TEXT, PRIMARY KEY (job_id, kind));
+"""
+
+
+class JobStore:
+    """SQLite-backed queue: one connection per thread, WAL so polling readers never block workers"""
+
+    def __init__(self, path=None):
+        self.path = path or jobs_db
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+        try:
+            self._conn().execute("ALTER TABLE jobs ADD COLUMN key_ref TEXT")
+        except sqlite3.OperationalError:
+            pass # created with it, or already migrated
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- producer side ---
+
+    def submit(self, prompt, mode="architect", error_context=None, use_cache=True, job_id=None, key_ref=None):
+        job_id = job_id or uuid.uuid4().hex[:12]
+        self._conn().execute(
+            "INSERT INTO jobs (id, mode, prompt, error_context, use_cache, status, created, key_ref) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, mode, prompt, error_context, int(use_cache), time.time(), key_ref))
+        return job_id
+
+    def cancel(self, job_id):
+        conn = self._conn()
+        conn.execute("UPDATE jobs SET cancel = 1 WHERE id = ?", (job_id,))
+        conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None: return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def events(self, job_id, after=0):
+        """-> [(seq, phase, payload)] newer than `after`"""
+        rows = self._conn().execute("SELECT seq, phase, payload FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                                    (job_id, after)).fetchall()
+        return [(r["seq"], r["phase"], json.loads(r["payload"])) for r in rows]
+
+    def live(self, job_id):
+        """-> {kind: body} latest snapshot of a running job"""
+        return {r["kind"]: r["body"] for r in self._conn().execute("SELECT kind, body FROM live WHERE job_id = ?", (job_id,))}
+
+    def counts(self):
+        return {r[0]: r[1] for r in self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+    # --- worker side ---
+
+    def claim(self, worker):
+        """Atomically move the oldest queued job to running -> job dict or None"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row:
+                now = time.time()
+                conn.execute("UPDATE jobs SET status = 'running', worker = ?, started = ?, heartbeat = ? WHERE id = ?",
+                             (worker, now, now, row["id"]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"]) if row else None
+
+    def event(self, job_id, phase, payload):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT INTO events (job_id, at, phase, payload) VALUES (?, ?, ?, ?)", (job_id, now, phase, json.dumps(payload)))
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (now, job_id))
+
+    def beat(self, job_id):
+        self._conn().execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def set_live(self, job_id, kind, body):
+        if body is None:
+            self._conn().execute("DELETE FROM live WHERE job_id = ? AND kind = ?", (job_id, kind))
+        else:
+            self._conn().execute("INSERT OR REPLACE INTO live (job_id, kind, body) VALUES (?, ?, ?)", (job_id, kind, body))
+
+    def is_cancelled(self, job_id):
+        row = self._conn().execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel"])
+
+    def finish(self, job_id, status, result=None, error=None):
+        conn = self._conn()
+        conn.execute("UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?",
+                     (status, time.time(), json.dumps(result) if result is not None else None, error, job_id))
+        conn.execute("DELETE FROM live WHERE job_id = ?", (job_id,))
+
+    def active_key_refs(self):
+        return {r[0] for r in self._conn().execute("SELECT DISTINCT key_ref FROM jobs WHERE status IN ('queued', 'running') AND key_ref IS NOT NULL")}
+
+    def requeue_stale(self, max_age=STALE_AFTER):
+        cur = self._conn().execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+                                   (time.time() - max_age,))
+        return cur.rowcount
+
+    def prune(self, max_age=7 * 24 * 3600):
+        """Drop finished jobs (rows, events, artifacts) older than max_age"""
+        conn = self._conn()
+        cutoff = time.time() - max_age
+        old = [r["id"] for r in conn.execute("SELECT id FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished < ?", (cutoff,))]
+        for job_id in old:
+            conn.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            shutil.rmtree(os.path.join(jobs_dir, job_id), ignore_errors=True)
+        return len(old)
+
+
+def key_ref(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class KeyRing:
+    """Key id -> API key: env keys, then keys submitted in this process, then the opt-in key file (0600)"""
+
+    def __init__(self, path=None):
+        self.path = keys_file if path is None else path
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _env():
+        keys = [os.environ.get("OUROBOROS_API_KEY", "")] + os.environ.get("OUROBOROS_API_KEYS", "").split(",")
+        return {key_ref(k.strip()): k.strip() for k in keys if k.strip()}
+
+    def _load(self):
+        if not self.path: return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f: return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, keys):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f: json.dump(keys, f)
+        os.replace(tmp, self.path)
+
+    def put(self, key):
+        """-> key id; keys the environment already provides are not stored anywhere"""
+        ref = key_ref(key)
+        if ref in self._env(): return ref
+        with self._lock:
+            self._keys[ref] = key
+            if self.path:
+                keys = self._load()
+                if keys.get(ref) != key: self._save(dict(keys, **{ref: key}))
+        return ref
+
+    def get(self, ref):
+        return self._env().get(ref) or self._keys.get(ref) or self._load().get(ref)
+
+    def retain(self, live):
+        """Forget every stored key whose id is not in `live` (ids of queued or running jobs)"""
+        with self._lock:
+            for ref in set(self._keys) - live: del self._keys[ref]
+            if self.path:
+                keys = self._load()
+                if set(keys) - live: self._save({ref: k for ref, k in keys.items() if ref in live})
+
+
+class _LiveFeed:
+    """Stands in for the Streamlit placeholders: HUD, streaming code and terminal tail go to the store"""
+
+    def __init__(self, store, job_id, interval=0.2):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self._last = 0.0
+
+    # status_ph protocol used by the engine
+    def markdown(self, body, unsafe_allow_html=False):
+        self.store.set_live(self.job_id, "hud", body)
+
+    def empty(self):
+        pass
+
+    def _put(self, payload):
+        # Partials arrive per chunk; the reader only ever needs the latest one
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.store.set_live(self.job_id, "live", json.dumps(payload))
+
+    def code(self, model_name, text):
+        self._put({"kind": "code", "model": model_name, "text": text})
+
+    def output(self, stdout, stderr):
+        self._put({"kind": "output", "stdout": stdout, "stderr": stderr})
+
+    def clear(self):
+        self._last = 0.0
+        self.store.set_live(self.job_id, "live", None)
+
+
+class JobService:
+    """Worker pool over a JobStore. engine_factory(key) builds one InvictusEngine per worker thread and key."""
+
+    def __init__(self, store, engine_factory, workers=2, poll_interval=0.5, key=None, keys=None):
+        self.store = store
+        self.engine_factory = engine_factory
+        self.poll_interval = poll_interval
+        self.default_key = key or os.environ.get("OUROBOROS_API_KEY")
+        self.keys = keys or KeyRing()
+        self.stats = {"done": 0, "failed": 0, "cancelled": 0}
+        self._wake = threading.Condition()
+        self._lock = threading.Lock()
+        self.store.requeue_stale()
+        self.store.prune()
+        self._forget_keys()  # key file entries left over from jobs that finished elsewhere
+        self.workers = [threading.Thread(target=self._worker, args=(f"{os.getpid()}-{i}",), daemon=True) for i in range(workers)]
+        for t in self.workers:
+            t.start()
+
+    def submit(self, prompt, key=None, mode="architect", error_context=None, use_cache=True):
+        with self._lock:  # the key and its job appear together for _forget_keys
+            job_id = self.store.submit(prompt, mode=mode, error_context=error_context, use_cache=use_cache,
+                                       key_ref=self.keys.put(key) if key else None)
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def _worker(self, name):
+        engines = {}
+        while True:
+            try:
+                job = self.store.claim(name)
+            except sqlite3.OperationalError:
+                job = None # database busy: try again on the next tick
+            if job is None:
+                with self._wake:
+                    self._wake.wait(self.poll_interval)
+                continue
+            self._run(job, engines)
+
+    def _run(self, job, engines):
+        job_id = job["id"]
+        key = self.keys.get(job["key_ref"]) if job["key_ref"] else self.default_key
+        if not key:
+            return self._finish(job_id, "failed", error=f"API key {job['key_ref']} is not available to this worker (set OUROBOROS_API_KEYS)"
+                                if job["key_ref"] else "Authentication Missing")
+        # Events are sparse while a model call or the script runs; without the beat another process's
+        # requeue_stale() would take a long build for a dead one and run it a second time
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, stop), daemon=True).start()
+        try:
+            self._build(job, key, engines)
+        finally:
+            stop.set()
+            if job["key_ref"]: self._forget_keys()
+
+    def _forget_keys(self):
+        """Drop the keys no queued or running job needs any more (cancelled queued jobs included)"""
+        with self._lock:
+            try:
+                self.keys.retain(self.store.active_key_refs())
+            except sqlite3.OperationalError:
+                pass # busy: the next finished job tries again
+
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(HEARTBEAT):
+            try:
+                self.store.beat(job_id)
+            except sqlite3.OperationalError:
+                pass # busy: the next beat is well inside STALE_AFTER
+
+    def _build(self, job, key, engines):
+        job_id = job["id"]
+        feed = _LiveFeed(self.store, job_id)
+
+        def on_event(phase, payload):
+            feed.clear()
+            self.store.event(job_id, phase, payload)
+
+        try:
+            eng = engines.get(key)
+            if eng is None:
+                eng = engines[key] = self.engine_factory(key)
+            eng.client = job_id  # jobs sharing a key take turns at the rate limiter
+            res = eng.build(job["prompt"], mode=job["mode"], error_context=job["error_context"], status_ph=feed,
+                            use_cache=bool(job["use_cache"]), on_partial=feed.code, on_output=feed.output,
+                            on_event=on_event, cancelled=lambda: self.store.is_cancelled(job_id))
+        except Exception as e:
+            return self._finish(job_id, "failed", error=str(e))
+        if res is None or self.store.is_cancelled(job_id):
+            result = self._persist(job_id, job, res) if res else None
+            return self._finish(job_id, "cancelled", result)
+        self._finish(job_id, "done" if res['success'] else "failed", self._persist(job_id, job, res))
+
+    def _persist(self, job_id, job, res):
+        """Copy artifacts out of the sandbox workspace and drop it; the rest is plain JSON"""
+        manifest = copy_out(res['manifest'], os.path.join(jobs_dir, job_id))
+        res['workspace'].discard()
+        now = time.time()
+        return {"success": res['success'], "stdout": res['stdout'], "stderr": res['stderr'], "code": res['code'],
+                "artifacts": [m["path"] for m in manifest], "manifest": manifest, "metrics": res['metrics'], "preflight": res['preflight'],
+                "attempts": res.get('attempts', 1), "speculation": res.get('speculation'), "trace": res.get('trace'), "limit": res.get('limit'), "throttled": res.get('throttled'), "history": res.get('history'),
+                "timings": {"queued_s": round(job["started"] - job["created"], 3), "run_s": round(now - job["started"], 3)}}
+
+    def _finish(self, job_id, status, result=None, error=None):
+        self.store.finish(job_id, status, result, error)
+        with self._lock:
+            self.stats[status] += 1
+
+
+def default_engine_factory(**engine_kwargs):
+    """Shared resources for a standalone worker process (the dashboard passes its own cached ones)"""
+    from ouroboros_warm import WarmPool, exec_cap
+    cache = ResponseCache(os.path.join(cache_dir, "responses"))
+    health = ModelHealth(os.path.join(cache_dir, "model_health.json"))
+    exec_cache = ExecutionCache(os.path.join(cache_dir, "executions"))
+    memory = RepairMemory(os.path.join(cache_dir, "repair_memory.json"))
+    history = RunHistory(os.path.join(cache_dir, "history.sqlite3"))
+    data = DataRegistry(os.path.join(cache_dir, "data"), data_dir=current_dir)
+    pool = WarmPool(cwd=current_dir) if WarmPool.available() else None
+    slots = threading.BoundedSemaphore(exec_cap())
+    resolver = DependencyResolver()
+    engine_kwargs.setdefault("limiter", RateLimiter.from_env())
+    threading.Thread(target=sweep_workspaces, daemon=True).start()
+    threading.Thread(target=data.refresh, daemon=True).start()
+    return lambda key: InvictusEngine(key, cache=cache, health=health, pool=pool, slots=slots,
+                                      resolver=resolver, exec_cache=exec_cache, memory=memory, history=history, data=data, **engine_kwargs)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    store = JobStore()
+    if args[:1] == ["worker"]:
+        n = int(args[args.index("--workers") + 1]) if "--workers" in args else int(os.environ.get("OUROBOROS_JOB_WORKERS", "2"))
+        service = JobService(store, default_engine_factory(), workers=n)
+        if os.environ.get("OUROBOROS_METRICS_PORT"):
+            from ouroboros_trace import serve_metrics
+            serve_metrics(os.environ["OUROBOROS_METRICS_PORT"])
+        print(f"{n} workers on {store.path} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            sys.exit(0)
+    elif args[:1] == ["submit"] and len(args) > 1:
+        print(store.submit(" ".join(args[1:])))
+    elif args[:1] == ["status"] and len(args) > 1:
+        print(json.dumps(store.get(args[1]), indent=1))
+    elif args[:1] == ["cancel"] and len(args) > 1:
+        store.cancel(args[1])
+    else:
+        print(__doc__)
+        sys.exit(1)
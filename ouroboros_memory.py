@@ -0,0 +1,256 @@
+"""REPAIR MEMORY: learned error-signature -> fix store, applied without calling the model.
+
+A failure is normalised into a signature made of three parts: the exception
+type, the message with numbers, addresses and paths blanked out, and the call
+on the script line that raised. When a later attempt passes, the edit that got
+it there is reduced to something reusable: added imports and/or one in-line
+fragment rewrite on the offending line. That edit is stored under the
+signature. The next time the same signature shows up, the healing loop applies
+the stored edit locally and re-runs the script, skipping a full model round
+trip. Fixes that stop working are retired.
+
+    python ouroboros_memory.py            # list learned fixes with hit counts
+"""
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+SCRIPT_FRAME = re.compile(r'^  File "[^"]*ouroboros_exe_v21\.py", line (\d+)')
+EXC_LINE = re.compile(r"^([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning))(?:: (.*))?$")
+IMPORT_LINE = re.compile(r"^\s*(import\s+[\w.]+(\s+as\s+\w+)?(\s*,\s*[\w.]+(\s+as\s+\w+)?)*|from\s+[\w.]+\s+import\s+.+)\s*$")
+
+# The old per-line sanitizer rules, now ordinary entries of the store
+SEED = [{"type": "ValueError", "call": "scatter",
+         "template": f"'c' argument must be a color, a sequence of colors, or a sequence of numbers, not '{cmap}'",
+         "fix": {"imports": [], "old": f"c='{cmap}'", "new": f"cmap='{cmap}'"}}
+        for cmap in ("viridis", "plasma", "inferno", "magma", "cividis")]
+
+
+def _template(message):
+    """Blank out the parts of a message that vary between otherwise identical failures"""
+    msg = re.sub(r"0x[0-9a-fA-F]+", "<addr>", message)
+    msg = re.sub(r"(?<![\w'])(/[^\s'\"]+)+", "<path>", msg)
+    msg = re.sub(r"(?<!\w)'[^']{40,}'(?!\w)", "'<str>'", msg)
+    return re.sub(r"(?<![\w'])-?\d+(\.\d+)?(?![\w'])", "<n>", msg).strip()
+
+
+def failure_signature(stderr, code):
+    """-> (key, {"type", "template", "call", "line", "message"}) or None when stderr holds no exception"""
+    lines = (stderr or "").splitlines()
+    exc = None
+    for line in reversed(lines):
+        m = EXC_LINE.match(line.strip())
+        if m and not line.startswith(" "):
+            exc = m
+            break
+    if exc is None: return None
+    line_no = None
+    for line in lines:
+        m = SCRIPT_FRAME.match(line)
+        if m: line_no = int(m.group(1))
+    call = ""
+    src = code.splitlines()
+    if line_no and 0 < line_no <= len(src):
+        calls = re.findall(r"([A-Za-z_]\w*)\s*\(", src[line_no - 1])
+        call = calls[0] if calls else ""
+    info = {"type": exc.group(1).split(".")[-1], "template": _template(exc.group(2) or ""), "call": call, "line": line_no,
+            "message": exc.group(2) or ""}
+    key = hashlib.sha1(f"{info['type']}|{info['template']}|{info['call']}".encode("utf-8")).hexdigest()[:16]
+    return key, info
+
+
+def _arg_bounds(line, start, end):
+    """Widen [start, end) to whole call arguments: back to the previous '(' / ',' and on to the next ',' / ')'"""
+    while start > 0 and line[start - 1] not in "(,":
+        start -= 1
+    while start < end and line[start] == " ":
+        start += 1
+    quote = None
+    i = start
+    while i < len(line):
+        ch = line[i]
+        if quote:
+            if ch == quote: quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch in ",)" and i >= end:
+            break
+        i += 1
+    return start, i
+
+
+def extract_fix(failed, passed, line_no):
+    """Reusable part of the edit failed -> passed, or None when it was a rewrite rather than a fix"""
+    a, b = failed.splitlines(), passed.splitlines()
+    imports, replaced = [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal": continue
+        if tag == "insert" and all(IMPORT_LINE.match(l) or not l.strip() for l in b[j1:j2]):
+            imports += [l.strip() for l in b[j1:j2] if l.strip()]
+        elif tag == "replace" and i2 - i1 == 1 and j2 - j1 == 1:
+            replaced.append((i1 + 1, a[i1], b[j1]))
+        else:
+            return None
+    if len(replaced) > 1 or (replaced and line_no and replaced[0][0] != line_no): return None
+    fix = {"imports": imports, "old": "", "new": ""}
+    if replaced:
+        _, old, new = replaced[0]
+        p = len(os.path.commonprefix([old, new]))
+        s = len(os.path.commonprefix([old[p:][::-1], new[p:][::-1]]))
+        start, end = _arg_bounds(old, p, len(old) - s)
+        s = len(old) - end  # the widened suffix is common to both lines
+        fix["old"], fix["new"] = old[start:end], new[start:len(new) - s]
+        if not fix["old"].strip(): return None
+    return fix if fix["imports"] or fix["old"] else None
+
+
+def _compiles(code):
+    try:
+        compile(code, "<memory>", "exec")
+        return True
+    except SyntaxError:
+        return False
+
+
+def apply_fix(code, fix, line_no):
+    """-> fixed code or None when the fix does not fit this script"""
+    lines = code.splitlines()
+    if fix["old"]:
+        # The offending line first, then any other line with the same fragment
+        order = ([line_no - 1] if line_no and 0 < line_no <= len(lines) else []) + list(range(len(lines)))
+        at = next((i for i in order if fix["old"] in lines[i]), None)
+        if at is None: return None
+        line = lines[at]
+        candidates = [line.replace(fix["old"], fix["new"], 1)]
+        # "keyword argument repeated" (cmap already given): drop the bad argument instead
+        candidates += [line.replace(", " + fix["old"], "", 1), line.replace(fix["old"] + ", ", "", 1)]
+        for cand in candidates:
+            if cand != line and _compiles("\n".join(lines[:at] + [cand] + lines[at + 1:])):
+                lines[at] = cand
+                break
+        else:
+            return None
+    missing = [imp for imp in fix["imports"] if imp not in (l.strip() for l in lines)]
+    if missing:
+        head = 1 if lines and lines[0].startswith("from __future__") else 0
+        lines[head:head] = missing
+    fixed = "\n".join(lines) + ("\n" if code.endswith("\n") else "")
+    return fixed if fixed != code and _compiles(fixed) else None
+
+
+class RepairMemory:
+    """Persistent signature -> fix index with hit-rate stats (shared by every engine of a process)"""
+
+    def __init__(self, path, max_entries=500):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = {"lookups": 0, "hits": 0, "confirmed": 0, "failed": 0, "learned": 0}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        try:
+            with open(path, "r", encoding="utf-8") as f: self._entries = json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            pass
+        for seed in SEED:
+            key = hashlib.sha1(f"{seed['type']}|{_template(seed['template'])}|{seed['call']}".encode("utf-8")).hexdigest()[:16]
+            self._entries.setdefault(key, self._new(seed["type"], _template(seed["template"]), seed["call"], seed["fix"], "seed"))
+
+    @staticmethod
+    def _new(exc_type, template, call, fix, source):
+        return {"type": exc_type, "template": template, "call": call, "fix": fix, "source": source,
+                "hits": 0, "confirmed": 0, "failed": 0, "created": time.time(), "used": 0.0}
+
+    def recall(self, code, stderr):
+        """-> (key, fixed code) when a stored fix matches this failure and fits the script, else None"""
+        sig = failure_signature(stderr, code)
+        with self._lock:
+            self.stats["lookups"] += 1
+            entry = self._entries.get(sig[0]) if sig else None
+            # Retired: a fix that keeps failing is worse than asking the model
+            if entry is None or entry["failed"] > entry["confirmed"] + 1: return None
+            if entry.get("exact") and entry["exact"] != sig[1]["message"]: return None
+            fix = dict(entry["fix"])
+        fixed = apply_fix(code, fix, sig[1]["line"])
+        if fixed is None: return None
+        with self._lock:
+            self.stats["hits"] += 1
+            entry["hits"] += 1
+            entry["used"] = time.time()
+            self._dirty = True
+        return sig[0], fixed
+
+    def confirm(self, key, ok):
+        """Outcome of a recalled fix: the same failure did (not) come back"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: return
+            entry["confirmed" if ok else "failed"] += 1
+            self.stats["confirmed" if ok else "failed"] += 1
+            self._dirty = True
+        self.flush(force=False)
+
+    def learn(self, failed_code, stderr, passed_code):
+        """A later attempt passed: remember the edit if it is small enough to reuse"""
+        sig = failure_signature(stderr, failed_code)
+        if sig is None: return False
+        key, info = sig
+        fix = extract_fix(failed_code, passed_code, info["line"])
+        if fix is None: return False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["fix"] == fix:
+                entry["confirmed"] += 1
+            elif entry is None or entry["failed"] >= entry["confirmed"]:
+                entry = self._entries[key] = self._new(info["type"], info["template"], info["call"], fix, "learned")
+                # reshape(10, 10) fixes "(100,)" only: numbers the fix introduces pin it to the exact message
+                if set(re.findall(r"\d+", fix["new"])) - set(re.findall(r"\d+", fix["old"])):
+                    entry["exact"] = info["message"]
+                self.stats["learned"] += 1
+            else:
+                return False
+            if len(self._entries) > self.max_entries:
+                stale = sorted(self._entries, key=lambda k: (self._entries[k]["used"] or self._entries[k]["created"]))
+                for k in stale[:len(self._entries) - self.max_entries]: del self._entries[k]
+            self._dirty = True
+        self.flush(force=False)
+        return True
+
+    def flush(self, force=True):
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._last_save < 5): return
+            data = json.dumps({"entries": self._entries})
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: f.write(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def summary(self):
+        s = self.stats
+        rate = f" ({100.0 * s['hits'] / s['lookups']:.0f}%)" if s["lookups"] else ""
+        return f"{len(self._entries)} fixes · {s['hits']}/{s['lookups']} recalled{rate} · {s['learned']} learned"
+
+    def snapshot(self):
+        with self._lock:
+            return [{"error": f"{e['type']}: {e['template']}"[:80], "call": e["call"], "fix": e["fix"]["new"] or "+imports",
+                     "source": e["source"], "hits": e["hits"], "ok": e["confirmed"], "failed": e["failed"]}
+                    for e in sorted(self._entries.values(), key=lambda e: -e["hits"])]
+
+
+if __name__ == "__main__":
+    cache = os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache"))
+    memory = RepairMemory(os.path.join(cache, "repair_memory.json"))
+    for row in memory.snapshot():
+        print(f"{row['hits']:>5} hits {row['ok']:>4} ok {row['failed']:>4} failed  [{row['source']}] {row['call'] or '-'}: {row['error']}")
+    sys.exit(0)
@@ -0,0 +1,154 @@
+"""PATCH REPAIR: incremental fixes for the reflexion loop.
+
+Instead of resending the whole script and asking for the whole file back, a
+repair round sends the numbered script plus a compacted traceback and asks for
+a unified diff. The diff is applied here, tolerating wrong hunk counts,
+drifted line numbers and trailing-whitespace noise. The result must compile
+before it is accepted. A reply that is plain code instead of a diff is taken
+as is if it compiles. Anything else raises PatchError, and the caller falls
+back to full regeneration.
+
+    python ouroboros_patch.py script.py fix.diff      # apply a diff, print the result
+    python ouroboros_patch.py --compact stderr.log    # show what a repair prompt would send
+"""
+import os
+import re
+import sys
+import sysconfig
+
+HUNK = re.compile(r"^@@(?: -(\d+)(?:,\d+)? \+\d+(?:,\d+)?)? @@")
+NUMBERED = re.compile(r"^\s*\d+\| ?")
+FRAME = re.compile(r'^  File "([^"]+)", line \d+')
+_lib_dirs = tuple(p for p in {sysconfig.get_path("stdlib"), sysconfig.get_path("purelib"), sysconfig.get_path("platlib"),
+                              sys.prefix, sys.base_prefix} if p)
+
+
+class PatchError(Exception):
+    """The reply cannot be turned into a compiling script: regenerate instead"""
+
+
+# --- A. TRACEBACK COMPACTION ---
+
+def _is_library(path):
+    return path.startswith("<") or "site-packages" in path or "dist-packages" in path or path.startswith(_lib_dirs)
+
+
+def compact_traceback(stderr, max_lines=40):
+    """Keep the script's own frames and the final exception; library frames collapse into one marker line.
+    Text outside tracebacks (warnings, limit notices) keeps only its last lines."""
+    out, dropped, in_frame, keep_frame = [], 0, False, False
+    for line in (stderr or "").splitlines():
+        m = FRAME.match(line)
+        if m:
+            path = m.group(1)
+            keep_frame = not _is_library(path)
+            in_frame = True
+            if keep_frame:
+                if dropped:
+                    out.append(f"  [... {dropped} library frame(s) omitted ...]")
+                    dropped = 0
+                out.append(line.replace(path, os.path.basename(path)))
+            else:
+                dropped += 1
+            continue
+        if in_frame and line.startswith("    "):
+            if keep_frame: out.append(line)  # source line / caret markers of that frame
+            continue
+        if dropped:
+            out.append(f"  [... {dropped} library frame(s) omitted ...]")
+            dropped = 0
+        in_frame = False
+        out.append(line)
+    if len(out) > max_lines:
+        out = [f"[... {len(out) - max_lines} earlier line(s) omitted ...]"] + out[-max_lines:]
+    return "\n".join(out)
+
+
+def number_lines(code):
+    width = len(str(code.count("\n") + 1))
+    return "\n".join(f"{i:>{width}}| {line}" for i, line in enumerate(code.splitlines(), 1))
+
+
+# --- B. DIFF APPLICATION ---
+
+def _hunks(diff):
+    """-> [(old_start, [(tag, text)])]; file headers and prose around the diff are skipped"""
+    hunks, current = [], None
+    lines = diff.splitlines()
+    for i, line in enumerate(lines):
+        m = HUNK.match(line)
+        if m:
+            current = (int(m.group(1)) if m.group(1) else None, [])  # bare "@@ @@": locate by context only
+            hunks.append(current)
+            continue
+        if current is None: continue
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = None  # next file header
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif line[:1] in (" ", "-", "+"):
+            current[1].append((line[0], line[1:]))
+        elif not line:
+            current[1].append((" ", ""))  # context blank line whose leading space got lost
+        else:
+            current = None  # prose after the diff
+    for _, body in hunks:
+        # Models sometimes echo the reference numbering ("  12| x = 1") inside the hunk
+        if body and all(NUMBERED.match(text) for tag, text in body if tag != "+" and text):
+            body[:] = [(tag, NUMBERED.sub("", text, count=1)) for tag, text in body]
+        while body and body[-1] == (" ", ""): body.pop()
+    return [h for h in hunks if h[1]]
+
+
+def _find(lines, block, expected, start):
+    """Index of `block` in lines[start:] closest to `expected` (exact first, then ignoring trailing whitespace)"""
+    if not block: return min(max(expected, start), len(lines))
+    for norm in (lambda s: s, lambda s: s.rstrip()):
+        want = [norm(b) for b in block]
+        hits = [i for i in range(start, len(lines) - len(block) + 1)
+                if norm(lines[i]) == want[0] and [norm(x) for x in lines[i:i + len(block)]] == want]
+        if hits: return min(hits, key=lambda i: abs(i - expected))
+    return None
+
+
+def apply_patch(original, diff):
+    """Unified diff -> patched source (raises PatchError)"""
+    hunks = _hunks(diff)
+    if not hunks: raise PatchError("no hunks in the reply")
+    lines = original.splitlines()
+    cursor, delta = 0, 0
+    for n, (old_start, body) in enumerate(hunks, 1):
+        old = [text for tag, text in body if tag != "+"]
+        new = [text for tag, text in body if tag != "-"]
+        # "@@ -5,0 +6,2 @@" inserts after line 5; otherwise the hunk starts at line old_start
+        expected = cursor if old_start is None else max(old_start - (1 if old else 0) + delta, 0)
+        at = _find(lines, old, expected, cursor)
+        if at is None: raise PatchError(f"hunk {n} does not match the script (near line {old_start or cursor + 1})")
+        lines[at:at + len(old)] = new
+        cursor = at + len(new)
+        delta += len(new) - len(old)
+    patched = "\n".join(lines) + ("\n" if original.endswith("\n") else "")
+    if patched == original: raise PatchError("the diff changes nothing")
+    return patched
+
+
+def resolve_reply(original, reply):
+    """Model reply to a patch request -> fixed script (diff applied, or a compiling full rewrite)"""
+    code = apply_patch(original, reply) if re.search(r"^@@ ", reply, re.M) else reply
+    try:
+        compile(code, "<repair>", "exec")
+    except SyntaxError as e:
+        raise PatchError(f"patched script does not compile: {e.msg} (line {e.lineno})")
+    return code
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--compact"] and len(args) == 2:
+        with open(args[1], "r", encoding="utf-8") as f: print(compact_traceback(f.read()))
+    elif len(args) == 2:
+        with open(args[0], "r", encoding="utf-8") as f: source = f.read()
+        with open(args[1], "r", encoding="utf-8") as f: print(resolve_reply(source, f.read()), end="")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,118 @@
+"""STARTUP PROFILE: import-time and rerun-time report for the Streamlit entry point.
+
+In the app, `RerunProfile` keeps the last reruns of this process and shows
+p50/p95 in the sidebar. From the shell, the same numbers are produced
+headlessly and compared with the last saved baseline:
+
+    python ouroboros_profile.py                 # report + compare with baseline
+    python ouroboros_profile.py --save          # ... and store it as the new baseline
+    python ouroboros_profile.py --top 25 --reruns 20
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache")), "profile_baseline.json")
+ENTRY_IMPORTS = ["streamlit", "streamlit_antd_components", "ouroboros_core", "ouroboros_warm"]
+
+
+def _pct(values, q):
+    if not values: return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class RerunProfile:
+    """Rolling per-process record of how long each script run took"""
+
+    def __init__(self, size=200):
+        self.cold_imports_s = None
+        self._runs = {"rerun": deque(maxlen=size), "build": deque(maxlen=size)}
+        self._lock = threading.Lock()
+
+    def record_imports(self, seconds):
+        # Only the first run of a process pays for the imports; later reruns hit sys.modules
+        if self.cold_imports_s is None: self.cold_imports_s = seconds
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._runs[kind].append(seconds)
+
+    def summary(self, kind="rerun"):
+        with self._lock:
+            runs = list(self._runs[kind])
+        return {"n": len(runs), "p50_ms": _ms(_pct(runs, 0.5)), "p95_ms": _ms(_pct(runs, 0.95)),
+                "cold_imports_ms": _ms(self.cold_imports_s)}
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+# --- HEADLESS REPORT ---
+
+def import_times(modules=ENTRY_IMPORTS, top=15):
+    """-> (total_ms, [(cumulative_ms, module)]) from a fresh `python -X importtime` interpreter"""
+    code = "; ".join(f"import {m}" for m in modules)
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=HERE)
+    rows = []
+    for line in res.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        if m: rows.append((int(m.group(1)) / 1000.0, len(m.group(2)), m.group(3)))
+    total = sum(ms for ms, depth, _ in rows if depth == 1)
+    heaviest = sorted(((ms, name) for ms, _, name in rows), reverse=True)[:top]
+    return round(total, 1), [(round(ms, 1), name) for ms, name in heaviest]
+
+
+def rerun_times(reruns=10):
+    """Cold first run and warm rerun latency of ouroboros.py via Streamlit's AppTest (no browser)"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(HERE, "ouroboros.py"), default_timeout=120)
+    t = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t
+    samples = []
+    for _ in range(reruns):
+        t = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - t)
+    return {"first_run_ms": _ms(first), "rerun_p50_ms": _ms(_pct(samples, 0.5)),
+            "rerun_p95_ms": _ms(_pct(samples, 0.95)), "reruns": reruns}
+
+
+def _delta(now, before):
+    if before in (None, 0) or now is None: return ""
+    return f"  ({(now - before) / before * 100:+.0f}% vs baseline)"
+
+
+def main(argv):
+    top = int(argv[argv.index("--top") + 1]) if "--top" in argv else 15
+    reruns = int(argv[argv.index("--reruns") + 1]) if "--reruns" in argv else 10
+    try:
+        with open(BASELINE, "r", encoding="utf-8") as f: base = json.load(f)
+    except (OSError, ValueError):
+        base = {}
+
+    total, heaviest = import_times(top=top)
+    print(f"entry imports     : {total:8.1f} ms{_delta(total, base.get('imports_ms'))}")
+    for ms, name in heaviest:
+        print(f"  {ms:8.1f} ms  {name}")
+    runs = rerun_times(reruns)
+    for key in ("first_run_ms", "rerun_p50_ms", "rerun_p95_ms"):
+        print(f"{key:<18}: {runs[key]:8.1f} ms{_delta(runs[key], base.get(key))}")
+
+    if "--save" in argv:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump({"at": time.time(), "imports_ms": total, **runs}, f, indent=1)
+        print(f"baseline saved -> {BASELINE}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,309 @@
+"""RATE LIMITER: shared client-side budget per API key and per model.
+
+Every model call asks the limiter for a slot before it goes out. It is granted
+when all of these hold:
+
+  * the key's requests-per-minute bucket has a token (`rpm`, shared by all models)
+  * the model's requests-per-minute bucket has a token (`model_rpm`)
+  * the model's tokens-per-minute bucket covers the estimated prompt (`tpm`)
+  * the model is not in a server-imposed back-off
+
+Budgets that are not configured start unlimited. A 429 halves the model's
+request rate, measured from what was actually granted in the last minute, and
+blocks the model for the server's retry hint (Retry-After / RetryInfo
+`retry_delay` or `retryDelay` / "retry in 27s"). Without a hint, the block is
+an exponential back-off with jitter. Every success adds one request per minute
+back, up to the configured ceiling (AIMD). Callers that share a key wait in one queue that is
+served round-robin per client (job, batch task), so one busy batch cannot
+starve a dashboard session. A request that cannot be granted before its
+deadline raises RateLimitTimeout instead of sleeping past it.
+
+    OUROBOROS_RPM=60 OUROBOROS_MODEL_RPM=15 OUROBOROS_TPM=1000000 streamlit run ouroboros.py
+    python ouroboros_ratelimit.py --rpm 30 --clients 3 --requests 4   # watch the fair queue
+    python ouroboros_ratelimit.py --check                             # fairness / hedging scenarios
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+RETRY_HINTS = (re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)"),
+               re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s"),
+               re.compile(r"[Rr]etry-After:?\s*(\d+(?:\.\d+)?)"),
+               re.compile(r"[Rr]etry (?:in|after) (\d+(?:\.\d+)?)\s*s"))
+
+
+class RateLimitTimeout(Exception):
+    """No slot before the caller's deadline: the cascade treats it like a local 429"""
+
+
+def retry_after_hint(error):
+    """Seconds the server asked us to wait, or None"""
+    hint = getattr(error, "retry_after", None)
+    if isinstance(hint, (int, float)) and hint >= 0: return float(hint)
+    msg = str(error)
+    for pattern in RETRY_HINTS:
+        m = pattern.search(msg)
+        if m: return float(m.group(1))
+    return None
+
+
+def is_throttle(error):
+    msg = str(error)
+    return "429" in msg or "quota" in msg.lower() or "exhausted" in msg.lower()
+
+
+def _env_float(name):
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+class _Bucket:
+    """Token bucket refilled at `rate` per second up to `capacity`; may go negative when charged after the fact"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost, now):
+        self._refill(now)
+        need = min(cost, self.capacity) - self.level
+        return need / self.rate if need > 0 else 0.0
+
+    def take(self, cost, now):
+        self._refill(now)
+        self.level -= cost
+
+
+class _ModelBudget:
+    def __init__(self, rpm, tpm):
+        self.ceiling = rpm / 60.0 if rpm else None  # requests per second; None = unlimited until a 429
+        self.requests = _Bucket(self.ceiling, float(max(1, min(rpm, 10)))) if rpm else None
+        self.tokens = _Bucket(tpm / 60.0, float(tpm)) if tpm else None
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.granted = deque()  # grant times of the last minute
+        self.stats = {"granted": 0, "throttled": 0}
+
+    def delay(self, cost, now):
+        d = self.blocked_until - now
+        if self.requests: d = max(d, self.requests.delay(1, now))
+        if self.tokens: d = max(d, self.tokens.delay(cost, now))
+        return max(d, 0.0)
+
+    def grant(self, cost, now):
+        if self.requests: self.requests.take(1, now)
+        if self.tokens: self.tokens.take(cost, now)
+        self.granted.append(now)
+        while self.granted and self.granted[0] < now - 60: self.granted.popleft()
+        self.stats["granted"] += 1
+
+    def throttled(self, retry_after, now):
+        """Multiplicative decrease, then sit out the hint (or an exponential back-off)"""
+        while self.granted and self.granted[0] < now - 60: self.granted.popleft()
+        observed = len(self.granted) / 60.0
+        current = self.requests.rate if self.requests else observed
+        rate = max(min(current, observed or current) / 2, 1 / 60.0)
+        if self.requests is None:
+            self.requests = _Bucket(rate, 1.0)
+        else:
+            self.requests.rate = rate
+            self.requests.level = min(self.requests.level, 1.0)  # one probe once the block ends, then the new pace
+        backoff = retry_after if retry_after is not None else min(2 ** self.strikes, 60) * (1 + random.random() * 0.25)
+        self.blocked_until = max(self.blocked_until, now + backoff)
+        self.strikes += 1
+        self.stats["throttled"] += 1
+
+    def succeeded(self):
+        """Additive increase: one request per minute back per success, up to the configured ceiling"""
+        self.strikes = 0
+        if self.requests and self.requests.rate != self.ceiling:
+            rate = self.requests.rate + 1 / 60.0
+            self.requests.rate = min(rate, self.ceiling) if self.ceiling else rate
+
+
+class _KeyState:
+    def __init__(self, rpm, burst=None):
+        self.requests = _Bucket(rpm / 60.0, float(burst or max(1, min(rpm, 10)))) if rpm else None
+        self.models = {}
+        self.waiting = []  # tickets [client, model, cost] in arrival order
+        self.last_client = None
+
+
+class RateLimiter:
+    """Shared by every engine of a process: per-key rpm, per-model rpm/tpm, 429 back-off, fair queue"""
+
+    def __init__(self, rpm=None, burst=None, model_rpm=None, tpm=None):
+        self.rpm = rpm
+        self.burst = burst
+        self.model_rpm = model_rpm
+        self.tpm = tpm
+        self.waited_s = 0.0
+        self.stats = {"granted": 0, "throttled": 0, "timeouts": 0}
+        self._keys = {}
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls, **overrides):
+        config = dict(rpm=_env_float("OUROBOROS_RPM"), model_rpm=_env_float("OUROBOROS_MODEL_RPM"), tpm=_env_float("OUROBOROS_TPM"))
+        return cls(**dict(config, **overrides))
+
+    def _key(self, key_id):
+        ks = self._keys.get(key_id)
+        if ks is None: ks = self._keys[key_id] = _KeyState(self.rpm, self.burst)
+        return ks
+
+    def _model(self, ks, model):
+        mb = ks.models.get(model)
+        if mb is None: mb = ks.models[model] = _ModelBudget(self.model_rpm, self.tpm)
+        return mb
+
+    def _delay(self, ks, ticket, now):
+        d = self._model(ks, ticket[1]).delay(ticket[2], now)
+        if ks.requests: d = max(d, ks.requests.delay(1, now))
+        return d
+
+    def _next_ready(self, ks, now):
+        """Round-robin over clients after the last one served -> that client's oldest ticket that can go now.
+        Tickets of one client wait per model: a hedge to a free model never queues behind a sibling on a blocked one."""
+        tickets, clients = {}, []
+        for t in ks.waiting:
+            if t[0] not in tickets:
+                tickets[t[0]] = []
+                clients.append(t[0])
+            tickets[t[0]].append(t)
+        if ks.last_client in tickets:
+            i = clients.index(ks.last_client) + 1
+            clients = clients[i:] + clients[:i]
+        return next((t for c in clients for t in tickets[c] if self._delay(ks, t, now) <= 0), None)
+
+    def acquire(self, key_id="default", model="*", cost=0, client=None, timeout=None):
+        """Block until a slot is granted -> seconds waited (raises RateLimitTimeout after `timeout`)"""
+        started = time.monotonic()
+        ticket = [client if client is not None else threading.get_ident(), model, cost]
+        with self._cond:
+            ks = self._key(key_id)
+            ks.waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    ready = self._next_ready(ks, now)
+                    if ready is ticket: break
+                    own = self._delay(ks, ticket, now)
+                    # Blocked past the deadline (e.g. a long retry hint): fail now so the cascade moves on
+                    if timeout is not None and (now - started >= timeout or now + own > started + timeout):
+                        self.stats["timeouts"] += 1
+                        raise RateLimitTimeout(f"local rate limit: no slot for {model} within {timeout:.0f}s")
+                    if ready is not None:
+                        self._cond.notify_all()  # a fairer waiter can go first
+                        delay = 0.05
+                    else:
+                        delay = max(own, 0.01)
+                    if timeout is not None: delay = min(delay, started + timeout - now)
+                    self._cond.wait(max(delay, 0.001))
+                self._model(ks, model).grant(cost, now)
+                if ks.requests: ks.requests.take(1, now)
+                ks.last_client = ticket[0]
+                self.stats["granted"] += 1
+            finally:
+                ks.waiting.remove(ticket)
+                self._cond.notify_all()
+            waited = time.monotonic() - started
+            self.waited_s += waited
+        return waited
+
+    def report(self, key_id="default", model="*", error=None, tokens=0):
+        """Outcome of a granted call: output tokens are charged, a 429 tightens the model's budget"""
+        with self._cond:
+            mb = self._model(self._key(key_id), model)
+            now = time.monotonic()
+            if tokens and mb.tokens: mb.tokens.take(tokens, now)
+            if error is not None and is_throttle(error):
+                mb.throttled(retry_after_hint(error), now)
+                self.stats["throttled"] += 1
+            elif error is None:
+                mb.succeeded()
+            self._cond.notify_all()
+
+    def summary(self):
+        s = self.stats
+        return f"{s['granted']} granted · {s['throttled']} throttled · waited {self.waited_s:.1f}s"
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._cond:
+            rows = []
+            for key_id, ks in self._keys.items():
+                for model, mb in ks.models.items():
+                    rows.append({"key": key_id[:8], "model": model,
+                                 "rpm": round(mb.requests.rate * 60, 1) if mb.requests else None,
+                                 "blocked_s": round(max(mb.blocked_until - now, 0.0), 1), "waiting": sum(t[1] == model for t in ks.waiting),
+                                 "granted": mb.stats["granted"], "throttled": mb.stats["throttled"]})
+            return rows
+
+
+def _check():
+    """Scenarios that must hold -> exit code (python ouroboros_ratelimit.py --check)"""
+    failures = []
+
+    def waits_behind(limiter, blocked_model):
+        """One client: a ticket for the blocked model is waiting, a hedge to a free model must still go at once"""
+        waiter = threading.Thread(target=lambda: limiter.acquire("k", blocked_model, client="job", timeout=30), daemon=True)
+        waiter.start()
+        time.sleep(0.1)
+        return limiter.acquire("k", "free-model", client="job", timeout=30)
+
+    limiter = RateLimiter()
+    limiter.acquire("k", "blocked-model", client="job")
+    limiter.report("k", "blocked-model", error=Exception("429 quota retry_delay { seconds: 20 }"))
+    waited = waits_behind(limiter, "blocked-model")
+    if waited > 0.5: failures.append(f"hedge waited {waited:.2f}s behind a 20s retry hint")
+
+    limiter = RateLimiter(model_rpm=6)
+    for _ in range(6): limiter.acquire("k", "busy-model", client="job")
+    waited = waits_behind(limiter, "busy-model")
+    if waited > 0.5: failures.append(f"hedge waited {waited:.2f}s behind an exhausted model_rpm")
+
+    limiter = RateLimiter(rpm=600, burst=1)
+    order = []
+    threads = [threading.Thread(target=lambda c=c: [order.append(c) for _ in range(3) if limiter.acquire(client=c) >= 0])
+               for c in ("a", "b")]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    if order[1:5] not in (["a", "b", "a", "b"], ["b", "a", "b", "a"]): failures.append(f"clients not served round-robin: {order}")
+
+    for f in failures: print("FAIL", f)
+    print("ok" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Simulate clients sharing one key behind the limiter.")
+    p.add_argument("--rpm", type=float, default=30)
+    p.add_argument("--clients", type=int, default=3)
+    p.add_argument("--requests", type=int, default=4, help="requests per client")
+    p.add_argument("--check", action="store_true", help="run the fairness/hedging scenarios instead")
+    args = p.parse_args()
+    if args.check: sys.exit(_check())
+    limiter = RateLimiter(rpm=args.rpm, burst=1)
+    t0 = time.monotonic()
+
+    def client(name):
+        for i in range(args.requests):
+            limiter.acquire(client=name, model="gemini-1.5-flash")
+            print(f"{time.monotonic() - t0:6.2f}s  {name} #{i + 1}", flush=True)
+
+    threads = [threading.Thread(target=client, args=(f"client-{c}",)) for c in range(args.clients)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    print(limiter.summary())
+    sys.exit(0)
@@ -0,0 +1,205 @@
+"""BUILD TRACING: per-phase spans for every build, exported as JSON lines and Prometheus text.
+
+The engine opens a span around each model attempt, rate-limit wait, discovery
+scan, pre-flight pass, pip install, sandbox run, heal action and
+reflexion round. A finished build appends one JSON line to traces.jsonl and
+folds its spans into the process-wide `METRICS` registry, which is written
+to metrics.prom (node-exporter textfile format) and optionally served over HTTP:
+
+    OUROBOROS_METRICS_PORT=9464 streamlit run ouroboros.py   # GET :9464/metrics
+    python ouroboros_trace.py tail 5                          # last 5 traces as waterfalls
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+cache_dir = os.environ.get("OUROBOROS_CACHE_DIR", os.path.join(os.getcwd(), ".ouroboros_cache"))
+trace_path = os.environ.get("OUROBOROS_TRACE_FILE", os.path.join(cache_dir, "traces.jsonl"))
+metrics_path = os.environ.get("OUROBOROS_METRICS_FILE", os.path.join(cache_dir, "metrics.prom"))
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Tracer:
+    """Spans of one build. Thread-safe: hedged model calls record from their own threads."""
+
+    def __init__(self, name="build"):
+        self.name = name
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self._ids = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """Id of the innermost open span on this thread (hand it to work started on another thread)"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, parent=None, **attrs):
+        """Yields the attrs dict: set attrs["outcome"] or size fields before the block ends"""
+        stack = self._stack()
+        with self._lock:
+            self._ids += 1
+            span_id = self._ids
+        parent = parent or (stack[-1] if stack else None)
+        stack.append(span_id)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault("outcome", "error")
+            attrs.setdefault("error", str(e)[:200])
+            raise
+        finally:
+            stack.pop()
+            attrs.setdefault("outcome", "ok")
+            record = {"id": span_id, "parent": parent, "name": name, "start": round(start - self._t0, 4),
+                      "duration": round(time.perf_counter() - start, 4), **attrs}
+            with self._lock:
+                self.spans.append(record)
+
+    def summary(self):
+        """-> {span name: total seconds}"""
+        totals = {}
+        for s in self.spans:
+            totals[s["name"]] = round(totals.get(s["name"], 0.0) + s["duration"], 4)
+        return totals
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s["start"], s["id"]))
+        return {"name": self.name, "started_at": self.started_at, "duration": round(time.perf_counter() - self._t0, 4),
+                "spans": spans}
+
+    def export(self, outcome):
+        """Append this trace to traces.jsonl and fold it into METRICS"""
+        data = self.to_dict()
+        data["outcome"] = outcome
+        METRICS.observe_build(data)
+        if trace_path:
+            try:
+                os.makedirs(os.path.dirname(trace_path), exist_ok=True)
+                with open(trace_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data) + "\n")
+            except OSError:
+                pass
+        METRICS.write_textfile()
+        return data
+
+
+class Metrics:
+    """Process-wide histograms/counters keyed by span name and outcome, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._hist = {}   # (span, outcome) -> [bucket counts..., sum, count]
+        self._bytes = {}  # (span, direction) -> total
+        self._builds = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def observe_build(self, trace):
+        with self._lock:
+            self._builds[trace["outcome"]] = self._builds.get(trace["outcome"], 0) + 1
+            for s in trace["spans"]:
+                h = self._hist.setdefault((s["name"], s["outcome"]), [0] * len(BUCKETS) + [0.0, 0])
+                for i, le in enumerate(BUCKETS):
+                    if s["duration"] <= le: h[i] += 1
+                h[-2] += s["duration"]
+                h[-1] += 1
+                for direction in ("bytes_in", "bytes_out"):
+                    if s.get(direction):
+                        k = (s["name"], direction[6:])
+                        self._bytes[k] = self._bytes.get(k, 0) + s[direction]
+
+    def prometheus_text(self):
+        out = ["# HELP ouroboros_span_seconds Duration of build pipeline spans.",
+               "# TYPE ouroboros_span_seconds histogram"]
+        with self._lock:
+            for (name, outcome), h in sorted(self._hist.items()):
+                labels = f'span="{name}",outcome="{outcome}"'
+                for i, le in enumerate(BUCKETS):
+                    out.append(f'ouroboros_span_seconds_bucket{{{labels},le="{le}"}} {h[i]}')
+                out.append(f'ouroboros_span_seconds_bucket{{{labels},le="+Inf"}} {h[-1]}')
+                out.append(f"ouroboros_span_seconds_sum{{{labels}}} {h[-2]:.4f}")
+                out.append(f"ouroboros_span_seconds_count{{{labels}}} {h[-1]}")
+            out += ["# HELP ouroboros_span_bytes_total Bytes sent to / received from each span (prompts, responses, output).",
+                    "# TYPE ouroboros_span_bytes_total counter"]
+            for (name, direction), total in sorted(self._bytes.items()):
+                out.append(f'ouroboros_span_bytes_total{{span="{name}",direction="{direction}"}} {total}')
+            out += ["# HELP ouroboros_builds_total Finished builds by outcome.", "# TYPE ouroboros_builds_total counter"]
+            for outcome, n in sorted(self._builds.items()):
+                out.append(f'ouroboros_builds_total{{outcome="{outcome}"}} {n}')
+        return "\n".join(out) + "\n"
+
+    def write_textfile(self, min_interval=1.0):
+        if not metrics_path or time.time() - self._last_write < min_interval: return
+        self._last_write = time.time()
+        try:
+            os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+            tmp = f"{metrics_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: f.write(self.prometheus_text())
+            os.replace(tmp, metrics_path)
+        except OSError:
+            pass
+
+
+METRICS = Metrics()
+
+
+def serve_metrics(port):
+    """GET /metrics on a daemon thread (one per process)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = METRICS.prometheus_text().encode("utf-8")
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", int(port)), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def waterfall(trace, width=60):
+    """Plain-text waterfall of one trace"""
+    total = max(trace["duration"], 1e-6)
+    depth = {}
+    lines = []
+    for s in trace["spans"]:
+        depth[s["id"]] = depth.get(s["parent"], -1) + 1
+        left = int(s["start"] / total * width)
+        bar = "#" * max(1, int(s["duration"] / total * width))
+        label = ("  " * depth[s["id"]] + s["name"])[:22]
+        lines.append(f"{label:<22} {' ' * left}{bar} {s['duration'] * 1000:.0f} ms {s['outcome']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] != ["tail"]:
+        print(__doc__)
+        sys.exit(1)
+    n = int(args[1]) if len(args) > 1 else 1
+    with open(trace_path, "r", encoding="utf-8") as f:
+        traces = [json.loads(line) for line in f.readlines()[-n:]]
+    for t in traces:
+        print(f"\n{time.strftime('%H:%M:%S', time.localtime(t['started_at']))} {t['outcome']} {t['duration']:.2f}s")
+        print(waterfall(t))
@@ -0,0 +1,395 @@
+"""WARM SANDBOX POOL: pre-forked interpreters for generated scripts.
+
+A template process imports the heavy scientific stack once (numpy, matplotlib
+on Agg, scipy, pandas) and then forks a fresh child for every run. The child
+gets its own session, cwd, stdin=/dev/null and stdout/stderr files, so a run
+keeps the isolation/timeout/capture semantics of `subprocess.run` minus the
+interpreter start and imports.
+
+    python ouroboros_warm.py            # template server (started by WarmPool)
+    python ouroboros_warm.py --bench    # cold vs warm start latency
+"""
+import json
+import os
+import queue
+import selectors
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ouroboros_artifacts import hook_env, install_hooks
+
+PRELOAD = ["numpy", "matplotlib", "matplotlib.pyplot", "mpl_toolkits.mplot3d",
+           "scipy", "scipy.integrate", "pandas", "PIL.Image"]
+
+
+def exec_cap():
+    """Concurrent sandbox runs per process: OUROBOROS_MAX_EXEC, default the CPU count"""
+    return int(os.environ.get("OUROBOROS_MAX_EXEC", os.cpu_count() or 2))
+
+
+# --- A. TEMPLATE SIDE ---
+
+def apply_rlimits(rlimits):
+    """[(RLIMIT_NAME, value)] for the current process; used in forked children and as a cold preexec_fn"""
+    import resource
+    for name, value in rlimits:
+        res = getattr(resource, name, None)
+        if res is None: continue
+        _, hard = resource.getrlimit(res)
+        if hard != resource.RLIM_INFINITY: value = min(value, hard)
+        try:
+            # CPU: SIGXCPU at the soft limit, a second of grace before the hard SIGKILL
+            resource.setrlimit(res, (value, value + 1 if name == "RLIMIT_CPU" and (hard == resource.RLIM_INFINITY or value < hard) else value))
+        except (ValueError, OSError):
+            pass
+
+
+def _preload():
+    import importlib
+    loaded = []
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+    except Exception:
+        pass
+    for name in PRELOAD:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    return loaded
+
+
+def _run_child(req):
+    """Runs inside the forked child. Never returns."""
+    code = 1
+    try:
+        os.setsid()
+        if req.get("pidfile"):
+            with open(req["pidfile"], "w", encoding="utf-8") as f: f.write(str(os.getpid()))
+        apply_rlimits(req.get("rlimits", []))
+        install_hooks(req.get("journal"))
+        os.chdir(req["cwd"])
+        fd_in = os.open(os.devnull, os.O_RDONLY)
+        fd_out = os.open(req["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        fd_err = os.open(req["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(fd_in, 0)
+        os.dup2(fd_out, 1)
+        os.dup2(fd_err, 2)
+        for fd in (fd_in, fd_out, fd_err):
+            os.close(fd)
+        sys.stdin = open(0, "r", closefd=False)
+        # Line buffering lets the UI tail the files while the script is still running
+        buffering = 1 if req.get("line_buffered") else -1
+        sys.stdout = open(1, "w", buffering=buffering, encoding="utf-8", errors="backslashreplace", closefd=False)
+        sys.stderr = open(2, "w", buffering=buffering, encoding="utf-8", errors="backslashreplace", closefd=False)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        import importlib
+        import runpy
+        import site
+        import traceback
+        # Packages pip-installed after the template started must stay importable
+        user_site = site.getusersitepackages()
+        if os.path.isdir(user_site) and user_site not in sys.path:
+            sys.path.append(user_site)
+        importlib.invalidate_caches()
+
+        script = req["script"]
+        sys.argv = [script]
+        sys.path[0] = os.path.dirname(script)
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None: code = 0
+            elif isinstance(e.code, int): code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException as e:
+            # Same traceback shape as a cold interpreter: start at the script's own frame
+            tb = e.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename != script:
+                tb = tb.tb_next
+            traceback.print_exception(type(e), e, tb)
+            code = 1
+        try:
+            import atexit
+            atexit._run_exitfuncs()
+        except Exception:
+            pass
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(code & 0xFF if code >= 0 else 1)
+
+
+def _wait_child(pid, timeout):
+    """-> (returncode, timed_out). Kills the child's whole session on timeout."""
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return os.waitstatus_to_exitcode(status), False
+        if time.monotonic() >= deadline:
+            try: os.killpg(pid, signal.SIGKILL)
+            except OSError: pass
+            _, status = os.waitpid(pid, 0)
+            return os.waitstatus_to_exitcode(status), True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.02)
+
+
+def serve():
+    # Keep a private handle on the control pipe; stray prints from imports go to /dev/null
+    ctrl = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    loaded = _preload()
+    ctrl.write(json.dumps({"ready": True, "pid": os.getpid(), "preloaded": loaded}) + "\n")
+
+    for line in sys.stdin:
+        try:
+            req = json.loads(line)
+        except ValueError:
+            continue
+        started = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            ctrl.close()
+            _run_child(req)
+        ctrl.write(json.dumps({"started": pid}) + "\n")
+        returncode, timed_out = _wait_child(pid, float(req.get("timeout", 45)))
+        ctrl.write(json.dumps({"returncode": returncode, "timeout": timed_out,
+                               "elapsed": round(time.monotonic() - started, 4)}) + "\n")
+
+
+# --- B. CLIENT SIDE ---
+
+class _Template:
+    def __init__(self, cwd):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=cwd, text=True, bufsize=1, start_new_session=True)
+        self.ready = False
+        self.child = None # pid (= session id) of the script the last request forked
+        self.sent_at = 0.0
+
+    def _readline(self, timeout):
+        sel = selectors.DefaultSelector()
+        sel.register(self.proc.stdout, selectors.EVENT_READ)
+        try:
+            if not sel.select(timeout):
+                raise TimeoutError("warm template did not answer")
+        finally:
+            sel.close()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("warm template exited")
+        return json.loads(line)
+
+    def wait_ready(self, timeout=60):
+        if not self.ready:
+            self._readline(timeout)
+            self.ready = True
+
+    def request(self, req, timeout):
+        self.child, self.sent_at = None, time.time()
+        self.proc.stdin.write(json.dumps(req) + "\n")
+        self.proc.stdin.flush()
+        self.child = self._readline(15).get("started")  # sent right after the fork
+        # The template enforces the run timeout itself; the margin only guards a wedged template
+        return self._readline(timeout + 15)
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def kill(self, child=None):
+        """The template's group, then the session its forked child opened with setsid()"""
+        for pgid in (self.proc.pid, child):
+            if not pgid: continue
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.proc.wait()
+
+
+class WarmPool:
+    """Pool of warm template interpreters. `run()` mirrors `subprocess.run(capture_output=True, text=True)`."""
+
+    def __init__(self, size=None, cwd=None):
+        # A template serves one run at a time, so fewer templates than exec slots would be the real cap
+        self.size = max(1, size or int(os.environ.get("OUROBOROS_WARM_WORKERS", exec_cap())))
+        self.cwd = cwd or os.getcwd()
+        self.stats = {"warm_runs": 0, "cold_fallbacks": 0, "lost_runs": 0, "respawns": 0}
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            self._idle.put(_Template(self.cwd))
+
+    @staticmethod
+    def available():
+        return hasattr(os, "fork") and os.environ.get("OUROBOROS_WARM_POOL", "1") != "0"
+
+    def run(self, script, cwd=None, timeout=45, stdout_path=None, stderr_path=None, line_buffered=False,
+            rlimits=(), capture_cap=2 * 1024 * 1024, journal=None, pidfile=None):
+        """Caller-supplied stdout/stderr paths are left in place (e.g. to tail them live)"""
+        cwd = cwd or self.cwd
+        template = self._idle.get()
+        tmp = tempfile.mkdtemp(prefix="ouroboros_warm_")
+        out_path = stdout_path or os.path.join(tmp, "stdout")
+        err_path = stderr_path or os.path.join(tmp, "stderr")
+        try:
+            try:
+                template.wait_ready()
+                reply = template.request({"script": os.path.abspath(script), "cwd": cwd,
+                                          "stdout": out_path, "stderr": err_path,
+                                          "timeout": timeout, "line_buffered": line_buffered,
+                                          "rlimits": list(rlimits), "journal": journal, "pidfile": pidfile}, timeout)
+            except (OSError, RuntimeError, ValueError):
+                # Template died or is wedged: kill it and the script it forked, then replace it
+                child = template.child or _read_pid(pidfile, template.sent_at)
+                template.kill(child)
+                template = _Template(self.cwd)
+                with self._lock:
+                    self.stats["respawns"] += 1
+                    self.stats["cold_fallbacks" if child is None else "lost_runs"] += 1
+                if child is not None:
+                    # The script already ran, maybe halfway: running it again cold could repeat its side effects
+                    return subprocess.CompletedProcess([sys.executable, script], -signal.SIGKILL, read_capped(out_path, capture_cap),
+                                                       read_capped(err_path, capture_cap) + "\n[warm template died while the script ran]\n")
+                returncode = self._run_cold(script, cwd, timeout, out_path, err_path, rlimits, journal, pidfile)
+                return subprocess.CompletedProcess([sys.executable, script], returncode, read_capped(out_path, capture_cap),
+                                                   read_capped(err_path, capture_cap))
+            stdout, stderr = read_capped(out_path, capture_cap), read_capped(err_path, capture_cap)
+            if reply.get("timeout"):
+                raise subprocess.TimeoutExpired([sys.executable, script], timeout, output=stdout, stderr=stderr)
+            with self._lock:
+                self.stats["warm_runs"] += 1
+            return subprocess.CompletedProcess([sys.executable, script], reply["returncode"], stdout, stderr)
+        finally:
+            self._idle.put(template)
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @staticmethod
+    def _run_cold(script, cwd, timeout, out_path, err_path, rlimits, journal, pidfile):
+        """Fresh interpreter in its own session, pid in the pidfile: the same kill handle as a warm child"""
+        with open(out_path, "wb") as out, open(err_path, "wb") as err:
+            proc = subprocess.Popen([sys.executable, script], stdout=out, stderr=err, stdin=subprocess.DEVNULL, cwd=cwd,
+                                    env=hook_env(journal) if journal else None, start_new_session=True,
+                                    preexec_fn=lambda: apply_rlimits(rlimits))
+            if pidfile:
+                with open(pidfile, "w", encoding="utf-8") as f: f.write(str(proc.pid))
+            try:
+                return proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+                raise subprocess.TimeoutExpired([sys.executable, script], timeout,
+                                                output=read_capped(out_path), stderr=read_capped(err_path)) from None
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+def _read_pid(pidfile, since):
+    """Pid a child wrote to the pidfile after `since` (an older file belongs to an earlier run)"""
+    if not pidfile: return None
+    try:
+        if os.path.getmtime(pidfile) < since: return None
+        with open(pidfile, "r", encoding="utf-8") as f: return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def read_capped(path, cap=2 * 1024 * 1024):
+    """Whole log if small, else head + tail with a truncation marker"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            if size <= cap: return f.read().decode('utf-8', errors='replace')
+            head = f.read(cap // 2)
+            f.seek(size - cap // 2)
+            tail = f.read()
+    except OSError:
+        return ""
+    marker = f"\n[... {size - len(head) - len(tail)} bytes of output truncated ...]\n"
+    return head.decode('utf-8', errors='replace') + marker + tail.decode('utf-8', errors='replace')
+
+
+# --- C. BENCHMARK ---
+
+BENCH_SCRIPT = (
+    "import matplotlib\n"
+    "matplotlib.use('Agg')\n"
+    "import matplotlib.pyplot as plt\n"
+    "import numpy as np\n"
+    "import pandas as pd\n"
+    "from scipy.integrate import odeint\n"
+    "print(np.arange(10).sum(), len(pd.DataFrame({'a': [1, 2]})))\n"
+)
+
+
+def bench(runs=5):
+    """Cold `subprocess.run` vs warm fork start latency for a typical plotting script"""
+    work = tempfile.mkdtemp(prefix="ouroboros_bench_")
+    script = os.path.join(work, "bench_script.py")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(BENCH_SCRIPT)
+
+    cold = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        res = subprocess.run([sys.executable, script], capture_output=True, text=True, cwd=work)
+        cold.append(time.perf_counter() - t)
+        assert res.returncode == 0, res.stderr
+
+    t = time.perf_counter()
+    pool = WarmPool(size=1, cwd=work)
+    pool._idle.queue[0].wait_ready()
+    spawn = time.perf_counter() - t
+    warm = []
+    try:
+        for _ in range(runs):
+            t = time.perf_counter()
+            res = pool.run(script, cwd=work)
+            warm.append(time.perf_counter() - t)
+            assert res.returncode == 0, res.stderr
+    finally:
+        pool.close()
+        shutil.rmtree(work, ignore_errors=True)
+
+    med = lambda xs: sorted(xs)[len(xs) // 2]
+    print(f"runs per mode     : {runs}")
+    print(f"cold  median/min  : {med(cold) * 1000:8.1f} ms / {min(cold) * 1000:8.1f} ms")
+    print(f"warm  median/min  : {med(warm) * 1000:8.1f} ms / {min(warm) * 1000:8.1f} ms")
+    print(f"template spawn    : {spawn * 1000:8.1f} ms (paid once per worker)")
+    print(f"speedup (median)  : {med(cold) / med(warm):8.1f}x")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        n = int(sys.argv[sys.argv.index("--runs") + 1]) if "--runs" in sys.argv else 5
+        bench(n)
+    else:
+        serve()